@@ -1,33 +1,27 @@
 
 
 #default Imports
+import array
+import bisect
 import datetime
 import json
 import logging
+import mmap
 import os
+import sqlite3
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 
 import requests
-import pwinput
-import readchar
-
-from garminconnect import (
-    Garmin,
-    GarminConnectAuthenticationError,
-    GarminConnectConnectionError,
-    GarminConnectTooManyRequestsError,
-)
 
-# Configure debug logging
-# logging.basicConfig(level=logging.DEBUG)
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# garminconnect, pwinput and readchar are imported where they are used so that
+# importing this module is cheap and does not start the interactive menu.
 
-# Load environment variables if defined
-email = os.getenv("EMAIL")
-password = os.getenv("PASSWORD")
-api = None
+logger = logging.getLogger(__name__)
 
 # Example selections and settings
 today = datetime.date.today()
@@ -37,6 +31,72 @@ limit = 100
 start_badge = 1  # Badge related calls calls start counting at 1
 activitytype = ""  # Possible values are: cycling, running, swimming, multi_sport, fitness_equipment, hiking, walking, other
 activityfile = "MY_ACTIVITY.fit" # Supported file types are: .fit .gpx .tcx
+download_formats = ("gpx", "tcx", "original", "csv")  # Any of the DOWNLOAD_FORMATS keys
+download_dir = "."
+
+# Activity download format -> (Garmin URL attribute, file extension)
+DOWNLOAD_FORMATS = {
+    "original": ("garmin_connect_fit_download", "zip"),
+    "tcx": ("garmin_connect_tcx_download", "tcx"),
+    "gpx": ("garmin_connect_gpx_download", "gpx"),
+    "kml": ("garmin_connect_kml_download", "kml"),
+    "csv": ("garmin_connect_csv_download", "csv"),
+}
+# Stays within garth's default connection pool of 10
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+DEFAULT_STORE_FILE = str(Path.home() / ".cache" / "python_fun" / "garmin.db")
+# Activities are listed newest first, this many per call
+SYNC_PAGE_SIZE = 20
+
+DEFAULT_SERIES_DIR = str(Path.home() / ".cache" / "python_fun" / "garmin_series")
+# Metric -> (API method, key of its [timestamp ms, value, ...] samples, array typecode)
+METRIC_SERIES = {
+    "heart_rate": ("get_heart_rates", "heartRateValues", "h"),
+    "stress": ("get_stress_data", "stressValuesArray", "h"),
+    "respiration": ("get_respiration_data", "respirationValuesArray", "f"),
+    "spo2": ("get_spo2_data", "spO2HourlyAverages", "f"),
+}
+
+# Independent per-activity endpoints fetched together by activity_snapshot
+ACTIVITY_ENDPOINTS = (
+    "get_activity_splits",
+    "get_activity_split_summaries",
+    "get_activity_weather",
+    "get_activity_hr_in_timezones",
+    "get_activity_details",
+    "get_activity_gear",
+    "get_activity_evaluation",
+)
+SNAPSHOT_WORKERS = 8
+# Rate-limited calls are retried this many times; the shared delay starts at
+# SNAPSHOT_BACKOFF seconds, doubles per 429 up to SNAPSHOT_MAX_BACKOFF and halves per success
+SNAPSHOT_RETRIES = 3
+SNAPSHOT_BACKOFF = 1.0
+SNAPSHOT_MAX_BACKOFF = 30.0
+
+# Saved OAuth tokens (garth format), overridable with GARMINTOKENS
+DEFAULT_TOKEN_DIR = str(Path.home() / ".garminconnect")
+# The OAuth2 token is refreshed once it expires within this many seconds
+TOKEN_REFRESH_MARGIN = 15 * 60
+# Date-based queries available to the headless mode
+BATCH_QUERIES = (
+    "get_stats",
+    "get_user_summary",
+    "get_steps_data",
+    "get_heart_rates",
+    "get_rhr_day",
+    "get_hydration_data",
+    "get_sleep_data",
+    "get_stress_data",
+    "get_respiration_data",
+    "get_spo2_data",
+    "get_max_metrics",
+    "get_training_readiness",
+    "get_training_status",
+)
+DEFAULT_BATCH_QUERIES = ("get_user_summary", "get_sleep_data", "get_heart_rates")
 
 menu_options = {
     "1": "Get full name",
@@ -65,10 +125,12 @@ menu_options = {
     "m": f"Get non completed badge challenges data from '{start_badge}' and limit '{limit}'",
     "n": f"Get activities data from start '{start}' and limit '{limit}'",
     "o": "Get last activity",
-    "p": f"Download activities data by date from '{startdate.isoformat()}' to '{today.isoformat()}'",
+    "p": f"Download activities ({', '.join(download_formats)}) by date from '{startdate.isoformat()}' to '{today.isoformat()}'",
     "r": f"Get all kinds of activities data from '{start}'",
     "s": f"Upload activity data from file '{activityfile}'",
     "t": "Get all kinds of Garmin device info",
+    "u": f"Sync new activities and daily metrics since '{startdate.isoformat()}' to the local store",
+    "v": f"Store heart rate, stress, respiration and SpO2 samples for '{today.isoformat()}' as columns",
     "Z": "Logout Garmin Connect portal",
     "q": "Exit",
 }
@@ -83,53 +145,590 @@ def display_json(api_call, output):
     print(footer)
 
 
+def _download_result(activity_id, fmt, path, status, size=0, error=None, elapsed=0.0):
+    """Build one download_activities result."""
+    return {
+        "activity_id": activity_id,
+        "format": fmt,
+        "path": path,
+        "status": status,
+        "bytes": size,
+        "error": error,
+        "elapsed": elapsed,
+    }
+
+
+def download_activity_file(api, activity_id, fmt, directory=".", overwrite=False):
+    """
+    Stream one activity download to '<directory>/<activity_id>.<extension>'.
+
+    The response is written in chunks to a temporary file that replaces the
+    target only once complete, so an interrupted download is never mistaken
+    for a finished one. An existing file is kept unless overwrite is set.
+
+    Returns:
+        Result dict with activity_id, format, path, status ('downloaded',
+        'skipped' or 'failed'), bytes, error and elapsed keys
+    """
+    from garth.exc import GarthException
+
+    url_attribute, extension = DOWNLOAD_FORMATS[fmt]
+    path = os.path.join(directory, f"{activity_id}.{extension}")
+    if not overwrite and os.path.exists(path):
+        return _download_result(activity_id, fmt, path, "skipped", os.path.getsize(path))
+
+    started = time.perf_counter()
+    tmp_path = f"{path}.part"
+    try:
+        url = f"{getattr(api, url_attribute)}/{activity_id}"
+        with api.garth.request("GET", "connectapi", url, api=True, stream=True) as response:
+            size = 0
+            with open(tmp_path, "wb") as fb:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    fb.write(chunk)
+                    size += len(chunk)
+        os.replace(tmp_path, path)
+    except (GarthException, requests.exceptions.RequestException, OSError) as err:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return _download_result(activity_id, fmt, path, "failed", error=str(err),
+                                elapsed=time.perf_counter() - started)
+    return _download_result(activity_id, fmt, path, "downloaded", size,
+                            elapsed=time.perf_counter() - started)
+
+
+def download_activities(api, activities, formats=download_formats, directory=".",
+                        max_workers=DOWNLOAD_WORKERS, overwrite=False):
+    """
+    Download activities in several formats concurrently.
+
+    Args:
+        api: Logged in Garmin API
+        activities: Activity dicts (with 'activityId') or activity IDs
+        formats: DOWNLOAD_FORMATS keys to download for every activity
+        directory: Directory files are written to
+        max_workers: Maximum number of downloads in flight
+        overwrite: Download again even if the file exists
+
+    Returns:
+        One download_activity_file result per activity and format, in order
+    """
+    unknown = [fmt for fmt in formats if fmt not in DOWNLOAD_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown download formats {unknown}, expected {list(DOWNLOAD_FORMATS)}")
+
+    os.makedirs(directory, exist_ok=True)
+    jobs = [(activity["activityId"] if isinstance(activity, dict) else activity, fmt)
+            for activity in activities for fmt in formats]
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+        return list(executor.map(
+            lambda job: download_activity_file(api, job[0], job[1], directory, overwrite), jobs))
+
+
+def print_download_summary(results):
+    """Print failed downloads and per-status counts."""
+    counts = {"downloaded": 0, "skipped": 0, "failed": 0}
+    for result in results:
+        counts[result["status"]] += 1
+        if result["status"] == "failed":
+            print(f"{result['activity_id']}.{result['format']}: {result['error']}")
+    total_bytes = sum(result["bytes"] for result in results if result["status"] == "downloaded")
+    print(f"Downloaded {counts['downloaded']} files ({total_bytes} bytes), "
+          f"skipped {counts['skipped']} existing, {counts['failed']} failed")
+
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    activity_id INTEGER PRIMARY KEY,
+    start_time TEXT NOT NULL,
+    activity_type TEXT,
+    name TEXT,
+    distance REAL,
+    duration REAL,
+    calories REAL,
+    average_hr REAL,
+    summary TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS activities_start_time ON activities (start_time);
+CREATE INDEX IF NOT EXISTS activities_type ON activities (activity_type, start_time);
+CREATE TABLE IF NOT EXISTS daily_metrics (
+    date TEXT PRIMARY KEY,
+    steps INTEGER,
+    resting_hr INTEGER,
+    sleep_seconds INTEGER,
+    average_stress INTEGER,
+    summary TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class ActivityStore:
+    """
+    SQLite store of activity summaries and daily metrics.
+
+    The newest stored activity ID and the last synced day are kept in
+    sync_state so a sync only has to fetch what is newer.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_FILE):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(STORE_SCHEMA)
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    def get_state(self, key, default=None):
+        """Return a sync_state value."""
+        row = self._db.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def add_activities(self, activities):
+        """Insert or update activity summaries and advance the high-water mark."""
+        rows = [(
+            activity["activityId"],
+            activity.get("startTimeLocal") or "",
+            (activity.get("activityType") or {}).get("typeKey"),
+            activity.get("activityName"),
+            activity.get("distance"),
+            activity.get("duration"),
+            activity.get("calories"),
+            activity.get("averageHR"),
+            json.dumps(activity),
+        ) for activity in activities]
+        if not rows:
+            return 0
+        newest = max(rows, key=lambda row: row[0])
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO activities VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            if newest[0] > int(self.get_state("last_activity_id", 0)):
+                self._set_state("last_activity_id", newest[0])
+                self._set_state("last_activity_start", newest[1])
+        return len(rows)
+
+    def add_daily_metrics(self, day, summary):
+        """Insert or update one day of metrics from a user summary."""
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO daily_metrics VALUES (?, ?, ?, ?, ?, ?)",
+                (day, summary.get("totalSteps"), summary.get("restingHeartRate"),
+                 summary.get("sleepingSeconds"), summary.get("averageStressLevel"),
+                 json.dumps(summary)))
+            if day > self.get_state("last_metrics_date", ""):
+                self._set_state("last_metrics_date", day)
+
+    def activities(self, since=None, activity_type=None):
+        """Return stored activities (newest first), optionally filtered."""
+        query = "SELECT * FROM activities WHERE start_time >= ?"
+        params = [since or ""]
+        if activity_type:
+            query += " AND activity_type = ?"
+            params.append(activity_type)
+        return [dict(row) for row in
+                self._db.execute(query + " ORDER BY start_time DESC", params)]
+
+    def daily_metrics(self, start, end):
+        """Return stored daily metrics from start to end (inclusive), oldest first."""
+        return [dict(row) for row in self._db.execute(
+            "SELECT * FROM daily_metrics WHERE date BETWEEN ? AND ? ORDER BY date",
+            (start, end))]
+
+    def _set_state(self, key, value):
+        """Store a sync_state value (caller commits)."""
+        self._db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (key, str(value)))
+
+
+def _new_activities(api, last_activity_id):
+    """Page through the newest activities until reaching last_activity_id."""
+    new, start_index = [], 0
+    while True:
+        page = api.get_activities(start_index, SYNC_PAGE_SIZE)
+        for activity in page:
+            if activity["activityId"] <= last_activity_id:
+                return new, start_index // SYNC_PAGE_SIZE + 1
+            new.append(activity)
+        if len(page) < SYNC_PAGE_SIZE:
+            return new, start_index // SYNC_PAGE_SIZE + 1
+        start_index += SYNC_PAGE_SIZE
+
+
+def sync_store(api, store, start=None, end=None):
+    """
+    Fetch only activities and daily metrics newer than the store has.
+
+    The first sync lists activities from start to end by date. Later syncs
+    page through the newest activities until the stored high-water mark,
+    and refetch daily metrics from the last synced day (which may have been
+    incomplete) to end.
+
+    Args:
+        api: Logged in Garmin API
+        store: ActivityStore to update
+        start: First day to sync when the store is empty (default: startdate)
+        end: Last day to sync (default: today)
+
+    Returns:
+        Dict with the number of new activities, synced days and API calls
+    """
+    start = start or startdate
+    end = end or today
+    last_activity_id = int(store.get_state("last_activity_id", 0))
+    if last_activity_id:
+        activities, calls = _new_activities(api, last_activity_id)
+    else:
+        activities, calls = api.get_activities_by_date(start.isoformat(), end.isoformat()), 1
+    store.add_activities(activities)
+
+    last_day = store.get_state("last_metrics_date")
+    day = datetime.date.fromisoformat(last_day) if last_day else start
+    days = 0
+    while day <= end:
+        store.add_daily_metrics(day.isoformat(), api.get_user_summary(day.isoformat()))
+        day += datetime.timedelta(days=1)
+        days += 1
+        calls += 1
+
+    return {"activities": len(activities), "days": days, "calls": calls}
+
+
+class SeriesColumns:
+    """
+    Append-only columnar storage of one metric's samples.
+
+    Timestamps (epoch milliseconds, int64) and values (int16 or float32)
+    are kept in two flat files of native-endian machine values, so loading
+    is a memory map rather than a parse and each sample costs 10 or 12
+    bytes instead of a nested JSON list. Samples must be appended in time order.
+
+    Example:
+        >>> columns = SeriesColumns('series', 'heart_rate', 'h')
+        >>> columns.append([[1700000000000, 62], [1700000120000, 64]])
+        >>> timestamps, values = columns.load()
+    """
+
+    def __init__(self, directory, metric, typecode):
+        os.makedirs(directory, exist_ok=True)
+        self.typecode = typecode
+        self.timestamps_path = os.path.join(directory, f"{metric}.ts")
+        self.values_path = os.path.join(directory, f"{metric}.{typecode}")
+
+    def append(self, samples):
+        """
+        Append [timestamp ms, value, ...] samples newer than the last stored one.
+
+        Samples without a value are skipped, so refetching a day only adds
+        what is new.
+
+        Returns:
+            Number of samples appended
+        """
+        self._truncate_to_pairs()
+        timestamps = array.array("q")
+        values = array.array(self.typecode)
+        last = self.last_timestamp()
+        for sample in samples:
+            if sample[1] is None or (last is not None and sample[0] <= last):
+                continue
+            timestamps.append(sample[0])
+            values.append(sample[1])
+            last = sample[0]
+        if timestamps:
+            # Values first: a crash in between leaves an extra value, which
+            # _truncate_to_pairs drops before the next append
+            with open(self.values_path, "ab") as fb:
+                values.tofile(fb)
+            with open(self.timestamps_path, "ab") as fb:
+                timestamps.tofile(fb)
+        return len(timestamps)
+
+    def _truncate_to_pairs(self):
+        """Cut both files back to the samples that have a timestamp and a value."""
+        sizes = {}
+        for path, typecode in ((self.timestamps_path, "q"), (self.values_path, self.typecode)):
+            itemsize = array.array(typecode).itemsize
+            sizes[path] = (os.path.getsize(path) if os.path.exists(path) else 0, itemsize)
+        count = min(size // itemsize for size, itemsize in sizes.values())
+        for path, (size, itemsize) in sizes.items():
+            if size != count * itemsize:
+                os.truncate(path, count * itemsize)
+
+    def load(self):
+        """Return memory-mapped (timestamps, values) views of every stored sample."""
+        timestamps = _map_column(self.timestamps_path, "q")
+        values = _map_column(self.values_path, self.typecode)
+        return timestamps, values[:len(timestamps)]
+
+    def between(self, start_ms, end_ms):
+        """Return (timestamps, values) views of samples with start_ms <= timestamp < end_ms."""
+        timestamps, values = self.load()
+        first = bisect.bisect_left(timestamps, start_ms)
+        last = bisect.bisect_left(timestamps, end_ms)
+        return timestamps[first:last], values[first:last]
+
+    def last_timestamp(self):
+        """Return the newest stored timestamp, or None if empty."""
+        timestamps = _map_column(self.timestamps_path, "q")
+        return timestamps[-1] if len(timestamps) else None
+
+
+def _map_column(path, typecode):
+    """Memory-map a column file as a read-only typed view."""
+    itemsize = array.array(typecode).itemsize
+    try:
+        with open(path, "rb") as fb:
+            size = os.fstat(fb.fileno()).st_size
+            size -= size % itemsize
+            if not size:
+                return memoryview(array.array(typecode))
+            mapped = mmap.mmap(fb.fileno(), size, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return memoryview(array.array(typecode))
+    return memoryview(mapped).cast(typecode)
+
+
+def store_metric_series(api, day, directory=DEFAULT_SERIES_DIR):
+    """
+    Fetch a day of heart rate, stress, respiration and SpO2 samples into columns.
+
+    Returns:
+        {metric: number of samples appended}
+    """
+    appended = {}
+    for metric, (method, key, typecode) in METRIC_SERIES.items():
+        data = getattr(api, method)(day) or {}
+        appended[metric] = SeriesColumns(directory, metric, typecode).append(data.get(key) or [])
+    return appended
+
+
+class AdaptiveBackoff:
+    """
+    Delay shared by concurrent calls that grows on rate limiting and decays on success.
+
+    Every call waits the current delay first, so one 429 slows down all
+    workers instead of each discovering the limit on its own.
+    """
+
+    def __init__(self, initial=SNAPSHOT_BACKOFF, maximum=SNAPSHOT_MAX_BACKOFF, sleep=time.sleep):
+        self.initial = initial
+        self.maximum = maximum
+        self.delay = 0.0
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Sleep for the current delay."""
+        with self._lock:
+            delay = self.delay
+        if delay:
+            self._sleep(delay)
+
+    def rate_limited(self):
+        """Double the delay (starting from initial)."""
+        with self._lock:
+            self.delay = min(max(self.initial, self.delay * 2), self.maximum)
+
+    def succeeded(self):
+        """Halve the delay, dropping it once below initial."""
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay / 2 >= self.initial else 0.0
+
+
+def _is_rate_limited(err):
+    """Return True if err is Garmin Connect answering 429 Too Many Requests."""
+    from garminconnect import GarminConnectTooManyRequestsError
+    from garth.exc import GarthHTTPError
+
+    if isinstance(err, GarminConnectTooManyRequestsError):
+        return True
+    # API calls go through garth, which wraps the requests HTTPError
+    response = getattr(err.error, "response", None) if isinstance(err, GarthHTTPError) else None
+    return response is not None and response.status_code == 429
+
+
+def _call_with_backoff(func, args, backoff, retries):
+    """Call func(*args), retrying rate-limited calls with backoff."""
+    for attempt in range(retries + 1):
+        backoff.wait()
+        try:
+            value = func(*args)
+        except Exception as err:
+            if not _is_rate_limited(err):
+                raise
+            backoff.rate_limited()
+            if attempt == retries:
+                raise
+        else:
+            backoff.succeeded()
+            return value
+
+
+def gather_endpoints(calls, max_workers=SNAPSHOT_WORKERS, retries=SNAPSHOT_RETRIES, backoff=None):
+    """
+    Run independent API calls concurrently.
+
+    Args:
+        calls: {name: (function, args)} of calls to make
+        max_workers: Maximum number of calls in flight
+        retries: Retries per call after a 429 response
+        backoff: AdaptiveBackoff shared by the calls (a new one if None)
+
+    Returns:
+        Dict with data ({name: result}), errors ({name: message}) and
+        elapsed seconds
+    """
+    from garminconnect import (
+        GarminConnectAuthenticationError,
+        GarminConnectConnectionError,
+        GarminConnectTooManyRequestsError,
+    )
+    from garth.exc import GarthException
+
+    backoff = backoff or AdaptiveBackoff()
+    started = time.perf_counter()
+
+    def run(item):
+        name, (func, args) = item
+        try:
+            return name, _call_with_backoff(func, args, backoff, retries), None
+        except (
+            GarminConnectConnectionError,
+            GarminConnectAuthenticationError,
+            GarminConnectTooManyRequestsError,
+            GarthException,
+            requests.exceptions.RequestException,
+        ) as err:
+            return name, None, f"{type(err).__name__}: {err}"
+
+    data, errors = {}, {}
+    if calls:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(calls)))) as executor:
+            for name, value, error in executor.map(run, calls.items()):
+                if error:
+                    errors[name] = error
+                else:
+                    data[name] = value
+    return {"data": data, "errors": errors, "elapsed": time.perf_counter() - started}
+
+
+def activity_snapshot(api, activity_id, max_workers=SNAPSHOT_WORKERS, backoff=None):
+    """
+    Fetch every ACTIVITY_ENDPOINTS result for an activity concurrently.
+
+    Returns:
+        gather_endpoints result with the activity_id added
+    """
+    snapshot = gather_endpoints(
+        {name: (getattr(api, name), (activity_id,)) for name in ACTIVITY_ENDPOINTS},
+        max_workers, backoff=backoff)
+    snapshot["activity_id"] = activity_id
+    return snapshot
+
+
+def device_snapshot(api, max_workers=SNAPSHOT_WORKERS, backoff=None):
+    """
+    Fetch devices, the last used device and every device's settings.
+
+    Devices and the last used device are fetched together, then the
+    settings of all devices concurrently.
+
+    Returns:
+        gather_endpoints result whose data holds get_devices,
+        get_device_last_used and get_device_settings ({device ID: settings})
+    """
+    backoff = backoff or AdaptiveBackoff()
+    snapshot = gather_endpoints({
+        "get_devices": (api.get_devices, ()),
+        "get_device_last_used": (api.get_device_last_used, ()),
+    }, max_workers, backoff=backoff)
+
+    device_ids = [device["deviceId"] for device in snapshot["data"].get("get_devices") or []]
+    settings = gather_endpoints({device_id: (api.get_device_settings, (device_id,))
+                                 for device_id in device_ids}, max_workers, backoff=backoff)
+    snapshot["data"]["get_device_settings"] = settings["data"]
+    snapshot["errors"].update((f"get_device_settings({device_id})", error)
+                              for device_id, error in settings["errors"].items())
+    snapshot["elapsed"] += settings["elapsed"]
+    return snapshot
+
+
 def get_credentials():
     """Get user credentials."""
+    import pwinput
+
     email = input("Login e-mail: ")
     password = pwinput.pwinput(prompt='Password: ')
 
     return email, password
 
 
-def init_api(email, password):
-    """Initialize Garmin API with your credentials."""
-
-    try:
-        ## Try to load the previous session
-        with open("session.json") as f:
-            saved_session = json.load(f)
+def init_api(email, password, tokenstore=None, interactive=True):
+    """
+    Initialize Garmin API, reusing saved tokens when possible.
 
-            print(
-                "Login to Garmin Connect using session loaded from 'session.json'...\n"
-            )
+    Tokens are loaded from tokenstore (default: GARMINTOKENS or
+    DEFAULT_TOKEN_DIR); a credential login is only made when they are
+    missing or no longer valid, and its tokens are saved for the next run.
 
-            # Use the loaded session for initializing the API (without need for credentials)
-            api = Garmin(session_data=saved_session)
+    With interactive=False nothing is prompted for: missing credentials
+    or an account that needs an MFA code log an error and return None.
+    """
+    from garminconnect import (
+        Garmin,
+        GarminConnectAuthenticationError,
+        GarminConnectConnectionError,
+        GarminConnectTooManyRequestsError,
+    )
+    from garth.exc import GarthException
 
-            # Login using the
-            api.login()
+    tokenstore = tokenstore or os.getenv("GARMINTOKENS", DEFAULT_TOKEN_DIR)
+    try:
+        # Try to resume the previous session from the saved OAuth tokens
+        print(f"Login to Garmin Connect using tokens saved in '{tokenstore}'...\n", file=sys.stderr)
+        api = Garmin()
+        api.login(tokenstore)
 
-    except (FileNotFoundError, GarminConnectAuthenticationError):
-        # Login to Garmin Connect portal with credentials since session is invalid or not presentlastweek.
+    except (FileNotFoundError, GarthException, GarminConnectAuthenticationError):
+        # Login to Garmin Connect portal with credentials since tokens are invalid or not present.
         print(
-            "Session file not present or invalid, login with your credentials, please wait...\n"
+            "Saved tokens not present or invalid, login with your credentials, please wait...\n",
+            file=sys.stderr,
         )
         try:
             # Ask for credentials if not set as environment variables
             if not email or not password:
+                if not interactive:
+                    logger.error("No valid tokens in '%s' and EMAIL/PASSWORD not set", tokenstore)
+                    return None
                 email, password = get_credentials()
 
+            # Log in through garth: Garmin.login() without a tokenstore reads
+            # GARMINTOKENS again instead of using the credentials
             api = Garmin(email, password)
-            api.login()
+            if interactive:
+                api.garth.login(email, password)
+            elif api.garth.login(email, password, return_on_mfa=True)[0] == "needs_mfa":
+                logger.error("The account needs an MFA code, log in interactively once to save tokens")
+                return None
 
-            # Save session dictionary to json file for future use
-            with open("session.json", "w", encoding="utf-8") as f:
-                json.dump(api.session_data, f, ensure_ascii=False, indent=4)
+            # Save OAuth tokens for future use, then resume from them to load the profile
+            api.garth.dump(tokenstore)
+            api.login(tokenstore)
         except (
             GarminConnectConnectionError,
             GarminConnectAuthenticationError,
             GarminConnectTooManyRequestsError,
-            requests.exceptions.HTTPError,
+            GarthException,
+            requests.exceptions.RequestException,
         ) as err:
             logger.error("Error occurred during Garmin Connect communication: %s", err)
             return None
@@ -137,6 +736,110 @@ def init_api(email, password):
     return api
 
 
+def refresh_tokens(api, tokenstore=None, margin=TOKEN_REFRESH_MARGIN):
+    """
+    Refresh the OAuth2 token if it expires within margin seconds and save it.
+
+    Refreshing ahead of expiry keeps a long-running session from failing a
+    request first.
+
+    Returns:
+        True if the token was refreshed
+    """
+    token = api.garth.oauth2_token
+    if token and token.expires_at - margin > time.time():
+        return False
+    api.garth.refresh_oauth2()
+    api.garth.dump(tokenstore or os.getenv("GARMINTOKENS", DEFAULT_TOKEN_DIR))
+    return True
+
+
+def run_queries(api, queries, start_date, end_date, output):
+    """
+    Run date-based queries for every day in a range and write them as JSONL.
+
+    Each line holds query, date, fetched_at and either data or error.
+
+    Args:
+        api: Logged in Garmin API
+        queries: BATCH_QUERIES names to run
+        start_date: First day (datetime.date)
+        end_date: Last day (datetime.date, inclusive)
+        output: Text file the lines are written to
+
+    Returns:
+        Number of failed queries
+    """
+    from garminconnect import (
+        GarminConnectAuthenticationError,
+        GarminConnectConnectionError,
+        GarminConnectTooManyRequestsError,
+    )
+    from garth.exc import GarthException
+
+    unknown = [query for query in queries if query not in BATCH_QUERIES]
+    if unknown:
+        raise ValueError(f"Unknown queries {unknown}, expected some of {list(BATCH_QUERIES)}")
+
+    failed = 0
+    day = start_date
+    while day <= end_date:
+        for query in queries:
+            line = {"query": query, "date": day.isoformat()}
+            try:
+                line["data"] = getattr(api, query)(day.isoformat())
+            except (
+                GarminConnectConnectionError,
+                GarminConnectAuthenticationError,
+                GarminConnectTooManyRequestsError,
+                GarthException,
+                requests.exceptions.RequestException,
+            ) as err:
+                line["error"] = f"{type(err).__name__}: {err}"
+                failed += 1
+            line["fetched_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            output.write(json.dumps(line) + "\n")
+        output.flush()
+        day += datetime.timedelta(days=1)
+    return failed
+
+
+def run_headless(args):
+    """
+    Run the configured queries once, or every args.every seconds, without prompting.
+
+    A cycle that fails (e.g. the token refresh) is logged and the next one
+    is still run, so a network outage does not stop the collector.
+    """
+    from garth.exc import GarthException
+
+    email = os.getenv("EMAIL")
+    password = os.getenv("PASSWORD")
+    api = init_api(email, password, args.tokenstore, interactive=False)
+    if not api:
+        sys.exit(1)
+
+    output = open(args.output, "a", encoding="utf-8") if args.output != "-" else sys.stdout
+    try:
+        while True:
+            try:
+                refresh_tokens(api, args.tokenstore)
+                end_date = args.end or datetime.date.today()
+                start_date = args.start or end_date - datetime.timedelta(days=args.days - 1)
+                failed = run_queries(api, args.queries, start_date, end_date, output)
+                logger.info("Collected %s to %s (%d failed)", start_date, end_date, failed)
+            except (GarthException, requests.exceptions.RequestException) as err:
+                logger.error("Collection failed, retrying next cycle: %s", err)
+            if not args.every:
+                break
+            time.sleep(args.every)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
 def print_menu():
     """Print examples menu."""
     for key in menu_options.keys():
@@ -146,6 +849,12 @@ def print_menu():
 
 def switch(api, i):
     """Run selected API call."""
+    from garminconnect import (
+        GarminConnectAuthenticationError,
+        GarminConnectConnectionError,
+        GarminConnectTooManyRequestsError,
+    )
+    from garth.exc import GarthException
 
     # Exit example program
     if i == "q":
@@ -259,65 +968,19 @@ def switch(api, i):
                     startdate.isoformat(), today.isoformat(), activitytype
                 )
 
-                # Download activities
-                for activity in activities:
-                    activity_id = activity["activityId"]
-                    display_json(f"api.download_activity({activity_id})", api.download_activity(activity_id))
-
-                    gpx_data = api.download_activity(
-                        activity_id, dl_fmt=api.ActivityDownloadFormat.GPX
-                    )
-                    output_file = f"./{str(activity_id)}.gpx"
-                    with open(output_file, "wb") as fb:
-                        fb.write(gpx_data)
-
-                    tcx_data = api.download_activity(
-                        activity_id, dl_fmt=api.ActivityDownloadFormat.TCX
-                    )
-                    output_file = f"./{str(activity_id)}.tcx"
-                    with open(output_file, "wb") as fb:
-                        fb.write(tcx_data)
-
-                    zip_data = api.download_activity(
-                        activity_id, dl_fmt=api.ActivityDownloadFormat.ORIGINAL
-                    )
-                    output_file = f"./{str(activity_id)}.zip"
-                    with open(output_file, "wb") as fb:
-                        fb.write(zip_data)
-
-                    csv_data = api.download_activity(
-                        activity_id, dl_fmt=api.ActivityDownloadFormat.CSV
-                    )
-                    output_file = f"./{str(activity_id)}.csv"
-                    with open(output_file, "wb") as fb:
-                        fb.write(csv_data)
+                # Download activities in every selected format concurrently
+                print_download_summary(
+                    download_activities(api, activities, download_formats, download_dir)
+                )
 
             elif i == "r":
                 # Get activities data from start and limit
                 activities = api.get_activities(start, limit)  # 0=start, 1=limit
 
-                # Get activity splits
+                # Get every per-activity endpoint for the first activity concurrently
                 first_activity_id = activities[0].get("activityId")
-
-                display_json(f"api.get_activity_splits({first_activity_id})", api.get_activity_splits(first_activity_id))
-
-                # Get activity split summaries for activity id
-                display_json(f"api.get_activity_split_summaries({first_activity_id})", api.get_activity_split_summaries(first_activity_id))
-
-                # Get activity weather data for activity
-                display_json(f"api.get_activity_weather({first_activity_id})", api.get_activity_weather(first_activity_id))
-
-                # Get activity hr timezones id
-                display_json(f"api.get_activity_hr_in_timezones({first_activity_id})", api.get_activity_hr_in_timezones(first_activity_id))
-
-                # Get activity details for activity id
-                display_json(f"api.get_activity_details({first_activity_id})", api.get_activity_details(first_activity_id))
-
-                # Get gear data for activity id
-                display_json(f"api.get_activity_gear({first_activity_id})", api.get_activity_gear(first_activity_id))
-
-                # Activity self evaluation data for activity id
-                display_json(f"api.get_activity_evaluation({first_activity_id})", api.get_activity_evaluation(first_activity_id))
+                display_json(f"activity_snapshot(api, {first_activity_id})",
+                             activity_snapshot(api, first_activity_id))
 
             elif i == "s":
                 # Upload activity from file
@@ -325,18 +988,22 @@ def switch(api, i):
 
             # DEVICES
             elif i == "t":
-                # Get Garmin devices
-                devices = api.get_devices()
-                display_json("api.get_devices()", devices)
+                # Get Garmin devices, device last used and settings per device concurrently
+                display_json("device_snapshot(api)", device_snapshot(api))
 
-                # Get device last used
-                device_last_used = api.get_device_last_used()
-                display_json("api.get_device_last_used()", device_last_used)
+            # LOCAL STORE
+            elif i == "u":
+                # Sync activities and daily metrics newer than the local store
+                store = ActivityStore()
+                try:
+                    display_json("sync_store(api, store)", sync_store(api, store))
+                finally:
+                    store.close()
 
-                # Get settings per device
-                for device in devices:
-                    device_id = device["deviceId"]
-                    display_json(f"api.get_device_settings({device_id})", api.get_device_settings(device_id))
+            elif i == "v":
+                # Append today's intraday samples to the columnar series files
+                display_json(f"store_metric_series(api, '{today.isoformat()}')",
+                             store_metric_series(api, today.isoformat()))
 
             elif i == "Z":
                 # Logout Garmin Connect portal
@@ -347,7 +1014,8 @@ def switch(api, i):
             GarminConnectConnectionError,
             GarminConnectAuthenticationError,
             GarminConnectTooManyRequestsError,
-            requests.exceptions.HTTPError,
+            GarthException,
+            requests.exceptions.RequestException,
         ) as err:
             logger.error("Error occurred: %s", err)
         except KeyError:
@@ -356,16 +1024,57 @@ def switch(api, i):
     else:
         print("Could not login to Garmin Connect, try again later.")
 
-# Main program loop
-while True:
-    # Display header and login
-    print("\n*** Garmin Connect API Demo by cyberjunky ***\n")
+def main():
+    """Run the interactive Garmin Connect menu, or the headless mode with --batch."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Garmin Connect API demo and collector.")
+    parser.add_argument("--batch", action="store_true",
+                        help="Run --queries without the interactive menu and write JSONL")
+    parser.add_argument("--queries", nargs="+", default=list(DEFAULT_BATCH_QUERIES),
+                        choices=BATCH_QUERIES, metavar="QUERY",
+                        help=f"Date-based queries to run (default: {' '.join(DEFAULT_BATCH_QUERIES)})")
+    parser.add_argument("--start", type=datetime.date.fromisoformat,
+                        help="First day YYYY-MM-DD (default: --days before --end)")
+    parser.add_argument("--end", type=datetime.date.fromisoformat,
+                        help="Last day YYYY-MM-DD (default: today)")
+    parser.add_argument("--days", type=int, default=1,
+                        help="Days to collect when --start is not given")
+    parser.add_argument("--output", default="-", help="JSONL file to append to (default: stdout)")
+    parser.add_argument("--every", type=float,
+                        help="Repeat every this many seconds, reusing the session")
+    parser.add_argument("--tokenstore", help="Directory with saved tokens (default: GARMINTOKENS)")
+    args = parser.parse_args()
+
+    # Configure debug logging
+    # logging.basicConfig(level=logging.DEBUG)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.batch:
+        run_headless(args)
+        return
+
+    import readchar
+
+    # Load environment variables if defined
+    email = os.getenv("EMAIL")
+    password = os.getenv("PASSWORD")
+    api = None
+
+    # Main program loop
+    while True:
+        # Display header and login
+        print("\n*** Garmin Connect API Demo by cyberjunky ***\n")
+
+        # Init API
+        if not api:
+            api = init_api(email, password)
+
+        # Display menu
+        print_menu()
+        option = readchar.readkey()
+        switch(api, option)
 
-    # Init API
-    if not api:
-        api = init_api(email, password)
 
-    # Display menu
-    print_menu()
-    option = readchar.readkey()
-    switch(api, option)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,22 @@
 """Network discovery for Roku devices using SSDP multicast."""
+import argparse
+import asyncio
+import re
 import socket
-from typing import List
+import struct
+import sys
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+from decouple import config
+from utils.cache import TTLCache
+
+# aiohttp is imported where it is used so that importing this module stays cheap
+if TYPE_CHECKING:
+    import aiohttp
 
 # SSDP Constants
 SSDP_MULTICAST_GROUP = '239.255.255.250'
@@ -8,57 +24,605 @@ SSDP_PORT = 1900
 SSDP_TIMEOUT = 5
 SOCKET_BUFFER_SIZE = 65507
 
-def discover_roku_devices() -> List[str]:
+# Devices answer within MX seconds; Rokus typically reply in a few milliseconds
+SSDP_MX = 1
+# UDP is unreliable, so UPnP recommends sending each M-SEARCH more than once
+SSDP_RETRANSMITS = 3
+SSDP_RETRANSMIT_INTERVAL = 0.1
+# Once something answered, stop after this long without a new device. A
+# device may wait up to MX seconds before answering, so without an expected
+# count the quiet period must cover MX; with one, a late device just ends
+# the search a moment earlier
+SSDP_SETTLE_TIME = SSDP_MX + 0.5
+SSDP_EXPECTED_SETTLE_TIME = 0.25
+
+# Registry entries live for the advertised CACHE-CONTROL max-age
+DEFAULT_MAX_AGE = 1800
+# Announcements arrive in bursts; write the registry file at most this often
+REGISTRY_SAVE_INTERVAL = 5
+DEFAULT_REGISTRY_FILE = str(Path.home() / '.cache' / 'python_fun' / 'roku_devices.json')
+# Fields taken from /query/device-info, by XML tag
+DEVICE_INFO_TIMEOUT = 3
+DEVICE_INFO_FIELDS = {
+    'user-device-name': 'name',
+    'model-name': 'model',
+    'serial-number': 'serial',
+    'software-version': 'software_version',
+}
+
+# Headers kept by parse_ssdp_headers, by lower-cased raw name
+SSDP_HEADERS = {name.lower().encode(): name for name in
+                ('USN', 'LOCATION', 'SERVER', 'ST', 'NT', 'NTS', 'CACHE-CONTROL')}
+_MAX_AGE_PATTERN = re.compile(r'max-age\s*=\s*(\d+)', re.IGNORECASE)
+
+# Linux ioctl reading an interface's IPv4 address (from <linux/sockios.h>)
+SIOCGIFADDR = 0x8915
+
+SEARCH_MESSAGE = (
+    'M-SEARCH * HTTP/1.1\r\n'
+    f'HOST: {SSDP_MULTICAST_GROUP}:{SSDP_PORT}\r\n'
+    'MAN: "ssdp:discover"\r\n'
+    f'MX: {SSDP_MX}\r\n'
+    'ST: roku:ecp\r\n\r\n'
+).encode('utf-8')
+
+def _interface_addresses() -> List[str]:
+    """
+    Return the IPv4 address of every network interface that has one.
+
+    Interfaces are listed with if_nameindex and their addresses read with
+    the SIOCGIFADDR ioctl, which only exists on Linux; elsewhere this
+    returns [] and _local_ipv4_addresses relies on its other sources.
+    """
+    if not sys.platform.startswith('linux'):
+        return []
+    import fcntl
+
+    addresses = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for _, name in socket.if_nameindex():
+            try:
+                ifreq = fcntl.ioctl(sock.fileno(), SIOCGIFADDR,
+                                    struct.pack('256s', name.encode()[:15]))
+            except OSError:
+                # Interface without an IPv4 address
+                continue
+            addresses.append(socket.inet_ntoa(ifreq[20:24]))
+    return addresses
+
+def _local_ipv4_addresses() -> List[str]:
+    """
+    Return the IPv4 addresses of the local interfaces, excluding loopback.
+
+    Every interface is enumerated on Linux. The addresses the hostname
+    resolves to and the default-route address are added on any platform,
+    so other systems search at least from the primary interface. Falls back
+    to ['0.0.0.0'] (the default multicast interface) when no address can be
+    determined.
+    """
+    addresses = set(_interface_addresses())
+    try:
+        addresses.update(socket.gethostbyname_ex(socket.gethostname())[2])
+    except OSError:
+        pass
+    # The address used for the default route, found without sending anything
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        probe.connect(('192.0.2.1', 9))
+        addresses.add(probe.getsockname()[0])
+    except OSError:
+        pass
+    finally:
+        probe.close()
+    addresses = sorted(a for a in addresses if not a.startswith('127.') and a != '0.0.0.0')
+    return addresses or ['0.0.0.0']
+
+def _search_socket(interface: str) -> socket.socket:
+    """Create a non-blocking UDP socket that multicasts from interface."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+    try:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+    except OSError:
+        # Interface cannot multicast (e.g. loopback); unicast targets still work
+        pass
+    sock.bind((interface, 0))
+    sock.setblocking(False)
+    return sock
+
+class _SSDPSearchProtocol(asyncio.DatagramProtocol):
+    """Push every datagram received on a search socket onto a queue."""
+
+    def __init__(self, responses: asyncio.Queue):
+        self.responses = responses
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        self.responses.put_nowait((data, addr))
+
+    def error_received(self, exc: Exception) -> None:
+        # ICMP errors for one interface must not end the whole search
+        pass
+
+def parse_ssdp_headers(data: bytes) -> Tuple[str, Dict[str, str]]:
+    """
+    Parse the start line and the interesting headers of an SSDP message.
+
+    Rather than decoding the whole datagram and splitting it into lines,
+    the raw bytes are scanned in place with bounded find() calls. Only
+    header names and the values of SSDP_HEADERS are sliced out, and only
+    those values are decoded.
+
+    Returns:
+        (start line, {upper-cased header name: value})
+    """
+    end = len(data)
+    eol = data.find(b'\r\n')
+    if eol == -1:
+        eol = end
+    start_line = data[:eol].decode('latin-1')
+    headers = {}
+    pos = eol + 2
+    while pos < end:
+        eol = data.find(b'\r\n', pos)
+        if eol == -1:
+            eol = end
+        if eol == pos:
+            break  # blank line ends the headers
+        colon = data.find(b':', pos, eol)
+        if colon != -1:
+            name = SSDP_HEADERS.get(data[pos:colon].strip().lower())
+            if name:
+                headers[name] = data[colon + 1:eol].strip().decode('latin-1')
+        pos = eol + 2
+    return start_line, headers
+
+def _max_age(headers: Dict[str, str]) -> int:
+    """Return the CACHE-CONTROL max-age of a message, or DEFAULT_MAX_AGE."""
+    match = _MAX_AGE_PATTERN.search(headers.get('CACHE-CONTROL', ''))
+    return int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+###########################################################################################
+# DeviceRegistry
+# Persistent record of the Roku devices seen on the network
+###########################################################################################
+class DeviceRegistry:
+    """
+    Known Roku devices keyed by USN, expiring after their advertised max-age.
+
+    Each record holds ip, usn, location and last_seen. Records are persisted
+    to a JSON file so later runs can answer without any network traffic;
+    writes are batched to at most one per REGISTRY_SAVE_INTERVAL while
+    announcements stream in, and save() flushes the rest.
+    """
+
+    def __init__(self, path: Optional[str] = None, clock=time.time,
+                 save_interval: float = REGISTRY_SAVE_INTERVAL):
+        """
+        Args:
+            path: JSON file the registry is persisted to (in-memory if None)
+            clock: Time source returning epoch seconds
+            save_interval: Minimum seconds between writes of the file
+        """
+        self._clock = clock
+        self._devices = TTLCache(DEFAULT_MAX_AGE, path=path, clock=clock, autosave=False)
+        self._by_ip = {record['ip']: usn for usn, record in self._devices.items()}
+        self.save_interval = save_interval
+        self._dirty = False
+        self._last_save = float('-inf')
+
+    def update(self, ip: str, usn: Optional[str] = None, location: Optional[str] = None,
+               max_age: int = DEFAULT_MAX_AGE) -> bool:
+        """
+        Record that a device is alive.
+
+        Devices without a USN are keyed by IP. A different USN reported for
+        a known IP replaces the old record (the TV at that address changed).
+
+        Returns:
+            True if the device was not already known
+        """
+        usn = usn or f"ip:{ip}"
+        old_usn = self._by_ip.get(ip)
+        if old_usn is not None and old_usn != usn:
+            self._devices.delete(old_usn)
+        previous = self._devices.get(usn)
+        if previous is not None and previous['ip'] != ip and self._by_ip.get(previous['ip']) == usn:
+            # Same device at a new address
+            del self._by_ip[previous['ip']]
+        self._devices.set(usn, {
+            'ip': ip,
+            'usn': usn,
+            'location': location or f"http://{ip}:8060/",
+            'last_seen': self._clock(),
+        }, ttl=max_age)
+        self._by_ip[ip] = usn
+        self._changed()
+        return previous is None
+
+    def remove(self, usn: str) -> None:
+        """Forget a device (it said ssdp:byebye)."""
+        record = self._devices.get(usn)
+        if record is not None and self._by_ip.get(record['ip']) == usn:
+            del self._by_ip[record['ip']]
+        self._devices.delete(usn)
+        self._changed()
+
+    def save(self) -> None:
+        """Write pending changes to the JSON file."""
+        if self._dirty:
+            self._devices.save()
+            self._dirty = False
+            self._last_save = self._clock()
+
+    def _changed(self) -> None:
+        """Note a change and save it if the last write is old enough."""
+        self._dirty = True
+        if self._clock() - self._last_save >= self.save_interval:
+            self.save()
+
+    def devices(self) -> List[Dict]:
+        """Return the records of every live device."""
+        return [record for _, record in self._devices.items()]
+
+    def ips(self) -> List[str]:
+        """Return the IP addresses of every live device."""
+        return list(dict.fromkeys(record['ip'] for record in self.devices()))
+
+    def handle_message(self, data: bytes, addr: Tuple[str, int]) -> Optional[str]:
+        """
+        Apply an SSDP NOTIFY or M-SEARCH response to the registry.
+
+        Returns:
+            'alive', 'byebye', or None if the message was not about a Roku
+        """
+        start_line, headers = parse_ssdp_headers(data)
+        kind = headers.get('NT') or headers.get('ST', '')
+        if 'roku:ecp' not in kind:
+            return None
+        if start_line.startswith('NOTIFY') and headers.get('NTS') == 'ssdp:byebye':
+            self.remove(headers.get('USN') or f"ip:{addr[0]}")
+            return 'byebye'
+        self.record(addr[0], headers)
+        return 'alive'
+
+    def record(self, ip: str, headers: Dict[str, str]) -> bool:
+        """Record a device from its parsed SSDP headers; True if it is new."""
+        return self.update(ip, headers.get('USN'), headers.get('LOCATION'), _max_age(headers))
+
+@lru_cache(maxsize=None)
+def get_registry() -> DeviceRegistry:
+    """Return the persistent device registry."""
+    return DeviceRegistry(config('roku_registry_file', default=DEFAULT_REGISTRY_FILE))
+
+async def iter_roku_responses(
+    timeout: float = SSDP_TIMEOUT,
+    expected: Optional[int] = None,
+    interfaces: Optional[Sequence[str]] = None,
+    target: Tuple[str, int] = (SSDP_MULTICAST_GROUP, SSDP_PORT),
+    settle: Optional[float] = None,
+    registry: Optional[DeviceRegistry] = None,
+) -> AsyncIterator[Tuple[str, Dict[str, str]]]:
+    """
+    Search for Roku devices on every interface, yielding each new one as it answers.
+
+    The search ends after timeout seconds, as soon as expected devices have
+    been found, or once settle seconds pass without a new device after at
+    least one has answered.
+
+    Args:
+        timeout: Upper bound on the whole search in seconds
+        expected: Stop as soon as this many devices have answered
+        interfaces: Local IPv4 addresses to search from (default: all)
+        target: Where M-SEARCH is sent (the SSDP multicast group)
+        settle: Quiet period that ends the search once a device was found
+            (default: SSDP_EXPECTED_SETTLE_TIME with expected, else SSDP_SETTLE_TIME)
+        registry: Registry every answering device is recorded in
+
+    Yields:
+        (IP address, parsed SSDP headers) of each Roku device, once per IP
+    """
+    if settle is None:
+        settle = SSDP_EXPECTED_SETTLE_TIME if expected else SSDP_SETTLE_TIME
+    loop = asyncio.get_running_loop()
+    responses: asyncio.Queue = asyncio.Queue()
+    transports = []
+    for interface in interfaces or _local_ipv4_addresses():
+        try:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _SSDPSearchProtocol(responses), sock=_search_socket(interface))
+        except OSError as e:
+            print(f"Skipping interface {interface}: {e}")
+            continue
+        transports.append(transport)
+
+    async def send_searches() -> None:
+        for attempt in range(SSDP_RETRANSMITS):
+            if attempt:
+                await asyncio.sleep(SSDP_RETRANSMIT_INTERVAL)
+            for transport in transports:
+                transport.sendto(SEARCH_MESSAGE, target)
+
+    sender = asyncio.create_task(send_searches())
+    seen = set()
+    deadline = loop.time() + timeout
+    try:
+        while expected is None or len(seen) < expected:
+            remaining = deadline - loop.time()
+            if seen:
+                remaining = min(remaining, last_found + settle - loop.time())
+            if remaining <= 0:
+                break
+            try:
+                data, addr = await asyncio.wait_for(responses.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            # Retransmits make duplicates common, so skip them before parsing
+            if addr[0] in seen:
+                continue
+            _, headers = parse_ssdp_headers(data)
+            if 'roku:ecp' not in headers.get('ST', ''):
+                continue
+            if registry is not None:
+                registry.record(addr[0], headers)
+            seen.add(addr[0])
+            last_found = loop.time()
+            yield addr[0], headers
+    finally:
+        sender.cancel()
+        for transport in transports:
+            transport.close()
+        if registry is not None:
+            registry.save()
+
+async def iter_roku_devices(
+    timeout: float = SSDP_TIMEOUT,
+    expected: Optional[int] = None,
+    interfaces: Optional[Sequence[str]] = None,
+    target: Tuple[str, int] = (SSDP_MULTICAST_GROUP, SSDP_PORT),
+    settle: Optional[float] = None,
+    registry: Optional[DeviceRegistry] = None,
+) -> AsyncIterator[str]:
+    """Like iter_roku_responses, but yield only the IP addresses."""
+    async for ip, _ in iter_roku_responses(timeout, expected, interfaces, target,
+                                           settle, registry):
+        yield ip
+
+async def discover_roku_devices_async(
+    timeout: float = SSDP_TIMEOUT,
+    expected: Optional[int] = None,
+    interfaces: Optional[Sequence[str]] = None,
+    target: Tuple[str, int] = (SSDP_MULTICAST_GROUP, SSDP_PORT),
+    registry: Optional[DeviceRegistry] = None,
+) -> List[str]:
+    """Collect the results of iter_roku_devices into a list."""
+    return [ip async for ip in iter_roku_devices(timeout, expected, interfaces, target,
+                                                 registry=registry)]
+
+def discover_roku_devices(
+    timeout: float = SSDP_TIMEOUT,
+    expected: Optional[int] = None,
+    interfaces: Optional[Sequence[str]] = None,
+) -> List[str]:
     """
     Discover Roku devices on the local network using SSDP protocol.
 
+    Args:
+        timeout: Upper bound on the search in seconds
+        expected: Return as soon as this many devices have answered
+        interfaces: Local IPv4 addresses to search from (default: all)
+
     Returns:
         List of IP addresses of discovered Roku devices
     """
-    # SSDP discovery message
-    message = (
-        'M-SEARCH * HTTP/1.1\r\n'
-        f'HOST: {SSDP_MULTICAST_GROUP}:{SSDP_PORT}\r\n'
-        'MAN: "ssdp:discover"\r\n'
-        'MX: 1\r\n'
-        'ST: roku:ecp\r\n\r\n'
-    )
+    return asyncio.run(discover_roku_devices_async(timeout, expected, interfaces))
 
-    # Create the socket for multicast communication
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-    sock.settimeout(SSDP_TIMEOUT)
+def get_roku_ips(refresh: bool = False, timeout: float = SSDP_TIMEOUT,
+                 expected: Optional[int] = None) -> List[str]:
+    """
+    Return known Roku IPs, scanning the network only on a registry miss.
 
-    # Allow multiple sockets to use the same PORT number
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    Args:
+        refresh: Run an active scan even if the registry has live devices
+        timeout: Upper bound on an active scan in seconds
+        expected: End an active scan once this many devices answered
+
+    Returns:
+        List of IP addresses of Roku devices
+    """
+    registry = get_registry()
+    if not refresh:
+        ips = registry.ips()
+        if ips:
+            return ips
+    return asyncio.run(discover_roku_devices_async(timeout, expected, registry=registry))
+
+###########################################################################################
+# Device details
+# Each Roku describes itself at <LOCATION>query/device-info
+###########################################################################################
+def _parse_device_info(xml: bytes) -> Dict[str, str]:
+    """Return the DEVICE_INFO_FIELDS found in a /query/device-info document."""
+    root = ElementTree.fromstring(xml)
+    info = {}
+    for tag, key in DEVICE_INFO_FIELDS.items():
+        value = root.findtext(tag)
+        if value is not None:
+            info[key] = value.strip()
+    return info
+
+async def fetch_device_info(session: 'aiohttp.ClientSession', location: str) -> Dict[str, str]:
+    """Fetch and parse one device's /query/device-info."""
+    async with session.get(f"{location.rstrip('/')}/query/device-info") as response:
+        response.raise_for_status()
+        return _parse_device_info(await response.read())
+
+async def _device_record(session: 'aiohttp.ClientSession', ip: str,
+                         headers: Dict[str, str]) -> Dict:
+    """Build a structured device record from SSDP headers plus device-info."""
+    import aiohttp
 
+    location = headers.get('LOCATION') or f"http://{ip}:8060/"
+    record = {
+        'ip': ip,
+        'usn': headers.get('USN'),
+        'location': location,
+        'server': headers.get('SERVER'),
+        'error': None,
+    }
+    record.update(dict.fromkeys(DEVICE_INFO_FIELDS.values()))
     try:
-        # Send the message to the multicast group
-        sock.sendto(message.encode('utf-8'), (SSDP_MULTICAST_GROUP, SSDP_PORT))
+        record.update(await fetch_device_info(session, location))
+    except (aiohttp.ClientError, asyncio.TimeoutError, ElementTree.ParseError) as e:
+        record['error'] = f"device-info failed: {e!r}"
+    return record
 
-        # Listen for responses from Roku devices
-        ip_addresses = []
+async def discover_roku_details(
+    timeout: float = SSDP_TIMEOUT,
+    expected: Optional[int] = None,
+    interfaces: Optional[Sequence[str]] = None,
+    target: Tuple[str, int] = (SSDP_MULTICAST_GROUP, SSDP_PORT),
+    registry: Optional[DeviceRegistry] = None,
+    info_timeout: float = DEVICE_INFO_TIMEOUT,
+) -> List[Dict]:
+    """
+    Discover Roku devices and fetch each one's device-info concurrently.
+
+    A device's details are requested as soon as it answers the search, so
+    the HTTP fetches overlap with discovery instead of following it.
+
+    Returns:
+        One record per device, in answer order, with ip, usn, location,
+        server, name, model, serial, software_version and error keys
+    """
+    import aiohttp
+
+    client_timeout = aiohttp.ClientTimeout(total=info_timeout)
+    async with aiohttp.ClientSession(timeout=client_timeout) as session:
+        tasks = [asyncio.create_task(_device_record(session, ip, headers))
+                 async for ip, headers in iter_roku_responses(
+                     timeout, expected, interfaces, target, registry=registry)]
+        return list(await asyncio.gather(*tasks))
+
+###########################################################################################
+# Passive NOTIFY listening
+# Devices announce themselves (ssdp:alive) and leave (ssdp:byebye) on the multicast group
+###########################################################################################
+class _SSDPNotifyProtocol(asyncio.DatagramProtocol):
+    """Feed every datagram on the SSDP group into a DeviceRegistry."""
+
+    def __init__(self, registry: DeviceRegistry, on_event=None):
+        self.registry = registry
+        self.on_event = on_event
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        if not data.startswith(b'NOTIFY'):
+            return
+        event = self.registry.handle_message(data, addr)
+        if event and self.on_event:
+            self.on_event(event, addr[0])
+
+    def error_received(self, exc: Exception) -> None:
+        pass
+
+def _listen_socket(port: int, group: str, interfaces: Sequence[str]) -> socket.socket:
+    """Create a UDP socket bound to port that has joined group on every interface."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, 'SO_REUSEPORT'):
+        # Let other SSDP listeners on this machine share the port
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(('', port))
+    for interface in interfaces:
+        membership = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton(interface))
         try:
-            while True:
-                data, addr = sock.recvfrom(SOCKET_BUFFER_SIZE)
-                response = data.decode('utf-8')
-                if 'roku:ecp' in response and addr[0] not in ip_addresses:
-                    ip_addresses.append(addr[0])
-        except socket.timeout:
-            pass
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        except OSError as e:
+            print(f"Could not join {group} on {interface}: {e}")
+    sock.setblocking(False)
+    return sock
+
+async def listen_for_devices(
+    registry: Optional[DeviceRegistry] = None,
+    stop: Optional[asyncio.Event] = None,
+    port: int = SSDP_PORT,
+    group: str = SSDP_MULTICAST_GROUP,
+    interfaces: Optional[Sequence[str]] = None,
+    on_event=None,
+) -> None:
+    """
+    Keep the registry current from NOTIFY messages until stop is set.
 
-        return ip_addresses
+    Args:
+        registry: Registry to update (default: the persistent registry)
+        stop: Event that ends listening (default: listen forever)
+        port: UDP port to listen on
+        group: Multicast group to join
+        interfaces: Local IPv4 addresses to join the group on (default: all)
+        on_event: Called with ('alive' | 'byebye', ip) for every Roku message
+    """
+    registry = registry or get_registry()
+    loop = asyncio.get_running_loop()
+    sock = _listen_socket(port, group, interfaces or _local_ipv4_addresses())
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _SSDPNotifyProtocol(registry, on_event), sock=sock)
+    try:
+        await (stop or asyncio.Event()).wait()
     finally:
-        sock.close()
+        transport.close()
+        registry.save()
+
+def start_listener_thread(registry: Optional[DeviceRegistry] = None, **kwargs) -> threading.Thread:
+    """Run listen_for_devices forever on a daemon thread and return the thread."""
+    thread = threading.Thread(
+        target=lambda: asyncio.run(listen_for_devices(registry, **kwargs)),
+        name='ssdp-notify-listener', daemon=True)
+    thread.start()
+    return thread
+
+async def _print_devices() -> int:
+    """Print devices as they answer and return how many were found."""
+    count = 0
+    async for ip in iter_roku_devices(registry=get_registry()):
+        count += 1
+        print(f"Roku Device {count}: {ip}")
+    return count
 
 def main() -> None:
     """Main function to discover and display Roku devices."""
-    roku_devices = discover_roku_devices()
+    parser = argparse.ArgumentParser(description='Find Roku devices on the local network.')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Scan the network even if devices are already known')
+    parser.add_argument('--listen', action='store_true',
+                        help='Keep the registry updated from device announcements')
+    parser.add_argument('--details', action='store_true',
+                        help='Scan and show name, model and serial of each device')
+    args = parser.parse_args()
+
+    if args.details:
+        devices = asyncio.run(discover_roku_details(registry=get_registry()))
+        for i, device in enumerate(devices, start=1):
+            print(f"Roku Device {i}: {device['ip']} {device['name'] or ''} "
+                  f"({device['model'] or 'unknown model'}, serial {device['serial'] or '?'})")
+        if not devices:
+            print("No Roku devices found on the network")
+        return
+
+    if args.listen:
+        print("Listening for Roku announcements (Ctrl+C to stop)")
+        try:
+            asyncio.run(listen_for_devices(
+                on_event=lambda event, ip: print(f"{event}: {ip}")))
+        except KeyboardInterrupt:
+            pass
+        return
 
-    if roku_devices:
-        for i, ip in enumerate(roku_devices, start=1):
+    known = [] if args.refresh else get_registry().ips()
+    if known:
+        for i, ip in enumerate(known, start=1):
             print(f"Roku Device {i}: {ip}")
-    else:
+    elif not asyncio.run(_print_devices()):
         print("No Roku devices found on the network")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,56 @@
+"""Shared PyGithub client factory."""
+import threading
+from typing import Dict, Optional, Tuple
+from decouple import config
+
+DEFAULT_POOL_SIZE = 10
+
+# Cached clients keyed by (token, pool_size, throttled)
+_clients: Dict[Tuple[str, int, bool], object] = {}
+_clients_lock = threading.Lock()
+
+def get_client(
+    token: Optional[str] = None,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    throttled: bool = True,
+):
+    """
+    Return an authenticated PyGithub client, cached per configuration.
+
+    The first call for a given configuration builds the client; later calls
+    return the same instance so its authentication and HTTP connection pool
+    are reused. PyGithub is imported on first use.
+
+    Args:
+        token: GitHub personal access token (defaults to the github_pat setting)
+        pool_size: Maximum number of pooled HTTP connections
+        throttled: If False, disable PyGithub's built-in spacing between
+            requests, for callers that apply their own rate limiting
+
+    Returns:
+        Authenticated github.Github instance
+    """
+    if token is None:
+        token = config('github_pat')
+
+    key = (token, pool_size, throttled)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            from github import Auth, Github
+
+            kwargs = {}
+            if not throttled:
+                kwargs = {'seconds_between_requests': None, 'seconds_between_writes': None}
+            client = Github(auth=Auth.Token(token), pool_size=pool_size, **kwargs)
+            _clients[key] = client
+        return client
+
+
+def close_clients() -> None:
+    """Close every cached client and release its connection pool."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
@@ -0,0 +1,208 @@
+"""GitHub integration utilities."""
+import argparse
+import csv
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from decouple import config
+from github_tools.client import get_client
+from utils.throttle import Throttle
+
+# Bulk creation defaults. GitHub's secondary rate limits cap content-creating
+# requests, so writes are spaced out even when many workers are in flight.
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_WRITE_INTERVAL = 1.0
+REPORT_FIELDS = ['name', 'status', 'url', 'error', 'elapsed']
+
+def create_github_repo(repo_name, description, is_private, github_token):
+
+    try:
+        g = get_client(github_token)
+        user = g.get_user()
+        repo = user.create_repo(repo_name, description=description, private=is_private)
+        print(f"Repository '{repo_name}' created successfully: {repo.html_url}")
+        return repo, None
+
+    except Exception as e:
+        error_message = f"An error occurred: {e}"
+        print(error_message)
+        return None, error_message
+
+
+def load_manifest(path: str) -> List[Dict]:
+    """
+    Load a repository manifest from a CSV file.
+
+    The CSV must have a ``name`` column; ``description`` and ``private``
+    (yes/true/1) are optional.
+
+    Args:
+        path: Path to the manifest CSV file
+
+    Returns:
+        List of repository specs with name, description and private keys
+    """
+    with open(path, 'r', newline='') as file:
+        return [
+            {
+                'name': row['name'].strip(),
+                'description': (row.get('description') or '').strip(),
+                'private': (row.get('private') or '').strip().lower() in ('yes', 'true', '1'),
+            }
+            for row in csv.DictReader(file)
+            if (row.get('name') or '').strip()
+        ]
+
+
+def create_github_repos(
+    manifest: Iterable[Dict],
+    github_token: str,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    write_interval: float = DEFAULT_WRITE_INTERVAL,
+) -> List[Dict]:
+    """
+    Create many repositories concurrently, skipping ones that already exist.
+
+    A single cached client (with a connection pool sized to the worker
+    count) is shared by all workers. Existing repository names are
+    listed once up front so re-running the same manifest is idempotent.
+
+    Args:
+        manifest: Repository specs with name, description and private keys
+        github_token: GitHub personal access token
+        max_workers: Number of repositories created in parallel
+        write_interval: Minimum seconds between repository create calls
+
+    Returns:
+        One result dict per unique manifest entry, in manifest order, with
+        name, status (created/skipped/failed), url, error and elapsed keys
+    """
+    specs = list({spec['name']: spec for spec in manifest}.values())
+    if not specs:
+        return []
+
+    from github import GithubException
+
+    try:
+        g = get_client(github_token, pool_size=max_workers, throttled=False)
+        user = g.get_user()
+        existing = {repo.name.lower() for repo in user.get_repos(affiliation='owner')}
+    except Exception as e:
+        error_message = f"An error occurred: {e}"
+        print(error_message)
+        return [_result(spec['name'], 'failed', error=error_message) for spec in specs]
+
+    throttle = Throttle(write_interval)
+
+    def create(spec: Dict) -> Dict:
+        name = spec['name']
+        if name.lower() in existing:
+            return _result(name, 'skipped', error='already exists')
+
+        started = time.perf_counter()
+        throttle.wait()
+        try:
+            repo = user.create_repo(
+                name,
+                description=spec.get('description', ''),
+                private=spec.get('private', False),
+            )
+            return _result(name, 'created', url=repo.html_url,
+                           elapsed=time.perf_counter() - started)
+        except GithubException as e:
+            # 422 means the name was taken between listing and creating
+            if e.status == 422 and 'already exists' in str(e.data).lower():
+                return _result(name, 'skipped', error='already exists')
+            return _result(name, 'failed', error=f"An error occurred: {e}",
+                           elapsed=time.perf_counter() - started)
+        except Exception as e:
+            return _result(name, 'failed', error=f"An error occurred: {e}",
+                           elapsed=time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(create, specs))
+
+
+def write_report(results: List[Dict], path: str) -> None:
+    """
+    Write bulk creation results to a CSV report.
+
+    Args:
+        results: Result dicts returned by create_github_repos
+        path: Destination CSV file path
+    """
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def _result(name: str, status: str, url: Optional[str] = None,
+            error: Optional[str] = None, elapsed: float = 0.0) -> Dict:
+    """Build a single bulk creation result record."""
+    return {
+        'name': name,
+        'status': status,
+        'url': url,
+        'error': error,
+        'elapsed': round(elapsed, 3),
+    }
+
+
+def _print_summary(results: List[Dict]) -> None:
+    """Print per-status counts and any failures."""
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+        if result['status'] == 'failed':
+            print(f"Failed to create repository '{result['name']}': {result['error']}")
+    summary = ', '.join(f"{status}: {count}" for status, count in sorted(counts.items()))
+    print(f"Processed {len(results)} repositories ({summary})")
+
+
+def _prompt_single_repo(github_token: str) -> None:
+    """Interactively create a single repository."""
+    repo_name = input("Enter the repository name: ")
+    description = input("Enter the repository description: ")
+    is_private_input = input("Make the repository private? (yes/no): ").lower()
+    is_private = is_private_input == "yes"
+    repo, error = create_github_repo(repo_name, description, is_private, github_token)
+
+    if error:
+        print(f"Failed to create repository: {error}")
+
+
+def main() -> None:
+    """Create one repository interactively, or many from a manifest."""
+    parser = argparse.ArgumentParser(description="Create GitHub repositories.")
+    parser.add_argument('--manifest', help="CSV file with name, description, private columns")
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help="Number of repositories created in parallel")
+    parser.add_argument('--write-interval', type=float, default=DEFAULT_WRITE_INTERVAL,
+                        help="Minimum seconds between repository create calls")
+    parser.add_argument('--report', help="Write a CSV result report to this path")
+    args = parser.parse_args()
+
+    github_token = config('github_pat', default=None)
+    if not github_token:
+        print("Error: github_pat not found in .env file.")
+        sys.exit(1)
+
+    if not args.manifest:
+        _prompt_single_repo(github_token)
+        return
+
+    results = create_github_repos(
+        load_manifest(args.manifest),
+        github_token,
+        max_workers=args.workers,
+        write_interval=args.write_interval,
+    )
+    _print_summary(results)
+    if args.report:
+        write_report(results, args.report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""GitHub API integration for repository information retrieval."""
+import csv
+from typing import Dict, Optional
+from github_tools.client import get_client
+
+def get_repo_info(owner: str, repo: str, token: Optional[str] = None) -> Optional[Dict]:
+    """
+    Retrieve repository information from GitHub API.
+
+    Uses the shared cached client, so repeated lookups reuse one
+    authenticated connection pool.
+
+    Args:
+        owner: Repository owner username
+        repo: Repository name
+        token: GitHub personal access token (defaults to the github_pat setting)
+
+    Returns:
+        Dict containing repository information, or None if request fails
+    """
+    from github import GithubException
+
+    try:
+        repo_info = get_client(token).get_repo(f'{owner}/{repo}').raw_data
+
+        # Print some relevant information from the response
+        print(f"Repository Name: {repo_info['name']}")
+        print(f"Description: {repo_info['description']}")
+        print(f"Stars: {repo_info['stargazers_count']}")
+        print(f"Forks: {repo_info['forks_count']}")
+
+        return repo_info
+    except GithubException as e:
+        print(f"Failed to retrieve repository information. Status code: {e.status}")
+        return None
+    except Exception as e:
+        print(f"Error retrieving repository information: {e}")
+        return None
+
+def main():
+    """Main function to process repositories from CSV file."""
+    try:
+        with open('repositories.csv', 'r') as file:
+            csv_reader = csv.DictReader(file)
+            for row in csv_reader:
+                username = row['username']
+                repository = row['repository']
+                get_repo_info(username, repository)
+    except FileNotFoundError:
+        print("Error: repositories.csv file not found")
+    except KeyError as e:
+        print(f"Error: Missing required column in CSV: {e}")
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+
+if __name__ == "__main__":
+    main()
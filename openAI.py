@@ -1,9 +1,11 @@
 """OpenAI API integration example."""
 from decouple import config
-from openai import OpenAI
 
 def main():
     """Main function to demonstrate OpenAI API usage."""
+    # Imported here because the openai package is slow to import
+    from openai import OpenAI
+
     # Get the API key from environment
     api_key = config('open_ai_pat')
 
@@ -1,12 +1,38 @@
 """SmartThings API integration for device management."""
+import argparse
 import asyncio
-from typing import List
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
 import aiohttp
 import pysmartthings
+from aiohttp import web
 from decouple import config
+from pysmartthings.api import API_DEVICE_COMMAND, Api
+from utils.cache import TTLCache
 
-# Load SmartThings Personal Access Token
-PAT = config('smart_things_pat')
+# Bulk requests keep at most this many calls in flight on the shared session
+DEFAULT_CONCURRENCY = 50
+DEFAULT_REQUEST_TIMEOUT = 10
+
+# Device names and capabilities rarely change; attribute values do
+DEVICE_METADATA_TTL = 24 * 60 * 60
+DEVICE_STATUS_TTL = 60
+DEFAULT_DEVICE_CACHE_FILE = str(Path.home() / '.cache' / 'python_fun' / 'smartthings_devices.json')
+
+# Commands rejected with 429 are retried this many times, waiting
+# COMMAND_BACKOFF seconds and doubling (or the Retry-After header if given)
+COMMAND_RETRIES = 3
+COMMAND_BACKOFF = 0.5
+
+# Webhook mode: devices without an event for EVENT_STALE_AFTER seconds are
+# polled in case their events were missed, checked every STALE_CHECK_INTERVAL
+DEFAULT_WEBHOOK_HOST = '127.0.0.1'
+DEFAULT_WEBHOOK_PORT = 8088
+DEFAULT_WEBHOOK_PATH = '/smartthings'
+EVENT_STALE_AFTER = 15 * 60
+STALE_CHECK_INTERVAL = 60
 
 async def list_devices() -> List:
     """
@@ -16,7 +42,7 @@ async def list_devices() -> List:
         List of SmartThings device objects
     """
     async with aiohttp.ClientSession() as session:
-        api = pysmartthings.SmartThings(session, PAT)
+        api = pysmartthings.SmartThings(session, config('smart_things_pat'))
         devices = await api.devices()
 
         for i, device in enumerate(devices):
@@ -28,9 +54,714 @@ async def list_devices() -> List:
 
         return devices
 
+###########################################################################################
+# Bulk status
+# Refresh every device's status concurrently with bounded parallelism
+###########################################################################################
+def _status_result(device, ok: bool, error: str = None, elapsed: float = 0.0) -> Dict:
+    """Build one get_device_statuses result."""
+    return {
+        'device_id': device.device_id,
+        'name': device.name,
+        'ok': ok,
+        'status': dict(device.status.values) if ok else None,
+        'error': error,
+        'elapsed': elapsed,
+    }
+
+async def get_device_statuses(
+    devices: Iterable,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_REQUEST_TIMEOUT,
+) -> List[Dict]:
+    """
+    Refresh the status of many devices concurrently.
+
+    Requests share the devices' API session and at most concurrency of
+    them are in flight at once. A failing or slow device is reported in
+    its result and does not affect the others.
+
+    Args:
+        devices: Device objects from SmartThings.devices()
+        concurrency: Maximum number of status requests in flight
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        One result dict per device, in input order, with device_id, name,
+        ok, status (attribute -> value of the main component), error and
+        elapsed keys
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def refresh(device) -> Dict:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(device.status.refresh(), timeout)
+            except asyncio.TimeoutError:
+                return _status_result(device, False, f"timed out after {timeout}s",
+                                      time.perf_counter() - started)
+            except aiohttp.ClientError as e:
+                return _status_result(device, False, f"{type(e).__name__}: {e}",
+                                      time.perf_counter() - started)
+            return _status_result(device, True, elapsed=time.perf_counter() - started)
+
+    return list(await asyncio.gather(*(refresh(device) for device in devices)))
+
+def _status_entities(api, device_ids: Iterable[str]) -> List:
+    """
+    Build device entities that can refresh their status from IDs alone.
+
+    Refreshing a status only needs the ID, so this avoids asking the API
+    for each device again.
+    """
+    return [pysmartthings.DeviceEntity(api._service, device_id=device_id)
+            for device_id in device_ids]
+
+async def refresh_all_statuses(concurrency: int = DEFAULT_CONCURRENCY,
+                               timeout: float = DEFAULT_REQUEST_TIMEOUT) -> List[Dict]:
+    """
+    List every device and refresh all statuses over one session.
+
+    Returns:
+        The get_device_statuses results
+    """
+    async with aiohttp.ClientSession() as session:
+        api = pysmartthings.SmartThings(session, config('smart_things_pat'))
+        devices = await api.devices()
+        started = time.perf_counter()
+        results = await get_device_statuses(devices, concurrency, timeout)
+
+    failed = [result for result in results if not result['ok']]
+    for result in failed:
+        print(f"{result['name']} ({result['device_id']}): {result['error']}")
+    print(f"Refreshed {len(results) - len(failed)}/{len(results)} device statuses "
+          f"in {time.perf_counter() - started:.2f}s")
+    return results
+
+###########################################################################################
+# Device cache
+# Persisted device metadata and status with separate TTLs and lookup indexes
+###########################################################################################
+def _device_metadata(device) -> Dict:
+    """Extract the JSON-serializable static fields of a device."""
+    return {
+        'device_id': device.device_id,
+        'name': device.name,
+        'label': device.label,
+        'location_id': device.location_id,
+        'room_id': device.room_id,
+        'type': device.type,
+        'capabilities': list(device.capabilities),
+        'components': {component: list(capabilities)
+                       for component, capabilities in device.components.items()},
+    }
+
+class DeviceCache:
+    """
+    Cache of SmartThings devices split into static metadata and volatile status.
+
+    The device list is refetched every metadata_ttl seconds; each device's
+    attribute values expire after status_ttl seconds and only expired ones
+    are refreshed. Both are persisted to one JSON file. Lookups by ID, name
+    and capability use indexes rebuilt only when the device list changes.
+
+    Example:
+        >>> cache = DeviceCache('devices.json')
+        >>> await cache.devices(api)
+        >>> cache.with_capability('switch')
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        metadata_ttl: float = DEVICE_METADATA_TTL,
+        status_ttl: float = DEVICE_STATUS_TTL,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            path: JSON file the cache is persisted to (in-memory if None)
+            metadata_ttl: Seconds the device list stays valid
+            status_ttl: Seconds a device's attribute values stay valid
+            clock: Time source returning epoch seconds
+        """
+        self.status_ttl = status_ttl
+        self._cache = TTLCache(metadata_ttl, path=path, clock=clock)
+        self._indexed = None
+        self._by_id: Dict[str, Dict] = {}
+        self._by_name: Dict[str, Dict] = {}
+        self._by_capability: Dict[str, List[Dict]] = {}
+        self._index(self._cache.get('devices', []))
+
+    async def devices(self, api, refresh: bool = False) -> List[Dict]:
+        """Return metadata for every device, fetching the list only when expired."""
+        devices = None if refresh else self._cache.get('devices')
+        if devices is None:
+            devices = [_device_metadata(device) for device in await api.devices()]
+            self._cache.set('devices', devices)
+        self._index(devices)
+        return devices
+
+    async def statuses(
+        self,
+        api,
+        device_ids: Optional[Iterable[str]] = None,
+        refresh: bool = False,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_REQUEST_TIMEOUT,
+    ) -> Dict[str, Dict]:
+        """
+        Return {device ID: attribute values}, refreshing only expired statuses.
+
+        Args:
+            api: SmartThings API client
+            device_ids: Devices to return (default: every device)
+            refresh: Refresh every requested status even if cached
+            concurrency: Maximum number of status requests in flight
+            timeout: Per-request timeout in seconds
+
+        Returns:
+            Attribute values per device, in request order; devices whose
+            refresh failed are left out
+        """
+        if device_ids is None:
+            device_ids = [device['device_id'] for device in await self.devices(api)]
+        device_ids = list(device_ids)
+        statuses = {}
+        for device_id in device_ids:
+            status = None if refresh else self._cache.get(f"status:{device_id}")
+            if status is not None:
+                statuses[device_id] = status
+
+        stale = [device_id for device_id in device_ids if device_id not in statuses]
+        if stale:
+            fresh = {}
+            for result in await get_device_statuses(_status_entities(api, stale),
+                                                    concurrency, timeout):
+                if result['ok']:
+                    fresh[result['device_id']] = result['status']
+                else:
+                    print(f"Status of {result['device_id']} not refreshed: {result['error']}")
+            self._cache.set_many({f"status:{device_id}": status
+                                  for device_id, status in fresh.items()}, self.status_ttl)
+            statuses.update(fresh)
+
+        return {device_id: statuses[device_id] for device_id in device_ids
+                if device_id in statuses}
+
+    def get(self, device_id: str) -> Optional[Dict]:
+        """Return the metadata of a device by ID."""
+        return self._by_id.get(device_id)
+
+    def find(self, name: str) -> Optional[Dict]:
+        """Return the metadata of a device by name or label (case-insensitive)."""
+        return self._by_name.get(name.strip().lower())
+
+    def with_capability(self, capability: str) -> List[Dict]:
+        """Return the metadata of every device with a capability on any component."""
+        return list(self._by_capability.get(capability, []))
+
+    def invalidate(self) -> None:
+        """Forget the device list and every cached status."""
+        self._cache.clear()
+        self._index([])
+
+    def _index(self, devices: List[Dict]) -> None:
+        """Rebuild the lookup indexes if the device list changed."""
+        if devices is self._indexed:
+            return
+        self._indexed = devices
+        self._by_id = {device['device_id']: device for device in devices}
+        self._by_name = {}
+        self._by_capability = {}
+        for device in devices:
+            for name in (device['name'], device['label']):
+                if name:
+                    self._by_name.setdefault(name.lower(), device)
+            capabilities = set(device['capabilities'])
+            for component_capabilities in device['components'].values():
+                capabilities.update(component_capabilities)
+            for capability in sorted(capabilities):
+                self._by_capability.setdefault(capability, []).append(device)
+
+@lru_cache(maxsize=None)
+def get_device_cache() -> DeviceCache:
+    """Return the persistent device cache."""
+    return DeviceCache(config('smartthings_cache_file', default=DEFAULT_DEVICE_CACHE_FILE))
+
+async def list_cached_devices(refresh: bool = False,
+                              capability: Optional[str] = None) -> List[Dict]:
+    """
+    Display devices from the device cache, downloading the list only when expired.
+
+    Args:
+        refresh: Download the device list even if the cache is fresh
+        capability: Only show devices with this capability
+
+    Returns:
+        Metadata dicts of the displayed devices
+    """
+    cache = get_device_cache()
+    async with aiohttp.ClientSession() as session:
+        api = pysmartthings.SmartThings(session, config('smart_things_pat'))
+        devices = await cache.devices(api, refresh=refresh)
+
+    if capability:
+        devices = cache.with_capability(capability)
+    for i, device in enumerate(devices):
+        print(f"Device {i + 1}:")
+        print(f"  Name: {device['name']}")
+        print(f"  ID: {device['device_id']}")
+        print(f"  Capabilities: {device['capabilities']}")
+        print('-------------------------')
+    return devices
+
+###########################################################################################
+# Batch commands
+# Send commands to many devices in one concurrent wave, one request per device
+###########################################################################################
+class DeviceCommand(NamedTuple):
+    """One capability command for a device component."""
+
+    device_id: str
+    capability: str
+    command: str
+    args: Optional[List[Any]] = None
+    component: str = 'main'
+
+def _command_payload(command: DeviceCommand) -> Dict:
+    """Build the API representation of a command."""
+    payload = {
+        'component': command.component,
+        'capability': command.capability,
+        'command': command.command,
+    }
+    if command.args:
+        payload['arguments'] = list(command.args)
+    return payload
+
+def _command_result(device_id: str, commands: int, ok: bool, attempts: int,
+                    error: str = None, elapsed: float = 0.0) -> Dict:
+    """Build one execute_commands per-device result."""
+    return {
+        'device_id': device_id,
+        'commands': commands,
+        'ok': ok,
+        'attempts': attempts,
+        'error': error,
+        'elapsed': elapsed,
+    }
+
+def _retry_delay(error: pysmartthings.APIResponseError, backoff: float, attempt: int) -> float:
+    """Seconds to wait before retrying a 429, preferring the Retry-After header."""
+    try:
+        return float((error.headers or {})['Retry-After'])
+    except (KeyError, TypeError, ValueError):
+        return backoff * 2 ** attempt
+
+async def execute_commands(
+    api,
+    commands: Iterable[DeviceCommand],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    retries: int = COMMAND_RETRIES,
+    backoff: float = COMMAND_BACKOFF,
+    timeout: float = DEFAULT_REQUEST_TIMEOUT,
+) -> Dict:
+    """
+    Execute commands on many devices concurrently.
+
+    Commands are grouped per device and each device's group is sent as one
+    request. At most concurrency requests are in flight; a request answered
+    with 429 is retried with exponential backoff without holding a slot.
+
+    Args:
+        api: SmartThings API client
+        commands: Commands to execute, in any order
+        concurrency: Maximum number of requests in flight
+        retries: Retries per device after a 429 response
+        backoff: Initial retry delay in seconds
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        Dict with results (one per device, in order of first command),
+        succeeded and failed counts and the total elapsed seconds
+    """
+    grouped: Dict[str, List[DeviceCommand]] = {}
+    for command in commands:
+        grouped.setdefault(command.device_id, []).append(command)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(device_id: str, device_commands: List[DeviceCommand]) -> Dict:
+        resource = API_DEVICE_COMMAND.format(device_id=device_id)
+        payload = {'commands': [_command_payload(command) for command in device_commands]}
+        started = time.perf_counter()
+
+        def result(ok: bool, attempt: int, error: str = None) -> Dict:
+            return _command_result(device_id, len(device_commands), ok, attempt + 1,
+                                   error, time.perf_counter() - started)
+
+        for attempt in range(retries + 1):
+            async with semaphore:
+                try:
+                    response = await asyncio.wait_for(api._service.post(resource, payload), timeout)
+                except pysmartthings.APIResponseError as e:
+                    if e.status != 429 or attempt == retries:
+                        return result(False, attempt, f"{type(e).__name__}: {e}")
+                    delay = _retry_delay(e, backoff, attempt)
+                except asyncio.TimeoutError:
+                    return result(False, attempt, f"timed out after {timeout}s")
+                except aiohttp.ClientError as e:
+                    return result(False, attempt, f"{type(e).__name__}: {e}")
+                else:
+                    statuses = [r.get('status') for r in (response or {}).get('results', [])]
+                    if statuses and all(s in ('ACCEPTED', 'COMPLETED') for s in statuses):
+                        return result(True, attempt)
+                    return result(False, attempt, f"rejected: {statuses}")
+            await asyncio.sleep(delay)
+
+    started = time.perf_counter()
+    results = list(await asyncio.gather(*(send(device_id, device_commands)
+                                          for device_id, device_commands in grouped.items())))
+    succeeded = sum(result['ok'] for result in results)
+    return {
+        'results': results,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'elapsed': time.perf_counter() - started,
+    }
+
+async def run_bulk_command(capability: str, command: str, args: Optional[List[Any]] = None,
+                           room_id: Optional[str] = None) -> Dict:
+    """
+    Send one command to every cached device with a capability, e.g. all switches off.
+
+    Args:
+        capability: Capability the devices must have (e.g. 'switch')
+        command: Command to send (e.g. 'off')
+        args: Command arguments
+        room_id: Only target devices in this room
+
+    Returns:
+        The execute_commands summary
+    """
+    cache = get_device_cache()
+    async with aiohttp.ClientSession() as session:
+        api = pysmartthings.SmartThings(session, config('smart_things_pat'))
+        await cache.devices(api)
+        devices = [device for device in cache.with_capability(capability)
+                   if room_id is None or device['room_id'] == room_id]
+        summary = await execute_commands(
+            api, [DeviceCommand(device['device_id'], capability, command, args)
+                  for device in devices])
+
+    for result in summary['results']:
+        if not result['ok']:
+            device = cache.get(result['device_id']) or {}
+            print(f"{device.get('name')} ({result['device_id']}): {result['error']}")
+    print(f"{capability}.{command}: {summary['succeeded']}/{len(summary['results'])} devices "
+          f"in {summary['elapsed']:.2f}s")
+    return summary
+
+###########################################################################################
+# Event-driven state
+# Apply webhook device events to an in-memory store; poll only devices gone quiet
+###########################################################################################
+class DeviceStateStore:
+    """
+    In-memory attribute values per device, updated from events and polls.
+
+    Attributes of components other than main are stored as
+    'component.attribute'.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._values: Dict[str, Dict[str, Any]] = {}
+        self._updated: Dict[str, float] = {}
+        self.events = 0
+        self.polled = 0
+
+    def apply_event(self, device_id: str, attribute: str, value: Any,
+                    component: str = 'main') -> bool:
+        """Apply one device event; return True if the value changed."""
+        self.events += 1
+        key = attribute if component == 'main' else f"{component}.{attribute}"
+        values = self._values.setdefault(device_id, {})
+        changed = key not in values or values[key] != value
+        values[key] = value
+        self._updated[device_id] = self._clock()
+        return changed
+
+    def apply_status(self, device_id: str, status: Dict[str, Any]) -> int:
+        """Apply a polled status; return the number of attributes that changed."""
+        self.polled += 1
+        values = self._values.setdefault(device_id, {})
+        changed = 0
+        for attribute, value in status.items():
+            if attribute not in values or values[attribute] != value:
+                values[attribute] = value
+                changed += 1
+        self._updated[device_id] = self._clock()
+        return changed
+
+    def get(self, device_id: str) -> Dict[str, Any]:
+        """Return a copy of a device's known attribute values."""
+        return dict(self._values.get(device_id, {}))
+
+    def stale(self, device_ids: Iterable[str], max_age: float) -> List[str]:
+        """Return the devices not updated in the last max_age seconds."""
+        cutoff = self._clock() - max_age
+        return [device_id for device_id in device_ids
+                if self._updated.get(device_id, float('-inf')) <= cutoff]
+
+class EventReceiver:
+    """
+    Local aiohttp server receiving SmartThings webhook SmartApp requests.
+
+    DEVICE_EVENT events are applied to the store. PING, CONFIRMATION and
+    CONFIGURATION lifecycles are answered so the app can be registered and
+    installed, and INSTALL/UPDATE subscribe the installed app to events of
+    every tracked device. Requests are not signature-checked, so keep it
+    bound to localhost behind a proxy.
+    """
+
+    def __init__(self, store: DeviceStateStore, host: str = DEFAULT_WEBHOOK_HOST,
+                 port: int = DEFAULT_WEBHOOK_PORT, path: str = DEFAULT_WEBHOOK_PATH,
+                 device_ids: Iterable[str] = ()):
+        """
+        Args:
+            store: State store events are applied to
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            path: URL path SmartThings posts to
+            device_ids: Devices subscribed to when the app is installed or updated
+        """
+        self.store = store
+        self.device_ids = list(device_ids)
+        self.host = host
+        self.port = port
+        self.path = path
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        """URL the receiver is listening on."""
+        return f"http://{self.host}:{self.port}{self.path}"
+
+    async def start(self) -> None:
+        """Start serving in the running event loop."""
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        """Handle one lifecycle request."""
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({'error': 'invalid JSON'}, status=400)
+
+        lifecycle = body.get('lifecycle')
+        if lifecycle == 'PING':
+            return web.json_response(
+                {'pingData': {'challenge': body.get('pingData', {}).get('challenge')}})
+        if lifecycle == 'CONFIRMATION':
+            print(f"Confirm the webhook at: {body.get('confirmationData', {}).get('confirmationUrl')}")
+        elif lifecycle == 'CONFIGURATION':
+            return web.json_response(
+                {'configurationData': self._configuration(body.get('configurationData', {}))})
+        elif lifecycle in ('INSTALL', 'UPDATE'):
+            data = body.get('installData' if lifecycle == 'INSTALL' else 'updateData', {})
+            await self._subscribe(data, replace=lifecycle == 'UPDATE')
+            return web.json_response({f"{lifecycle.lower()}Data": {}})
+        elif lifecycle == 'EVENT':
+            for event in body.get('eventData', {}).get('events', []):
+                if event.get('eventType') != 'DEVICE_EVENT':
+                    continue
+                device_event = event.get('deviceEvent', {})
+                self.store.apply_event(device_event.get('deviceId'), device_event.get('attribute'),
+                                       device_event.get('value'),
+                                       device_event.get('componentId', 'main'))
+            return web.json_response({'eventData': {}})
+        return web.json_response({})
+
+    @staticmethod
+    def _configuration(data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Answer a CONFIGURATION request.
+
+        The app has no settings: it asks for read access to every device
+        and shows a single empty page so installation can complete.
+        """
+        if data.get('phase') == 'INITIALIZE':
+            return {'initialize': {'id': 'state-sync', 'name': 'State sync',
+                                   'description': 'Forward device events to the local store',
+                                   'permissions': ['r:devices:*'], 'firstPageId': '1'}}
+        return {'page': {'pageId': '1', 'name': 'State sync', 'complete': True,
+                         'nextPageId': None, 'previousPageId': None, 'sections': []}}
+
+    async def _subscribe(self, data: Dict[str, Any], replace: bool = False) -> int:
+        """
+        Subscribe an installed app to events of every tracked device.
+
+        Args:
+            data: installData or updateData of the lifecycle request
+            replace: Delete the app's existing subscriptions first
+
+        Returns:
+            Number of subscriptions created
+        """
+        installed_app_id = data.get('installedApp', {}).get('installedAppId')
+        async with aiohttp.ClientSession() as session:
+            # The installed app's token, not the personal one, owns its subscriptions
+            service = Api(session, data.get('authToken'))
+            try:
+                if replace:
+                    await service.delete_all_subscriptions(installed_app_id)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Could not remove old subscriptions of {installed_app_id}: {e}")
+            results = await asyncio.gather(
+                *(service.create_subscription(installed_app_id, {
+                    'sourceType': 'DEVICE',
+                    'device': {'deviceId': device_id, 'stateChangeOnly': True,
+                               'subscriptionName': f"device_{i}"},
+                  }) for i, device_id in enumerate(self.device_ids)),
+                return_exceptions=True)
+        created = 0
+        for device_id, result in zip(self.device_ids, results):
+            if isinstance(result, Exception):
+                print(f"Could not subscribe to {device_id}: {result}")
+            else:
+                created += 1
+        print(f"Subscribed {installed_app_id} to {created}/{len(self.device_ids)} devices")
+        return created
+
+class StateSync:
+    """
+    Keep a DeviceStateStore current from webhook events.
+
+    Every device is polled once at start-up. After that, only devices that
+    have gone stale_after seconds without an event or poll are polled, in
+    case their events were missed, and only changed attributes are applied.
+
+    Example:
+        >>> sync = StateSync(api, device_ids, port=8088)
+        >>> await sync.run()
+    """
+
+    def __init__(
+        self,
+        api,
+        device_ids: Iterable[str],
+        store: Optional[DeviceStateStore] = None,
+        stale_after: float = EVENT_STALE_AFTER,
+        check_interval: float = STALE_CHECK_INTERVAL,
+        host: str = DEFAULT_WEBHOOK_HOST,
+        port: int = DEFAULT_WEBHOOK_PORT,
+    ):
+        """
+        Args:
+            api: SmartThings API client used for fallback polls
+            device_ids: Devices to track
+            store: State store to update (a new one if None)
+            stale_after: Seconds without updates before a device is polled
+            check_interval: Seconds between checks for stale devices
+            host: Interface the webhook receiver binds
+            port: Port the webhook receiver binds
+        """
+        self.api = api
+        self.device_ids = list(dict.fromkeys(device_ids))
+        self.store = store or DeviceStateStore()
+        self.stale_after = stale_after
+        self.check_interval = check_interval
+        self.receiver = EventReceiver(self.store, host, port, device_ids=self.device_ids)
+        self._stop = asyncio.Event()
+
+    def stop(self) -> None:
+        """Ask run() to return after the current check."""
+        self._stop.set()
+
+    async def poll(self, device_ids: Iterable[str]) -> int:
+        """
+        Poll devices and apply the differences to the store.
+
+        Returns:
+            Number of attributes that changed
+        """
+        changed = 0
+        for result in await get_device_statuses(_status_entities(self.api, device_ids)):
+            if result['ok']:
+                changed += self.store.apply_status(result['device_id'], result['status'])
+            else:
+                print(f"Status of {result['device_id']} not polled: {result['error']}")
+        return changed
+
+    async def run(self) -> None:
+        """Receive events and poll stale devices until stop() is called."""
+        await self.receiver.start()
+        try:
+            await self.poll(self.device_ids)
+            while not self._stop.is_set():
+                try:
+                    await asyncio.wait_for(self._stop.wait(), self.check_interval)
+                except asyncio.TimeoutError:
+                    stale = self.store.stale(self.device_ids, self.stale_after)
+                    if stale:
+                        await self.poll(stale)
+        finally:
+            await self.receiver.stop()
+
+async def listen_for_events(host: str = DEFAULT_WEBHOOK_HOST,
+                            port: int = DEFAULT_WEBHOOK_PORT) -> None:
+    """Run the webhook receiver for every cached device until interrupted."""
+    async with aiohttp.ClientSession() as session:
+        api = pysmartthings.SmartThings(session, config('smart_things_pat'))
+        devices = await get_device_cache().devices(api)
+        sync = StateSync(api, [device['device_id'] for device in devices], host=host, port=port)
+        print(f"Receiving SmartThings events on {sync.receiver.url}")
+        try:
+            await sync.run()
+        finally:
+            print(f"{sync.store.events} events applied, {sync.store.polled} device polls")
+
 async def main() -> None:
     """Main async function to list SmartThings devices."""
-    await list_devices()
+    parser = argparse.ArgumentParser(description='SmartThings device tools.')
+    parser.add_argument('--status', action='store_true',
+                        help='Refresh the status of every device')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Download the device list even if the cache is fresh')
+    parser.add_argument('--capability', help='Only list devices with this capability')
+    parser.add_argument('--command', nargs='+', metavar=('CAPABILITY:COMMAND', 'ARG'),
+                        help='Send a command to every device with the capability, '
+                             'e.g. switch:off or switchLevel:setLevel 20')
+    parser.add_argument('--room', help='Only send --command to devices in this room ID')
+    parser.add_argument('--listen', action='store_true',
+                        help='Receive webhook events and keep device state current')
+    parser.add_argument('--port', type=int, default=DEFAULT_WEBHOOK_PORT,
+                        help='Port for --listen')
+    args = parser.parse_args()
+
+    if args.listen:
+        await listen_for_events(port=args.port)
+    elif args.command:
+        capability, _, command = args.command[0].partition(':')
+        command_args = [int(a) if a.lstrip('-').isdigit() else a for a in args.command[1:]]
+        await run_bulk_command(capability, command, command_args or None, args.room)
+    elif args.status:
+        await refresh_all_statuses()
+    else:
+        await list_cached_devices(args.refresh, args.capability)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,16 +1,184 @@
 """Roku device control and app launching utility."""
+import argparse
+import asyncio
 import re
-from typing import List
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Sequence, Union
+from urllib.parse import quote
+from xml.etree import ElementTree
+import requests
 from roku import Roku
-from decouple import config
+from decouple import config, Csv
+from utils.cache import TTLCache
 
-# Set roku IP address from environment or use default
-roku_ip = config('roku_ip', default='192.168.0.8')
-roku = Roku(roku_ip)
+# aiohttp is imported where it is used so that importing this module stays cheap
+if TYPE_CHECKING:
+    import aiohttp
+
+DEFAULT_ROKU_IP = '192.168.0.8'
+ECP_PORT = 8060
+# ECP commands return almost immediately; a TV that takes longer is treated as failed
+ECP_TIMEOUT = 5
+# Installed apps rarely change; installs and uninstalls are detected on use
+APP_CATALOG_TTL = 24 * 60 * 60
+DEFAULT_APP_CACHE_FILE = str(Path.home() / '.cache' / 'python_fun' / 'roku_apps.json')
+# Default gap between macro steps; Roku UIs drop keys sent much faster than this
+MACRO_KEY_INTERVAL = 0.2
+
+@lru_cache(maxsize=None)
+def get_roku() -> Roku:
+    """
+    Return the Roku device client, created on first use.
+
+    The IP address is read from the roku_ip setting, falling back to
+    DEFAULT_ROKU_IP.
+    """
+    return Roku(config('roku_ip', default=DEFAULT_ROKU_IP))
+
+@lru_cache(maxsize=None)
+def _get_ecp_session() -> requests.Session:
+    """Return the shared HTTP session used for direct ECP calls."""
+    return requests.Session()
+
+def _default_device() -> str:
+    """Return the address of the single configured device."""
+    return config('roku_ip', default=DEFAULT_ROKU_IP)
+
+def _ecp_url(device: str) -> str:
+    """Return the ECP base URL of a device address (``ip`` or ``ip:port``)."""
+    return f"http://{device}" if ':' in device else f"http://{device}:{ECP_PORT}"
+
+###########################################################################################
+# AppCatalog
+# Per-device installed apps, cached and indexed by ID and name
+###########################################################################################
+class AppCatalog:
+    """
+    Cache of each device's installed apps, indexed by ID and by name.
+
+    Catalogs are persisted for APP_CATALOG_TTL so a known app can be
+    launched without fetching /query/apps first. A catalog is dropped when
+    a launch of a cached ID fails (app uninstalled) and refetched when a
+    name is not found (app installed since the last fetch).
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = APP_CATALOG_TTL):
+        """
+        Args:
+            path: JSON file catalogs are persisted to (in-memory if None)
+            ttl: Seconds a fetched catalog stays valid
+        """
+        self._cache = TTLCache(ttl, path=path)
+
+    def apps(self, device: str, refresh: bool = False) -> Dict[str, str]:
+        """Return {app ID: app name} for a device, fetching it if not cached."""
+        catalog = None if refresh else self._cache.get(device)
+        if catalog is None:
+            catalog = self._fetch(device)
+            self._cache.set(device, catalog)
+        return catalog['by_id']
+
+    def find(self, device: str, name: str) -> Optional[str]:
+        """
+        Return the ID of an app by name (case-insensitive).
+
+        The cached catalog is used when it knows the name; otherwise it is
+        refetched once in case the app was installed since.
+        """
+        key = name.strip().lower()
+        catalog = self._cache.get(device)
+        if catalog and key in catalog['by_name']:
+            return catalog['by_name'][key]
+        self.apps(device, refresh=True)
+        return self._cache.get(device)['by_name'].get(key)
+
+    def invalidate(self, device: Optional[str] = None) -> None:
+        """Forget the catalog of one device, or of every device."""
+        if device is None:
+            self._cache.clear()
+        else:
+            self._cache.delete(device)
+
+    @staticmethod
+    def _fetch(device: str) -> Dict[str, Dict[str, str]]:
+        """Fetch and index a device's /query/apps."""
+        response = _get_ecp_session().get(f"{_ecp_url(device)}/query/apps", timeout=ECP_TIMEOUT)
+        response.raise_for_status()
+        by_id = {}
+        for app in ElementTree.fromstring(response.content).iter('app'):
+            by_id[app.get('id')] = (app.text or '').strip()
+        by_name = {name.lower(): app_id for app_id, name in by_id.items()}
+        return {'by_id': by_id, 'by_name': by_name}
+
+class CatalogApp(NamedTuple):
+    """One installed app, shown like the roku library's App ("Netflix [12]")."""
+
+    id: str
+    name: str
+
+    def __str__(self) -> str:
+        return f"{self.name} [{self.id}]"
+
+@lru_cache(maxsize=None)
+def get_app_catalog() -> AppCatalog:
+    """Return the persistent app catalog."""
+    return AppCatalog(config('roku_app_cache_file', default=DEFAULT_APP_CACHE_FILE))
+
+def launch_app_id(app_id: str, device: Optional[str] = None) -> bool:
+    """
+    Launch an app by ID with a single ECP POST.
+
+    Returns:
+        True if the device accepted the launch
+    """
+    device = device or _default_device()
+    try:
+        response = _get_ecp_session().post(f"{_ecp_url(device)}/launch/{app_id}",
+                                           timeout=ECP_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        print(f"Network error launching app {app_id} on {device}: {e}")
+        return False
+    return response.status_code < 400
+
+def launch_by_name(name: str, device: Optional[str] = None) -> bool:
+    """
+    Launch an app by name.
+
+    When the app's ID is cached this is a single ECP POST with no catalog
+    fetch. If that launch fails the app may have been uninstalled, so the
+    catalog is refreshed and the launch retried once.
+
+    Args:
+        name: App name, case-insensitive (e.g. 'Netflix')
+        device: Device address (default: the roku_ip setting)
+
+    Returns:
+        True if the app was launched
+    """
+    device = device or _default_device()
+    catalog = get_app_catalog()
+    try:
+        app_id = catalog.find(device, name)
+        if app_id:
+            if launch_app_id(app_id, device):
+                return True
+            # find() already refetched for an unknown name, so only a
+            # failed launch of a known ID is worth a fresh catalog
+            catalog.invalidate(device)
+            app_id = catalog.find(device, name)
+    except (requests.exceptions.RequestException, ElementTree.ParseError) as e:
+        print(f"Could not read the app list of {device}: {e}")
+        return False
+    if not app_id:
+        print(f"App '{name}' is not installed on {device}")
+        return False
+    return launch_app_id(app_id, device)
 
 def roku_home() -> None:
     """Navigate Roku device to home screen."""
-    roku.home()
+    get_roku().home()
 
 def select_app(applications: List) -> str:
     """
@@ -31,24 +199,283 @@ def select_app(applications: List) -> str:
 
     # Set the selected application as a variable
     selected_application = applications[choice - 1]
-    selected_application_str = str(selected_application)
-    number = re.search(r'\[(\d+)\]', selected_application_str).group(1)
+    number = getattr(selected_application, 'id', None)
+    if number is None:
+        # Plain strings look like "Netflix [12]"
+        number = re.search(r'\[(\d+)\]', str(selected_application)).group(1)
     print(number)
     return number
 
 def launch_app() -> None:
     """Launch a Roku application selected by the user."""
-    apps = roku.apps
-    number = select_app(apps)
-    roku[number].launch()
+    device = _default_device()
+    apps = get_app_catalog().apps(device)
+    number = select_app([CatalogApp(app_id, name) for app_id, name in apps.items()])
+    if not launch_app_id(number, device):
+        # The app may have been uninstalled since the catalog was cached
+        get_app_catalog().invalidate(device)
+        print(f"Failed to launch app {number}")
 
 def get_apps() -> None:
     """Display all available Roku applications."""
-    apps = roku.apps
+    apps = get_roku().apps
     print(apps)
 
+###########################################################################################
+# RokuController
+# Send ECP commands to many devices at once over kept-alive connections
+###########################################################################################
+def get_device_ips() -> List[str]:
+    """
+    Return the devices to control.
+
+    Uses the roku_ips setting (comma separated, ``ip`` or ``ip:port``) when
+    set, otherwise the devices known to or discovered by getips.
+    """
+    ips = config('roku_ips', default='', cast=Csv())
+    if ips:
+        return ips
+    from getips import get_roku_ips
+    return get_roku_ips()
+
+class RokuController:
+    """
+    Control a set of Roku devices concurrently over ECP.
+
+    One aiohttp session is shared by all devices and keeps one connection
+    alive per device, so a broadcast costs a single round trip to the
+    slowest device instead of one round trip per device.
+
+    Example:
+        >>> async with RokuController(['192.168.0.8', '192.168.0.9']) as wall:
+        ...     results = await wall.launch('12')
+    """
+
+    def __init__(self, devices: Sequence[str], timeout: float = ECP_TIMEOUT):
+        """
+        Args:
+            devices: Device addresses, ``ip`` or ``ip:port`` (default port 8060)
+            timeout: Per-request timeout in seconds
+        """
+        self.devices = list(dict.fromkeys(devices))
+        self.timeout = timeout
+        self.session: Optional['aiohttp.ClientSession'] = None
+
+    async def __aenter__(self) -> 'RokuController':
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=4, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.session.close()
+        self.session = None
+
+    @staticmethod
+    def base_url(device: str) -> str:
+        """Return the ECP base URL of a device address."""
+        return _ecp_url(device)
+
+    async def request(self, device: str, method: str, path: str) -> Dict:
+        """
+        Send one ECP request to one device.
+
+        Returns:
+            Result dict with device, ok, status, latency (seconds), error and body
+        """
+        import aiohttp
+
+        started = time.perf_counter()
+        try:
+            async with self.session.request(method, self.base_url(device) + path) as response:
+                body = await response.read()
+                ok = response.status < 400
+                return _command_result(device, ok, response.status,
+                                       time.perf_counter() - started,
+                                       None if ok else f"HTTP {response.status}", body)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return _command_result(device, False, None, time.perf_counter() - started,
+                                   f"{type(e).__name__}: {e}")
+
+    async def broadcast(self, method: str, path: str) -> List[Dict]:
+        """Send the same ECP request to every device concurrently."""
+        return list(await asyncio.gather(
+            *(self.request(device, method, path) for device in self.devices)))
+
+    async def keypress(self, key: str) -> List[Dict]:
+        """Press a remote key (e.g. Home, Select, Up) on every device."""
+        return await self.broadcast('POST', f"/keypress/{key}")
+
+    async def home(self) -> List[Dict]:
+        """Go to the home screen on every device."""
+        return await self.keypress('Home')
+
+    async def launch(self, app_id: str) -> List[Dict]:
+        """Launch an app by ID on every device."""
+        return await self.broadcast('POST', f"/launch/{app_id}")
+
+    async def run_macro(self, macro: Union[str, Sequence['MacroStep']],
+                        interval: float = MACRO_KEY_INTERVAL) -> List[Dict]:
+        """
+        Play a macro on every device concurrently.
+
+        Returns:
+            One result per device with device, ok, latency (whole macro),
+            error and steps (the per-request results) keys
+        """
+        steps = compile_macro(macro) if isinstance(macro, str) else list(macro)
+        return list(await asyncio.gather(
+            *(self._play(device, steps, interval) for device in self.devices)))
+
+    async def _play(self, device: str, steps: Sequence['MacroStep'], interval: float) -> Dict:
+        """
+        Play steps on one device.
+
+        Requests go out one after another on the device's kept-alive
+        connection. Each step is scheduled against the macro's start time
+        rather than the previous response, so request latency does not
+        stretch the pacing. A failed step aborts the macro for that device.
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        due = loop.time()
+        results = []
+        for step in steps:
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if step.path is None:
+                due += step.pause
+                continue
+            result = await self.request(device, 'POST', step.path)
+            results.append(result)
+            if not result['ok']:
+                return _macro_result(device, False, time.perf_counter() - started, results,
+                                     f"step {len(results)} ({step.path}) failed: {result['error']}")
+            due += interval + step.pause
+        return _macro_result(device, True, time.perf_counter() - started, results)
+
+###########################################################################################
+# Macros
+# "Home, Down*2, Select, text:stranger things, wait:1.5, launch:12"
+###########################################################################################
+class MacroStep(NamedTuple):
+    """One compiled macro step: an ECP path to POST (None for a pure pause)."""
+
+    path: Optional[str]
+    pause: float = 0.0
+
+def compile_macro(macro: str) -> List[MacroStep]:
+    """
+    Compile a comma separated macro into ECP requests (so text steps
+    cannot contain commas).
+
+    Steps:
+        ``Key``            press a remote key (Home, Up, Select, ...)
+        ``Key*N``          press a key N times
+        ``text:hello``     type text, one Lit_ keypress per character
+        ``launch:APP_ID``  launch an app
+        ``wait:SECONDS``   pause before the next step
+
+    Raises:
+        ValueError: If a step cannot be parsed
+    """
+    steps = []
+    for token in (part.strip() for part in macro.split(',')):
+        if not token:
+            continue
+        kind, sep, arg = token.partition(':')
+        kind = kind.strip().lower() if sep else ''
+        if kind == 'text':
+            steps.extend(MacroStep(f"/keypress/Lit_{quote(char, safe='')}") for char in arg)
+        elif kind == 'launch':
+            steps.append(MacroStep(f"/launch/{quote(arg.strip(), safe='')}"))
+        elif kind == 'wait':
+            try:
+                steps.append(MacroStep(None, float(arg)))
+            except ValueError:
+                raise ValueError(f"Invalid wait in macro step '{token}'") from None
+        elif sep:
+            raise ValueError(f"Unknown macro step '{token}'")
+        else:
+            key, _, count = token.partition('*')
+            if not key.strip().isalnum() or (count and not count.strip().isdigit()):
+                raise ValueError(f"Invalid key in macro step '{token}'")
+            steps.extend([MacroStep(f"/keypress/{key.strip()}")] * int(count or 1))
+    return steps
+
+def _command_result(device: str, ok: bool, status: Optional[int], latency: float,
+                    error: Optional[str] = None, body: bytes = b'') -> Dict:
+    """Build one RokuController result."""
+    return {
+        'device': device,
+        'ok': ok,
+        'status': status,
+        'latency': latency,
+        'error': error,
+        'body': body,
+    }
+
+def _macro_result(device: str, ok: bool, latency: float, steps: List[Dict],
+                  error: Optional[str] = None) -> Dict:
+    """Build one RokuController.run_macro result."""
+    return {
+        'device': device,
+        'ok': ok,
+        'latency': latency,
+        'error': error,
+        'steps': steps,
+    }
+
+def print_results(results: List[Dict]) -> None:
+    """Print per-device latency and failures of a broadcast."""
+    for result in results:
+        if result['ok']:
+            print(f"{result['device']}: ok in {result['latency'] * 1000:.0f} ms")
+        else:
+            print(f"{result['device']}: FAILED ({result['error']})")
+    failed = sum(1 for result in results if not result['ok'])
+    print(f"{len(results) - failed}/{len(results)} devices succeeded")
+
+async def _run_on_all(devices: Sequence[str], command: str, *args) -> List[Dict]:
+    """Open a controller for devices and run one of its commands."""
+    async with RokuController(devices) as controller:
+        return await getattr(controller, command)(*args)
+
 def main() -> None:
-    """Main function to launch Roku app selector."""
+    """Launch the interactive app selector, or control every device at once."""
+    parser = argparse.ArgumentParser(description='Control Roku devices.')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--home-all', action='store_true',
+                       help='Send every device to the home screen')
+    group.add_argument('--launch-all', metavar='APP_ID',
+                       help='Launch an app by ID on every device')
+    group.add_argument('--macro', help='Play a macro, e.g. "Home, Down*2, Select"')
+    parser.add_argument('--interval', type=float, default=MACRO_KEY_INTERVAL,
+                        help='Seconds between macro steps')
+    args = parser.parse_args()
+
+    if args.home_all or args.launch_all or args.macro:
+        devices = get_device_ips()
+        if not devices:
+            print("No Roku devices configured or found on the network")
+            return
+        if args.home_all:
+            results = asyncio.run(_run_on_all(devices, 'home'))
+        elif args.launch_all:
+            results = asyncio.run(_run_on_all(devices, 'launch', args.launch_all))
+        else:
+            try:
+                steps = compile_macro(args.macro)
+            except ValueError as e:
+                print(e)
+                return
+            results = asyncio.run(_run_on_all(devices, 'run_macro', steps, args.interval))
+        print_results(results)
+        return
+
     launch_app()
 
 if __name__ == "__main__":
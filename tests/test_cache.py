@@ -0,0 +1,160 @@
+"""Unit tests for utils/cache module."""
+import pytest
+from utils.cache import TTLCache
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    """Tests for TTLCache."""
+
+    def test_set_and_get(self):
+        """Test stored values are returned."""
+        cache = TTLCache(ttl=60)
+        cache.set('a', 1)
+
+        assert cache.get('a') == 1
+        assert 'a' in cache
+
+    def test_missing_key_returns_default(self):
+        """Test missing keys return the default."""
+        cache = TTLCache(ttl=60)
+
+        assert cache.get('missing') is None
+        assert cache.get('missing', 'fallback') == 'fallback'
+
+    def test_entry_expires(self):
+        """Test entries are dropped once their TTL passes."""
+        clock = FakeClock()
+        cache = TTLCache(ttl=60, clock=clock)
+        cache.set('a', 1)
+
+        clock.now += 61
+
+        assert cache.get('a') is None
+        assert cache.stats()['expired'] == 1
+        assert len(cache) == 0
+
+    def test_per_entry_ttl(self):
+        """Test a per-entry TTL overrides the default."""
+        clock = FakeClock()
+        cache = TTLCache(ttl=60, clock=clock)
+        cache.set('short', 1, ttl=5)
+        cache.set('long', 2)
+
+        clock.now += 10
+
+        assert cache.get('short') is None
+        assert cache.get('long') == 2
+
+    def test_stats(self):
+        """Test hit and miss counters."""
+        cache = TTLCache(ttl=60)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+
+        stats = cache.stats()
+        assert stats['hits'] == 2
+        assert stats['misses'] == 1
+        assert stats['size'] == 1
+
+    def test_delete_and_clear(self):
+        """Test entries can be removed individually or all at once."""
+        cache = TTLCache(ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        cache.delete('a')
+        assert cache.get('a') is None
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_set_many_persists_once(self, tmp_path):
+        """Test set_many stores every item and writes the file."""
+        path = tmp_path / 'cache.json'
+        TTLCache(ttl=60, path=str(path)).set_many({'a': 1, 'b': 2})
+
+        reloaded = TTLCache(ttl=60, path=str(path))
+
+        assert reloaded.get('a') == 1
+        assert reloaded.get('b') == 2
+
+    def test_items_skips_expired(self):
+        """Test items() only returns live entries."""
+        clock = FakeClock()
+        cache = TTLCache(ttl=60, clock=clock)
+        cache.set('old', 1, ttl=5)
+        cache.set('new', 2)
+
+        clock.now += 10
+
+        assert cache.items() == [('new', 2)]
+
+    def test_max_entries_evicts_oldest(self):
+        """Test the oldest entry is evicted when the cache is full."""
+        cache = TTLCache(ttl=60, max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+
+        assert cache.get('a') is None
+        assert cache.get('c') == 3
+        assert cache.stats()['evicted'] == 1
+
+    def test_persists_between_instances(self, tmp_path):
+        """Test entries are reloaded from the JSON file."""
+        path = tmp_path / 'cache.json'
+        TTLCache(ttl=60, path=str(path)).set('ip', '203.0.113.7')
+
+        reloaded = TTLCache(ttl=60, path=str(path))
+
+        assert reloaded.get('ip') == '203.0.113.7'
+
+    def test_expired_entries_not_reloaded(self, tmp_path):
+        """Test persisted entries past their expiry are skipped on load."""
+        path = tmp_path / 'cache.json'
+        clock = FakeClock()
+        TTLCache(ttl=60, path=str(path), clock=clock).set('ip', '203.0.113.7')
+
+        clock.now += 120
+        reloaded = TTLCache(ttl=60, path=str(path), clock=clock)
+
+        assert len(reloaded) == 0
+
+    def test_corrupt_file_ignored(self, tmp_path):
+        """Test an unreadable cache file starts an empty cache."""
+        path = tmp_path / 'cache.json'
+        path.write_text('not json')
+
+        cache = TTLCache(ttl=60, path=str(path))
+
+        assert len(cache) == 0
+
+    def test_home_directory_expanded(self, tmp_path, monkeypatch):
+        """Test a '~' path is saved under the home directory."""
+        monkeypatch.setenv('HOME', str(tmp_path))
+        cache = TTLCache(ttl=60, path='~/.cache/geo.json')
+        cache.set('a', 1)
+
+        assert (tmp_path / '.cache' / 'geo.json').exists()
+
+    def test_autosave_off_until_save(self, tmp_path):
+        """Test changes are only written when save() is called."""
+        path = tmp_path / 'cache.json'
+        cache = TTLCache(ttl=60, path=str(path), autosave=False)
+        cache.set('a', 1)
+        assert not path.exists()
+
+        cache.save()
+
+        assert TTLCache(ttl=60, path=str(path)).get('a') == 1
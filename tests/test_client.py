@@ -0,0 +1,64 @@
+"""Unit tests for github_tools/client module."""
+import pytest
+from unittest.mock import patch
+from github_tools.client import get_client, close_clients
+
+
+@pytest.fixture(autouse=True)
+def clear_client_cache():
+    """Start and end each test with an empty client cache."""
+    close_clients()
+    yield
+    close_clients()
+
+
+class TestGetClient:
+    """Tests for get_client factory."""
+
+    @patch('github.Github')
+    def test_client_is_cached(self, mock_github_class):
+        """Test the same configuration returns the same client instance."""
+        first = get_client('test-token')
+        second = get_client('test-token')
+
+        assert first is second
+        mock_github_class.assert_called_once()
+        assert mock_github_class.call_args.kwargs['pool_size'] == 10
+
+    @patch('github.Github')
+    def test_different_configuration_builds_new_client(self, mock_github_class):
+        """Test token and pool size are part of the cache key."""
+        get_client('token-a')
+        get_client('token-b')
+        get_client('token-a', pool_size=32)
+
+        assert mock_github_class.call_count == 3
+
+    @patch('github.Github')
+    def test_unthrottled_client_disables_spacing(self, mock_github_class):
+        """Test throttled=False turns off PyGithub's request spacing."""
+        get_client('test-token', throttled=False)
+
+        kwargs = mock_github_class.call_args.kwargs
+        assert kwargs['seconds_between_requests'] is None
+        assert kwargs['seconds_between_writes'] is None
+
+    @patch('github.Github')
+    def test_token_defaults_to_config(self, mock_github_class, monkeypatch):
+        """Test the token is read from github_pat when not given."""
+        monkeypatch.setenv('github_pat', 'env-token')
+
+        get_client()
+
+        assert mock_github_class.call_args.kwargs['auth'].token == 'env-token'
+
+    @patch('github.Github')
+    def test_close_clients(self, mock_github_class):
+        """Test cached clients are closed and dropped from the cache."""
+        client = get_client('test-token')
+
+        close_clients()
+        get_client('test-token')
+
+        client.close.assert_called_once()
+        assert mock_github_class.call_count == 2
@@ -1,13 +1,18 @@
-"""Unit tests for github/create_repo module."""
+"""Unit tests for github_tools/create_repo module."""
 import pytest
 from unittest.mock import patch, Mock
-from github.create_repo import create_github_repo
+from github_tools.create_repo import (
+    create_github_repo,
+    create_github_repos,
+    load_manifest,
+    write_report,
+)
 
 
 class TestCreateGithubRepo:
     """Tests for create_github_repo function."""
 
-    @patch('github.create_repo.Github')
+    @patch('github_tools.create_repo.get_client')
     def test_create_repo_success(self, mock_github_class):
         """Test successful repository creation."""
         # Mock Github instance
@@ -39,7 +44,7 @@ class TestCreateGithubRepo:
             private=False
         )
 
-    @patch('github.create_repo.Github')
+    @patch('github_tools.create_repo.get_client')
     def test_create_private_repo(self, mock_github_class):
         """Test creating a private repository."""
         mock_github = Mock()
@@ -67,7 +72,7 @@ class TestCreateGithubRepo:
             private=True
         )
 
-    @patch('github.create_repo.Github')
+    @patch('github_tools.create_repo.get_client')
     def test_create_repo_authentication_error(self, mock_github_class):
         """Test repository creation with authentication error."""
         mock_github = Mock()
@@ -88,7 +93,7 @@ class TestCreateGithubRepo:
         assert error is not None
         assert "Bad credentials" in error
 
-    @patch('github.create_repo.Github')
+    @patch('github_tools.create_repo.get_client')
     def test_create_repo_already_exists(self, mock_github_class):
         """Test repository creation when repo already exists."""
         mock_github = Mock()
@@ -109,7 +114,7 @@ class TestCreateGithubRepo:
         assert error is not None
         assert "already exists" in error.lower()
 
-    @patch('github.create_repo.Github')
+    @patch('github_tools.create_repo.get_client')
     def test_create_repo_with_empty_description(self, mock_github_class):
         """Test creating repository with empty description."""
         mock_github = Mock()
@@ -137,7 +142,7 @@ class TestCreateGithubRepo:
             private=False
         )
 
-    @patch('github.create_repo.Github')
+    @patch('github_tools.create_repo.get_client')
     def test_create_repo_network_error(self, mock_github_class):
         """Test repository creation with network error."""
         mock_github_class.side_effect = Exception("Network error")
@@ -152,3 +157,143 @@ class TestCreateGithubRepo:
         assert repo is None
         assert error is not None
         assert "Network error" in error
+
+
+class TestCreateGithubReposBulk:
+    """Tests for create_github_repos bulk function."""
+
+    def _mock_user(self, mock_github_class, existing=()):
+        mock_github = Mock()
+        mock_github_class.return_value = mock_github
+        mock_user = Mock()
+        mock_github.get_user.return_value = mock_user
+        existing_repos = []
+        for name in existing:
+            repo = Mock()
+            repo.name = name
+            existing_repos.append(repo)
+        mock_user.get_repos.return_value = existing_repos
+
+        def create_repo(name, description, private):
+            repo = Mock()
+            repo.html_url = f'https://github.com/testuser/{name}'
+            return repo
+
+        mock_user.create_repo.side_effect = create_repo
+        return mock_user
+
+    @patch('github_tools.create_repo.get_client')
+    def test_creates_all_repos_with_one_client(self, mock_github_class):
+        """Test every manifest entry is created through a single client."""
+        mock_user = self._mock_user(mock_github_class)
+        manifest = [
+            {'name': f'repo-{i}', 'description': '', 'private': False}
+            for i in range(5)
+        ]
+
+        results = create_github_repos(manifest, 'test-token', max_workers=4, write_interval=0)
+
+        assert [r['name'] for r in results] == [f'repo-{i}' for i in range(5)]
+        assert all(r['status'] == 'created' for r in results)
+        assert results[0]['url'] == 'https://github.com/testuser/repo-0'
+        assert mock_github_class.call_count == 1
+        assert mock_github_class.call_args.kwargs == {'pool_size': 4, 'throttled': False}
+        assert mock_user.create_repo.call_count == 5
+
+    @patch('github_tools.create_repo.get_client')
+    def test_skips_existing_repos(self, mock_github_class):
+        """Test repos that already exist are skipped, not recreated."""
+        mock_user = self._mock_user(mock_github_class, existing=['Existing-Repo'])
+        manifest = [
+            {'name': 'existing-repo', 'description': '', 'private': False},
+            {'name': 'new-repo', 'description': 'New', 'private': True},
+        ]
+
+        results = create_github_repos(manifest, 'test-token', write_interval=0)
+
+        assert results[0]['status'] == 'skipped'
+        assert results[1]['status'] == 'created'
+        mock_user.create_repo.assert_called_once_with(
+            'new-repo', description='New', private=True
+        )
+
+    @patch('github_tools.create_repo.get_client')
+    def test_duplicate_manifest_entries_created_once(self, mock_github_class):
+        """Test duplicate names in the manifest only produce one create call."""
+        mock_user = self._mock_user(mock_github_class)
+        manifest = [
+            {'name': 'dup', 'description': '', 'private': False},
+            {'name': 'dup', 'description': '', 'private': False},
+        ]
+
+        results = create_github_repos(manifest, 'test-token', write_interval=0)
+
+        assert len(results) == 1
+        mock_user.create_repo.assert_called_once()
+
+    @patch('github_tools.create_repo.get_client')
+    def test_failure_reported_per_repo(self, mock_github_class):
+        """Test one failing repo does not stop the rest of the batch."""
+        mock_user = self._mock_user(mock_github_class)
+        create = mock_user.create_repo.side_effect
+
+        def flaky_create(name, description, private):
+            if name == 'bad':
+                raise Exception("Server error")
+            return create(name, description, private)
+
+        mock_user.create_repo.side_effect = flaky_create
+        manifest = [
+            {'name': 'good', 'description': '', 'private': False},
+            {'name': 'bad', 'description': '', 'private': False},
+        ]
+
+        results = create_github_repos(manifest, 'test-token', write_interval=0)
+
+        assert results[0]['status'] == 'created'
+        assert results[1]['status'] == 'failed'
+        assert "Server error" in results[1]['error']
+
+    @patch('github_tools.create_repo.get_client')
+    def test_authentication_failure_fails_all(self, mock_github_class):
+        """Test a client/auth error marks every entry as failed."""
+        mock_github_class.side_effect = Exception("Bad credentials")
+        manifest = [{'name': 'a', 'description': '', 'private': False}]
+
+        results = create_github_repos(manifest, 'bad-token')
+
+        assert results[0]['status'] == 'failed'
+        assert "Bad credentials" in results[0]['error']
+
+
+class TestManifestAndReport:
+    """Tests for load_manifest and write_report."""
+
+    def test_load_manifest(self, tmp_path):
+        """Test manifest rows are parsed and blank names dropped."""
+        manifest = tmp_path / 'repos.csv'
+        manifest.write_text(
+            'name,description,private\n'
+            'repo-a,First,yes\n'
+            'repo-b,,no\n'
+            ',ignored,yes\n'
+        )
+
+        specs = load_manifest(str(manifest))
+
+        assert specs == [
+            {'name': 'repo-a', 'description': 'First', 'private': True},
+            {'name': 'repo-b', 'description': '', 'private': False},
+        ]
+
+    def test_write_report(self, tmp_path):
+        """Test results are written as CSV."""
+        report = tmp_path / 'report.csv'
+        results = [{'name': 'repo-a', 'status': 'created',
+                    'url': 'https://github.com/u/repo-a', 'error': None, 'elapsed': 0.5}]
+
+        write_report(results, str(report))
+
+        lines = report.read_text().splitlines()
+        assert lines[0] == 'name,status,url,error,elapsed'
+        assert lines[1].startswith('repo-a,created,')
@@ -0,0 +1,595 @@
+"""Unit tests for garmin module."""
+import argparse
+import array
+import datetime
+import io
+import json
+import threading
+import time
+import pytest
+import requests
+from unittest.mock import Mock, patch
+from garminconnect import GarminConnectConnectionError
+from garth.exc import GarthException, GarthHTTPError
+from garmin.garmin import (
+    ACTIVITY_ENDPOINTS, ActivityStore, AdaptiveBackoff, SeriesColumns, activity_snapshot,
+    device_snapshot, download_activities, download_activity_file, init_api, refresh_tokens,
+    run_headless, run_queries, store_metric_series, switch, sync_store,
+)
+
+
+class FakeResponse:
+    """Streaming response yielding content in small chunks."""
+
+    def __init__(self, content, fail_after=None):
+        self.content = content
+        self.fail_after = fail_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def iter_content(self, chunk_size):
+        for i, start in enumerate(range(0, len(self.content), 4)):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise OSError('connection reset')
+            yield self.content[start:start + 4]
+
+
+class FakeGarth:
+    """garth client serving '<url> payload' after delay seconds."""
+
+    def __init__(self, delay=0.0, errors=None):
+        self.delay = delay
+        self.errors = errors or {}
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, subdomain, path, api=False, stream=False):
+        with self._lock:
+            self.requests.append(path)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            error = self.errors.get(path)
+            if isinstance(error, Exception):
+                raise error
+            return FakeResponse(f'{path} payload'.encode(), fail_after=error)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class FakeGarmin:
+    """Garmin API exposing the download URL attributes and a garth client."""
+
+    garmin_connect_fit_download = '/download-service/files/activity'
+    garmin_connect_tcx_download = '/download-service/export/tcx/activity'
+    garmin_connect_gpx_download = '/download-service/export/gpx/activity'
+    garmin_connect_kml_download = '/download-service/export/kml/activity'
+    garmin_connect_csv_download = '/download-service/export/csv/activity'
+
+    def __init__(self, **kwargs):
+        self.garth = FakeGarth(**kwargs)
+
+
+class TestDownloadActivities:
+    """Tests for activity downloads."""
+
+    def test_streams_file_to_disk(self, tmp_path):
+        """Test a download is written under '<id>.<extension>'."""
+        api = FakeGarmin()
+
+        result = download_activity_file(api, 42, 'gpx', str(tmp_path))
+
+        assert result['status'] == 'downloaded'
+        assert (tmp_path / '42.gpx').read_bytes() == b'/download-service/export/gpx/activity/42 payload'
+        assert result['bytes'] == len(b'/download-service/export/gpx/activity/42 payload')
+        assert not (tmp_path / '42.gpx.part').exists()
+
+    def test_existing_files_skipped(self, tmp_path):
+        """Test files already on disk are not downloaded again."""
+        (tmp_path / '42.zip').write_bytes(b'old')
+        api = FakeGarmin()
+
+        results = download_activities(api, [{'activityId': 42}], ['original', 'csv'], str(tmp_path))
+
+        assert [r['status'] for r in results] == ['skipped', 'downloaded']
+        assert api.garth.requests == ['/download-service/export/csv/activity/42']
+        assert (tmp_path / '42.zip').read_bytes() == b'old'
+
+    def test_overwrite(self, tmp_path):
+        """Test overwrite downloads existing files again."""
+        (tmp_path / '42.zip').write_bytes(b'old')
+
+        result = download_activity_file(FakeGarmin(), 42, 'original', str(tmp_path), overwrite=True)
+
+        assert result['status'] == 'downloaded'
+        assert (tmp_path / '42.zip').read_bytes() != b'old'
+
+    def test_downloads_run_concurrently(self, tmp_path):
+        """Test a month of activities downloads with bounded parallelism."""
+        api = FakeGarmin(delay=0.05)
+        activities = [{'activityId': i} for i in range(30)]
+
+        started = time.monotonic()
+        results = download_activities(api, activities, ['gpx', 'tcx', 'original', 'csv'],
+                                      str(tmp_path), max_workers=8)
+
+        assert len(results) == 120
+        assert all(r['status'] == 'downloaded' for r in results)
+        assert api.garth.peak == 8
+        # 120 x 50 ms serially would take 6 s
+        assert time.monotonic() - started < 2
+
+    def test_failures_reported_and_cleaned_up(self, tmp_path):
+        """Test failed and interrupted downloads leave no file behind."""
+        api = FakeGarmin(errors={
+            '/download-service/export/gpx/activity/1': GarthHTTPError('404', error=None),
+            '/download-service/export/gpx/activity/2': 2,
+        })
+
+        results = download_activities(api, [1, 2, 3], ['gpx'], str(tmp_path))
+
+        assert [r['status'] for r in results] == ['failed', 'failed', 'downloaded']
+        assert 'connection reset' in results[1]['error']
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['3.gpx']
+
+    def test_unknown_format_rejected(self, tmp_path):
+        """Test an unknown format fails before any download."""
+        api = FakeGarmin()
+
+        with pytest.raises(ValueError, match='fit'):
+            download_activities(api, [1], ['gpx', 'fit'], str(tmp_path))
+
+        assert api.garth.requests == []
+
+
+def _activity(activity_id, day, activity_type='running'):
+    """Build an activity summary as listed by Garmin Connect."""
+    return {'activityId': activity_id, 'startTimeLocal': f'{day} 07:00:00',
+            'activityType': {'typeKey': activity_type}, 'activityName': f'Run {activity_id}',
+            'distance': 5000.0, 'duration': 1500.0, 'calories': 400.0, 'averageHR': 150.0}
+
+
+class FakeSyncApi:
+    """Garmin API serving activities newest first and a user summary per day."""
+
+    def __init__(self, activities):
+        self.activities = sorted(activities, key=lambda a: a['activityId'], reverse=True)
+        self.calls = []
+
+    def get_activities(self, start, limit):
+        self.calls.append('get_activities')
+        return self.activities[start:start + limit]
+
+    def get_activities_by_date(self, startdate, enddate):
+        self.calls.append('get_activities_by_date')
+        return [a for a in self.activities if startdate <= a['startTimeLocal'][:10] <= enddate]
+
+    def get_user_summary(self, day):
+        self.calls.append(f'get_user_summary {day}')
+        return {'totalSteps': 1000 + len(self.calls), 'restingHeartRate': 50,
+                'sleepingSeconds': 28800, 'averageStressLevel': 30}
+
+
+class TestActivityStore:
+    """Tests for ActivityStore and sync_store."""
+
+    def test_first_sync_fetches_date_range(self, tmp_path):
+        """Test an empty store is filled from the date range."""
+        api = FakeSyncApi([_activity(1, '2024-01-01'), _activity(2, '2024-01-02')])
+        store = ActivityStore(str(tmp_path / 'garmin.db'))
+
+        summary = sync_store(api, store, datetime.date(2024, 1, 1), datetime.date(2024, 1, 3))
+
+        assert summary == {'activities': 2, 'days': 3, 'calls': 4}
+        assert [a['activity_id'] for a in store.activities()] == [2, 1]
+        assert store.get_state('last_activity_id') == '2'
+        assert [m['date'] for m in store.daily_metrics('2024-01-01', '2024-01-31')] == [
+            '2024-01-01', '2024-01-02', '2024-01-03']
+
+    def test_later_sync_fetches_only_new_data(self, tmp_path):
+        """Test a second run costs a handful of calls and stores only new data."""
+        path = str(tmp_path / 'garmin.db')
+        api = FakeSyncApi([_activity(i, '2024-01-01') for i in range(1, 51)])
+        store = ActivityStore(path)
+        sync_store(api, store, datetime.date(2024, 1, 1), datetime.date(2024, 1, 1))
+        store.close()
+
+        api.activities.insert(0, _activity(51, '2024-01-02', 'cycling'))
+        api.calls.clear()
+        store = ActivityStore(path)
+        summary = sync_store(api, store, datetime.date(2024, 1, 1), datetime.date(2024, 1, 2))
+
+        # One page of activities, then the last (possibly partial) day and the new one
+        assert api.calls == ['get_activities', 'get_user_summary 2024-01-01',
+                             'get_user_summary 2024-01-02']
+        assert summary['activities'] == 1
+        assert len(store.activities()) == 51
+        assert [a['activity_id'] for a in store.activities(activity_type='cycling')] == [51]
+
+    def test_new_activities_paged(self, tmp_path):
+        """Test more new activities than one page are all fetched."""
+        api = FakeSyncApi([_activity(1, '2024-01-01')])
+        store = ActivityStore(str(tmp_path / 'garmin.db'))
+        sync_store(api, store, datetime.date(2024, 1, 1), datetime.date(2024, 1, 1))
+
+        api.activities = [_activity(i, '2024-01-01') for i in range(45, 0, -1)]
+        api.calls.clear()
+        summary = sync_store(api, store, datetime.date(2024, 1, 1), datetime.date(2024, 1, 1))
+
+        assert summary['activities'] == 44
+        assert api.calls.count('get_activities') == 3
+        assert store.get_state('last_activity_id') == '45'
+
+    def test_daily_metrics_columns(self):
+        """Test summary fields are stored in indexed columns."""
+        store = ActivityStore(':memory:')
+        store.add_daily_metrics('2024-01-01', {'totalSteps': 12345, 'restingHeartRate': 48,
+                                               'sleepingSeconds': 27000,
+                                               'averageStressLevel': 25})
+
+        row = store.daily_metrics('2024-01-01', '2024-01-01')[0]
+        assert (row['steps'], row['resting_hr'], row['sleep_seconds'], row['average_stress']) == (
+            12345, 48, 27000, 25)
+
+
+class TestSeriesColumns:
+    """Tests for columnar metric storage."""
+
+    def test_round_trip(self, tmp_path):
+        """Test appended samples load back as typed columns."""
+        columns = SeriesColumns(str(tmp_path), 'heart_rate', 'h')
+
+        assert columns.append([[1000, 60], [2000, None], [3000, 65]]) == 2
+        timestamps, values = columns.load()
+
+        assert list(timestamps) == [1000, 3000]
+        assert list(values) == [60, 65]
+        assert (tmp_path / 'heart_rate.ts').stat().st_size == 2 * 8
+        assert (tmp_path / 'heart_rate.h').stat().st_size == 2 * 2
+
+    def test_refetch_appends_only_new_samples(self, tmp_path):
+        """Test samples at or before the last stored timestamp are skipped."""
+        columns = SeriesColumns(str(tmp_path), 'respiration', 'f')
+        columns.append([[1000, 14.5], [2000, 15.0]])
+
+        assert columns.append([[1000, 14.5], [2000, 15.0], [3000, 15.25]]) == 1
+        assert list(columns.load()[1]) == [14.5, 15.0, 15.25]
+
+    def test_between(self, tmp_path):
+        """Test a time range is sliced without copying the columns."""
+        columns = SeriesColumns(str(tmp_path), 'stress', 'h')
+        columns.append([[t, t // 1000] for t in range(0, 10000, 1000)])
+
+        timestamps, values = columns.between(3000, 6000)
+
+        assert list(timestamps) == [3000, 4000, 5000]
+        assert list(values) == [3, 4, 5]
+        assert isinstance(timestamps, memoryview)
+
+    def test_empty_and_torn_files(self, tmp_path):
+        """Test a missing column loads empty and a torn tail is ignored."""
+        columns = SeriesColumns(str(tmp_path), 'heart_rate', 'h')
+        assert columns.last_timestamp() is None
+        assert len(columns.load()[0]) == 0
+
+        columns.append([[1000, 60]])
+        with open(columns.timestamps_path, 'ab') as fb:
+            fb.write(b'\x01\x02\x03')
+
+        assert list(columns.load()[0]) == [1000]
+        assert columns.last_timestamp() == 1000
+
+    def test_orphaned_value_dropped_before_append(self, tmp_path):
+        """Test a value left by a crash between the two writes does not shift later pairs."""
+        columns = SeriesColumns(str(tmp_path), 'heart_rate', 'h')
+        columns.append([[1000, 60]])
+        with open(columns.values_path, 'ab') as fb:
+            array.array('h', [99]).tofile(fb)
+
+        columns.append([[2000, 61], [3000, 62]])
+        timestamps, values = columns.load()
+
+        assert list(timestamps) == [1000, 2000, 3000]
+        assert list(values) == [60, 61, 62]
+        assert (tmp_path / 'heart_rate.h').stat().st_size == 3 * 2
+
+    def test_store_metric_series(self, tmp_path):
+        """Test every metric endpoint is stored in its own columns."""
+        api = FakeMetricsApi()
+
+        appended = store_metric_series(api, '2024-01-01', str(tmp_path))
+
+        assert appended == {'heart_rate': 2, 'stress': 2, 'respiration': 1, 'spo2': 0}
+        timestamps, values = SeriesColumns(str(tmp_path), 'stress', 'h').load()
+        assert list(values) == [25, -1]
+
+
+class FakeMetricsApi:
+    """Garmin API returning intraday samples for one day."""
+
+    def get_heart_rates(self, day):
+        return {'heartRateValues': [[1000, 58], [2000, 61]]}
+
+    def get_stress_data(self, day):
+        return {'stressValuesArray': [[1000, 25], [2000, -1]]}
+
+    def get_respiration_data(self, day):
+        return {'respirationValuesArray': [[1000, 14.0]]}
+
+    def get_spo2_data(self, day):
+        return {'spO2HourlyAverages': None}
+
+
+class FakeSnapshotApi:
+    """Garmin API whose endpoints sleep and can fail in scripted ways."""
+
+    def __init__(self, delay=0.05, failures=None):
+        self.delay = delay
+        self.failures = {name: list(errors) for name, errors in (failures or {}).items()}
+        self.calls = []
+        self._lock = threading.Lock()
+        for name in ACTIVITY_ENDPOINTS + ('get_device_settings',):
+            setattr(self, name, self._endpoint(name))
+
+    def _endpoint(self, name):
+        def call(*args):
+            with self._lock:
+                self.calls.append(name)
+                pending = self.failures.get(name)
+                error = pending.pop(0) if pending else None
+            time.sleep(self.delay)
+            if error:
+                raise error
+            return {'endpoint': name, 'args': list(args)}
+        return call
+
+    def get_devices(self):
+        time.sleep(self.delay)
+        return [{'deviceId': 1}, {'deviceId': 2}, {'deviceId': 3}]
+
+    def get_device_last_used(self):
+        time.sleep(self.delay)
+        return {'userDeviceId': 2}
+
+
+def _garth_http_error(status):
+    """Build the GarthHTTPError garth raises for an HTTP error response."""
+    response = requests.Response()
+    response.status_code = status
+    return GarthHTTPError('Error in request', requests.exceptions.HTTPError(
+        f"{status} Error", response=response))
+
+
+class TestSnapshots:
+    """Tests for concurrent activity and device snapshots."""
+
+    def test_activity_snapshot_bounded_by_slowest_call(self):
+        """Test all endpoints are fetched concurrently into one object."""
+        api = FakeSnapshotApi(delay=0.1)
+
+        started = time.monotonic()
+        snapshot = activity_snapshot(api, 42)
+
+        # Seven calls of 100 ms each would take 0.7 s one after another
+        assert time.monotonic() - started < 0.3
+        assert snapshot['activity_id'] == 42
+        assert set(snapshot['data']) == set(ACTIVITY_ENDPOINTS)
+        assert snapshot['data']['get_activity_weather'] == {
+            'endpoint': 'get_activity_weather', 'args': [42]}
+        assert snapshot['errors'] == {}
+
+    def test_rate_limited_calls_retried(self):
+        """Test garth 429 errors are retried with a shared backoff."""
+        api = FakeSnapshotApi(delay=0, failures={
+            'get_activity_gear': [_garth_http_error(429)] * 2})
+        backoff = AdaptiveBackoff(initial=0.01)
+
+        snapshot = activity_snapshot(api, 42, backoff=backoff)
+
+        assert 'get_activity_gear' in snapshot['data']
+        assert api.calls.count('get_activity_gear') == 3
+
+    def test_errors_reported_per_endpoint(self):
+        """Test failing endpoints do not lose the other results."""
+        api = FakeSnapshotApi(delay=0, failures={
+            'get_activity_details': [GarminConnectConnectionError('boom')],
+            'get_activity_weather': [_garth_http_error(429)] * 10,
+            'get_activity_gear': [_garth_http_error(500)],
+        })
+
+        snapshot = activity_snapshot(api, 42, backoff=AdaptiveBackoff(initial=0.001))
+
+        assert set(snapshot['errors']) == {
+            'get_activity_details', 'get_activity_weather', 'get_activity_gear'}
+        assert 'boom' in snapshot['errors']['get_activity_details']
+        assert snapshot['errors']['get_activity_gear'].startswith('GarthHTTPError')
+        assert api.calls.count('get_activity_weather') == 4
+        # Only 429s are retried
+        assert api.calls.count('get_activity_gear') == 1
+        assert len(snapshot['data']) == len(ACTIVITY_ENDPOINTS) - 3
+
+    def test_device_snapshot(self):
+        """Test device settings are gathered for every device."""
+        api = FakeSnapshotApi(delay=0.05, failures={
+            'get_device_settings': [GarminConnectConnectionError('offline')]})
+
+        snapshot = device_snapshot(api)
+
+        assert snapshot['data']['get_device_last_used'] == {'userDeviceId': 2}
+        assert len(snapshot['data']['get_device_settings']) == 2
+        assert len(snapshot['errors']) == 1
+        assert next(iter(snapshot['errors'])).startswith('get_device_settings(')
+
+    def test_adaptive_backoff(self):
+        """Test the delay doubles when rate limited and decays on success."""
+        sleeps = []
+        backoff = AdaptiveBackoff(initial=1, maximum=5, sleep=sleeps.append)
+
+        backoff.wait()
+        for _ in range(4):
+            backoff.rate_limited()
+        assert backoff.delay == 5
+        backoff.wait()
+        backoff.succeeded()
+        backoff.succeeded()
+        assert backoff.delay == 1.25
+        backoff.succeeded()
+        assert backoff.delay == 0
+
+        assert sleeps == [5]
+
+
+class TestHeadless:
+    """Tests for session reuse and the headless JSONL mode."""
+
+    @patch('garminconnect.Garmin')
+    def test_saved_tokens_reused(self, mock_garmin, tmp_path):
+        """Test a valid token store logs in without credentials."""
+        api = init_api(None, None, str(tmp_path))
+
+        assert api is mock_garmin.return_value
+        mock_garmin.assert_called_once_with()
+        api.login.assert_called_once_with(str(tmp_path))
+
+    @patch('garminconnect.Garmin')
+    def test_credentials_login_saves_tokens(self, mock_garmin, tmp_path, monkeypatch):
+        """Test missing tokens fall back to a credential login whose tokens are saved."""
+        monkeypatch.setenv('GARMINTOKENS', str(tmp_path / 'stale'))
+        resumed, fresh = Mock(), Mock()
+        resumed.login.side_effect = FileNotFoundError
+        mock_garmin.side_effect = [resumed, fresh]
+
+        api = init_api('me@example.com', 'secret', str(tmp_path))
+
+        assert api is fresh
+        mock_garmin.assert_called_with('me@example.com', 'secret')
+        fresh.garth.login.assert_called_once_with('me@example.com', 'secret')
+        fresh.garth.dump.assert_called_once_with(str(tmp_path))
+        # Resumed from the tokens just saved, never from GARMINTOKENS
+        fresh.login.assert_called_once_with(str(tmp_path))
+
+    @patch('garmin.garmin.get_credentials')
+    @patch('garminconnect.Garmin')
+    def test_non_interactive_login_never_prompts(self, mock_garmin, mock_credentials, tmp_path,
+                                                 caplog):
+        """Test missing credentials fail without a prompt when not interactive."""
+        mock_garmin.return_value.login.side_effect = FileNotFoundError
+
+        assert init_api(None, None, str(tmp_path), interactive=False) is None
+        mock_credentials.assert_not_called()
+        assert 'EMAIL/PASSWORD not set' in caplog.text
+
+    @patch('garminconnect.Garmin')
+    def test_non_interactive_login_stops_at_mfa(self, mock_garmin, tmp_path):
+        """Test an account needing MFA is not prompted for a code when not interactive."""
+        resumed, fresh = Mock(), Mock()
+        resumed.login.side_effect = FileNotFoundError
+        fresh.garth.login.return_value = ('needs_mfa', {})
+        mock_garmin.side_effect = [resumed, fresh]
+
+        assert init_api('me@example.com', 'secret', str(tmp_path), interactive=False) is None
+        fresh.garth.login.assert_called_once_with('me@example.com', 'secret', return_on_mfa=True)
+        fresh.garth.dump.assert_not_called()
+
+    def test_tokens_refreshed_before_expiry(self, tmp_path):
+        """Test the token is refreshed only when it expires within the margin."""
+        api = Mock()
+        api.garth.oauth2_token.expires_at = time.time() + 3600
+
+        assert not refresh_tokens(api, str(tmp_path), margin=600)
+        api.garth.refresh_oauth2.assert_not_called()
+
+        api.garth.oauth2_token.expires_at = time.time() + 300
+        assert refresh_tokens(api, str(tmp_path), margin=600)
+        api.garth.refresh_oauth2.assert_called_once()
+        api.garth.dump.assert_called_once_with(str(tmp_path))
+
+    def test_run_queries_writes_jsonl(self):
+        """Test one line is written per query and day, including failures."""
+        api = Mock()
+        api.get_user_summary.side_effect = lambda day: {'totalSteps': 100, 'day': day}
+        api.get_sleep_data.side_effect = [GarminConnectConnectionError('boom'), {'sleep': 1}]
+        output = io.StringIO()
+
+        failed = run_queries(api, ['get_user_summary', 'get_sleep_data'],
+                             datetime.date(2024, 1, 1), datetime.date(2024, 1, 2), output)
+
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert failed == 1
+        assert [(l['query'], l['date']) for l in lines] == [
+            ('get_user_summary', '2024-01-01'), ('get_sleep_data', '2024-01-01'),
+            ('get_user_summary', '2024-01-02'), ('get_sleep_data', '2024-01-02')]
+        assert lines[0]['data'] == {'totalSteps': 100, 'day': '2024-01-01'}
+        assert 'boom' in lines[1]['error']
+        assert 'fetched_at' in lines[3]
+
+    def test_run_queries_records_garth_and_network_errors(self):
+        """Test garth and requests failures are written as error lines."""
+        api = Mock()
+        api.get_user_summary.side_effect = _garth_http_error(500)
+        api.get_sleep_data.side_effect = requests.exceptions.ConnectionError('offline')
+        output = io.StringIO()
+
+        failed = run_queries(api, ['get_user_summary', 'get_sleep_data'],
+                             datetime.date(2024, 1, 1), datetime.date(2024, 1, 1), output)
+
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert failed == 2
+        assert lines[0]['error'].startswith('GarthHTTPError')
+        assert 'offline' in lines[1]['error']
+
+    @patch('garmin.garmin.time.sleep')
+    @patch('garmin.garmin.refresh_tokens')
+    @patch('garmin.garmin.init_api')
+    def test_failed_cycle_does_not_stop_collector(self, mock_init, mock_refresh, mock_sleep,
+                                                  tmp_path):
+        """Test a failed token refresh is logged and the next cycle still runs."""
+        mock_init.return_value.get_user_summary.return_value = {'totalSteps': 1}
+        mock_refresh.side_effect = [GarthException('refresh failed'), False]
+        mock_sleep.side_effect = [None, KeyboardInterrupt]
+        output = tmp_path / 'out.jsonl'
+        args = argparse.Namespace(tokenstore=None, queries=['get_user_summary'], start=None,
+                                  end=datetime.date(2024, 1, 1), days=1, output=str(output),
+                                  every=60)
+
+        run_headless(args)
+
+        assert mock_init.call_args.kwargs == {'interactive': False}
+        assert mock_refresh.call_count == 2
+        lines = [json.loads(line) for line in output.read_text().splitlines()]
+        assert [line['data'] for line in lines] == [{'totalSteps': 1}]
+
+    def test_unknown_query_rejected(self):
+        """Test only known date-based queries can be run."""
+        with pytest.raises(ValueError, match='logout'):
+            run_queries(Mock(), ['logout'], datetime.date(2024, 1, 1),
+                        datetime.date(2024, 1, 1), io.StringIO())
+
+
+class TestSwitch:
+    """Tests for the interactive menu dispatcher."""
+
+    def test_unknown_option_ignored(self):
+        """Test an option without a menu entry does nothing."""
+        api = Mock()
+
+        switch(api, 'X')
+
+        assert api.method_calls == []
+
+    def test_api_errors_logged(self, caplog):
+        """Test a failing API call is logged instead of ending the menu."""
+        api = Mock()
+        api.get_full_name.side_effect = requests.exceptions.HTTPError('503 Server Error')
+
+        switch(api, '1')
+
+        assert '503 Server Error' in caplog.text
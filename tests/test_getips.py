@@ -1,130 +1,517 @@
 """Unit tests for getips module."""
-import pytest
+import asyncio
 import socket
-from unittest.mock import patch, Mock
-from getips import discover_roku_devices
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from unittest.mock import patch, AsyncMock
+from getips import (
+    SSDP_SETTLE_TIME,
+    DeviceRegistry,
+    _interface_addresses,
+    _local_ipv4_addresses,
+    discover_roku_details,
+    discover_roku_devices,
+    discover_roku_devices_async,
+    get_roku_ips,
+    iter_roku_devices,
+    listen_for_devices,
+    parse_ssdp_headers,
+)
+
+ROKU_RESPONSE = b'HTTP/1.1 200 OK\r\nCache-Control: max-age=3600\r\nST: roku:ecp\r\n\r\n'
+OTHER_RESPONSE = b'HTTP/1.1 200 OK\r\nST: upnp:rootdevice\r\n\r\n'
+
+
+class SSDPStandIn:
+    """Local UDP stand-in for the SSDP multicast group.
+
+    Every M-SEARCH received is answered once per simulated device, each
+    from its own loopback address (127.0.0.x), optionally after a delay.
+    A device given as (ip, payload, delay) answers that much later still.
+    """
+
+    def __init__(self, devices, delay=0.0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.05)
+        self.address = self.sock.getsockname()
+        self.delay = delay
+        self.searches = 0
+        self.responders = []
+        for ip, payload, *late in sorted(devices, key=lambda device: device[2:]):
+            responder = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            responder.bind((ip, 0))
+            self.responders.append((responder, payload, late[0] if late else 0.0))
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while self._running:
+            try:
+                data, addr = self.sock.recvfrom(65507)
+            except socket.timeout:
+                continue
+            if not data.startswith(b'M-SEARCH'):
+                continue
+            self.searches += 1
+            time.sleep(self.delay)
+            waited = 0.0
+            for responder, payload, late in self.responders:
+                time.sleep(late - waited)
+                waited = late
+                responder.sendto(payload, addr)
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+        self.sock.close()
+        for responder, _, _ in self.responders:
+            responder.close()
+
+
+@pytest.fixture
+def ssdp():
+    """Factory starting SSDP stand-ins that are closed after the test."""
+    started = []
+
+    def start(devices, delay=0.0):
+        standin = SSDPStandIn(devices, delay)
+        started.append(standin)
+        return standin
+
+    yield start
+    for standin in started:
+        standin.close()
+
+
+def _rokus(count, first=2):
+    return [(f'127.0.0.{first + i}', ROKU_RESPONSE) for i in range(count)]
 
 
 class TestDiscoverRokuDevices:
-    """Tests for discover_roku_devices function."""
-
-    @patch('getips.socket.socket')
-    def test_discover_single_device(self, mock_socket_class):
-        """Test discovering a single Roku device."""
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-
-        # Simulate one Roku response then timeout
-        def recvfrom_side_effect(buffer_size):
-            if not hasattr(recvfrom_side_effect, 'called'):
-                recvfrom_side_effect.called = True
-                return (b'HTTP/1.1 200 OK\r\nST: roku:ecp\r\n', ('192.168.1.100', 1900))
-            raise socket.timeout()
-
-        mock_socket.recvfrom.side_effect = recvfrom_side_effect
-
-        result = discover_roku_devices()
-
-        assert len(result) == 1
-        assert '192.168.1.100' in result
-        mock_socket.sendto.assert_called_once()
-        mock_socket.close.assert_called_once()
-
-    @patch('getips.socket.socket')
-    def test_discover_multiple_devices(self, mock_socket_class):
-        """Test discovering multiple Roku devices."""
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-
-        responses = [
-            (b'HTTP/1.1 200 OK\r\nST: roku:ecp\r\n', ('192.168.1.100', 1900)),
-            (b'HTTP/1.1 200 OK\r\nST: roku:ecp\r\n', ('192.168.1.101', 1900)),
-            (b'HTTP/1.1 200 OK\r\nST: roku:ecp\r\n', ('192.168.1.102', 1900)),
-        ]
-
-        def recvfrom_side_effect(buffer_size):
-            if responses:
-                return responses.pop(0)
-            raise socket.timeout()
-
-        mock_socket.recvfrom.side_effect = recvfrom_side_effect
-
-        result = discover_roku_devices()
-
-        assert len(result) == 3
-        assert '192.168.1.100' in result
-        assert '192.168.1.101' in result
-        assert '192.168.1.102' in result
-
-    @patch('getips.socket.socket')
-    def test_discover_no_devices(self, mock_socket_class):
-        """Test when no Roku devices are found."""
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        mock_socket.recvfrom.side_effect = socket.timeout()
-
-        result = discover_roku_devices()
-
-        assert len(result) == 0
-        assert result == []
+    """Tests for SSDP discovery against a local stand-in."""
 
-    @patch('getips.socket.socket')
-    def test_discover_non_roku_response(self, mock_socket_class):
-        """Test filtering out non-Roku SSDP responses."""
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
+    @pytest.mark.asyncio
+    async def test_discover_multiple_devices(self, ssdp):
+        """Test every answering Roku is found once."""
+        standin = ssdp(_rokus(3))
 
-        responses = [
-            (b'HTTP/1.1 200 OK\r\nST: upnp:rootdevice\r\n', ('192.168.1.100', 1900)),
-            (b'HTTP/1.1 200 OK\r\nST: roku:ecp\r\n', ('192.168.1.101', 1900)),
-        ]
+        result = await discover_roku_devices_async(
+            timeout=2, interfaces=['127.0.0.1'], target=standin.address)
 
-        def recvfrom_side_effect(buffer_size):
-            if responses:
-                return responses.pop(0)
-            raise socket.timeout()
+        assert sorted(result) == ['127.0.0.2', '127.0.0.3', '127.0.0.4']
 
-        mock_socket.recvfrom.side_effect = recvfrom_side_effect
+    @pytest.mark.asyncio
+    async def test_non_roku_responses_filtered(self, ssdp):
+        """Test SSDP answers without roku:ecp are ignored."""
+        standin = ssdp([('127.0.0.2', OTHER_RESPONSE), ('127.0.0.3', ROKU_RESPONSE)])
 
-        result = discover_roku_devices()
+        result = await discover_roku_devices_async(
+            timeout=2, interfaces=['127.0.0.1'], target=standin.address)
 
-        assert len(result) == 1
-        assert '192.168.1.101' in result
-        assert '192.168.1.100' not in result
+        assert result == ['127.0.0.3']
 
-    @patch('getips.socket.socket')
-    def test_discover_duplicate_ips(self, mock_socket_class):
-        """Test that duplicate IPs are filtered out."""
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
+    @pytest.mark.asyncio
+    async def test_retransmits_without_duplicates(self, ssdp):
+        """Test M-SEARCH is retransmitted and repeated answers are deduplicated."""
+        standin = ssdp(_rokus(2))
 
-        responses = [
-            (b'HTTP/1.1 200 OK\r\nST: roku:ecp\r\n', ('192.168.1.100', 1900)),
-            (b'HTTP/1.1 200 OK\r\nST: roku:ecp\r\n', ('192.168.1.100', 1900)),
-            (b'HTTP/1.1 200 OK\r\nST: roku:ecp\r\n', ('192.168.1.101', 1900)),
-        ]
+        result = await discover_roku_devices_async(
+            timeout=1, interfaces=['127.0.0.1'], target=standin.address)
 
-        def recvfrom_side_effect(buffer_size):
-            if responses:
-                return responses.pop(0)
-            raise socket.timeout()
+        assert standin.searches >= 2
+        assert len(result) == 2
 
-        mock_socket.recvfrom.side_effect = recvfrom_side_effect
+    @pytest.mark.asyncio
+    async def test_early_exit_on_expected_count(self, ssdp):
+        """Test the search ends as soon as the expected devices answered."""
+        standin = ssdp(_rokus(2))
 
-        result = discover_roku_devices()
+        started = time.monotonic()
+        result = await discover_roku_devices_async(
+            timeout=5, expected=2, interfaces=['127.0.0.1'], target=standin.address)
 
         assert len(result) == 2
-        assert '192.168.1.100' in result
-        assert '192.168.1.101' in result
+        assert time.monotonic() - started < 0.5
+
+    @pytest.mark.asyncio
+    async def test_returns_well_under_timeout(self, ssdp):
+        """Test the search stops once devices stop answering."""
+        standin = ssdp(_rokus(5))
+
+        started = time.monotonic()
+        result = await discover_roku_devices_async(
+            timeout=5, interfaces=['127.0.0.1'], target=standin.address)
+
+        assert len(result) == 5
+        assert time.monotonic() - started < SSDP_SETTLE_TIME + 0.5
+
+    @pytest.mark.asyncio
+    async def test_device_answering_within_mx_found(self, ssdp):
+        """Test a device using its MX delay is still found after a quick one."""
+        standin = ssdp([('127.0.0.2', ROKU_RESPONSE), ('127.0.0.3', ROKU_RESPONSE, 0.8)])
+
+        result = await discover_roku_devices_async(
+            timeout=5, interfaces=['127.0.0.1'], target=standin.address)
+
+        assert result == ['127.0.0.2', '127.0.0.3']
+
+    @pytest.mark.asyncio
+    async def test_streams_devices_as_they_answer(self, ssdp):
+        """Test devices are yielded before the search has finished."""
+        standin = ssdp(_rokus(1))
+
+        started = time.monotonic()
+        yielded_at = []
+        async for _ in iter_roku_devices(timeout=2, interfaces=['127.0.0.1'],
+                                         target=standin.address):
+            yielded_at.append(time.monotonic() - started)
+        finished_at = time.monotonic() - started
+
+        # The device is reported immediately; the search then waits out the settle time
+        assert yielded_at[0] < 0.1
+        assert finished_at - yielded_at[0] >= 0.2
+
+    @pytest.mark.asyncio
+    async def test_no_devices_waits_for_timeout(self, ssdp):
+        """Test an empty network returns an empty list after the timeout."""
+        standin = ssdp([])
+
+        result = await discover_roku_devices_async(
+            timeout=0.3, interfaces=['127.0.0.1'], target=standin.address)
+
+        assert result == []
+
+    def test_sync_wrapper(self):
+        """Test the blocking API returns a list."""
+        result = discover_roku_devices(timeout=0.1, interfaces=['127.0.0.1'])
+
+        assert isinstance(result, list)
+
+
+def _notify(nts='ssdp:alive', usn='uuid:roku:ecp:YN00AB123456', max_age=3600):
+    """Build a Roku NOTIFY message."""
+    return (
+        'NOTIFY * HTTP/1.1\r\n'
+        'HOST: 239.255.255.250:1900\r\n'
+        f'Cache-Control: max-age={max_age}\r\n'
+        'NT: roku:ecp\r\n'
+        f'NTS: {nts}\r\n'
+        'Location: http://192.168.1.20:8060/\r\n'
+        f'USN: {usn}\r\n\r\n'
+    ).encode()
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestLocalAddresses:
+    """Tests for choosing the interfaces to search from."""
+
+    @pytest.mark.skipif(not sys.platform.startswith('linux'), reason='SIOCGIFADDR is Linux-only')
+    def test_interfaces_enumerated(self):
+        """Test every interface is listed, not only the hostname's address."""
+        assert '127.0.0.1' in _interface_addresses()
+
+    def test_every_interface_searched_except_loopback(self):
+        """Test a second NIC is searched even if the hostname maps to 127.0.1.1."""
+        with patch('getips._interface_addresses',
+                   return_value=['127.0.0.1', '192.168.1.10', '10.20.0.5']), \
+                patch('getips.socket.gethostbyname_ex', return_value=('host', [], ['127.0.1.1'])):
+            addresses = _local_ipv4_addresses()
+
+        assert {'192.168.1.10', '10.20.0.5'} <= set(addresses)
+        assert not any(address.startswith('127.') for address in addresses)
+
+
+class TestDeviceRegistry:
+    """Tests for DeviceRegistry."""
+
+    def test_alive_notify_registers_device(self):
+        """Test ssdp:alive adds the device with its USN and location."""
+        registry = DeviceRegistry()
+
+        event = registry.handle_message(_notify(), ('192.168.1.20', 1900))
+
+        assert event == 'alive'
+        record = registry.devices()[0]
+        assert record['usn'] == 'uuid:roku:ecp:YN00AB123456'
+        assert record['location'] == 'http://192.168.1.20:8060/'
+        assert registry.ips() == ['192.168.1.20']
+
+    def test_byebye_removes_device(self):
+        """Test ssdp:byebye removes the device."""
+        registry = DeviceRegistry()
+        registry.handle_message(_notify(), ('192.168.1.20', 1900))
+
+        event = registry.handle_message(_notify('ssdp:byebye'), ('192.168.1.20', 1900))
+
+        assert event == 'byebye'
+        assert registry.ips() == []
+
+    def test_expires_after_max_age(self):
+        """Test devices vanish once their advertised max-age passes."""
+        clock = FakeClock()
+        registry = DeviceRegistry(clock=clock)
+        registry.handle_message(_notify(max_age=60), ('192.168.1.20', 1900))
+
+        clock.now += 61
+
+        assert registry.ips() == []
+
+    def test_repeated_announcements_deduplicated(self):
+        """Test repeated alive messages keep a single record."""
+        registry = DeviceRegistry()
+
+        new = [registry.update('192.168.1.20', 'uuid:roku:ecp:YN00AB123456') for _ in range(3)]
+
+        assert new == [True, False, False]
+        assert len(registry.devices()) == 1
+
+    def test_new_usn_on_same_ip_replaces_record(self):
+        """Test a different device at a known IP replaces the old record."""
+        registry = DeviceRegistry()
+        registry.update('192.168.1.20', 'uuid:old')
+        registry.update('192.168.1.20', 'uuid:new')
+
+        assert [r['usn'] for r in registry.devices()] == ['uuid:new']
+
+    def test_non_roku_messages_ignored(self):
+        """Test NOTIFYs for other device types are not recorded."""
+        registry = DeviceRegistry()
+
+        event = registry.handle_message(_notify().replace(b'roku:ecp', b'upnp:rootdevice'),
+                                        ('192.168.1.30', 1900))
+
+        assert event is None
+        assert registry.devices() == []
+
+    def test_persisted_between_runs(self, tmp_path):
+        """Test the registry is reloaded from its JSON file."""
+        path = str(tmp_path / 'devices.json')
+        DeviceRegistry(path).handle_message(_notify(), ('192.168.1.20', 1900))
+
+        assert DeviceRegistry(path).ips() == ['192.168.1.20']
+
+    def test_device_moving_to_new_ip(self):
+        """Test a known USN announced from a new address drops the old IP."""
+        registry = DeviceRegistry()
+        registry.update('192.168.1.20', 'uuid:tv')
+        registry.update('192.168.1.21', 'uuid:tv')
+        registry.update('192.168.1.20', 'uuid:other')
+
+        assert sorted(registry.ips()) == ['192.168.1.20', '192.168.1.21']
+        assert {r['usn'] for r in registry.devices()} == {'uuid:tv', 'uuid:other'}
+
+    def test_saves_batched(self, tmp_path):
+        """Test a burst of announcements is written once, then flushed by save()."""
+        clock = FakeClock()
+        path = str(tmp_path / 'devices.json')
+        registry = DeviceRegistry(path, clock=clock, save_interval=5)
+
+        registry.update('192.168.1.20', 'uuid:a')
+        registry.update('192.168.1.21', 'uuid:b')
+        assert DeviceRegistry(path, clock=clock).ips() == ['192.168.1.20']
+
+        clock.now += 5
+        registry.update('192.168.1.22', 'uuid:c')
+        assert len(DeviceRegistry(path, clock=clock).ips()) == 3
+
+        registry.remove('uuid:a')
+        registry.save()
+        assert len(DeviceRegistry(path, clock=clock).ips()) == 2
+
+
+class TestRegistryLookups:
+    """Tests for registry-first lookups and recording during scans."""
+
+    @patch('getips.discover_roku_devices_async', new_callable=AsyncMock)
+    @patch('getips.get_registry')
+    def test_registry_hit_skips_scan(self, mock_get_registry, mock_discover):
+        """Test known devices are returned without any network traffic."""
+        registry = DeviceRegistry()
+        registry.update('192.168.1.20')
+        mock_get_registry.return_value = registry
+
+        assert get_roku_ips() == ['192.168.1.20']
+        mock_discover.assert_not_called()
+
+    @patch('getips.discover_roku_devices_async', new_callable=AsyncMock)
+    @patch('getips.get_registry')
+    def test_registry_miss_scans(self, mock_get_registry, mock_discover):
+        """Test an empty registry falls back to an active scan."""
+        mock_get_registry.return_value = DeviceRegistry()
+        mock_discover.return_value = ['192.168.1.21']
+
+        assert get_roku_ips() == ['192.168.1.21']
+        assert mock_discover.call_args.kwargs['registry'] is mock_get_registry.return_value
+
+    @pytest.mark.asyncio
+    async def test_scan_records_devices(self, ssdp):
+        """Test an active scan fills the registry."""
+        standin = ssdp(_rokus(2))
+        registry = DeviceRegistry()
+
+        await discover_roku_devices_async(timeout=2, interfaces=['127.0.0.1'],
+                                          target=standin.address, registry=registry)
+
+        assert sorted(registry.ips()) == ['127.0.0.2', '127.0.0.3']
+
+    @pytest.mark.asyncio
+    async def test_listener_tracks_notifies(self):
+        """Test the passive listener applies alive and byebye messages."""
+        probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+        probe.close()
+
+        registry = DeviceRegistry()
+        events = []
+        stop = asyncio.Event()
+        listener = asyncio.create_task(listen_for_devices(
+            registry, stop, port=port, interfaces=['127.0.0.1'],
+            on_event=lambda event, ip: events.append(event)))
+        await asyncio.sleep(0.05)
+
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sender.sendto(_notify(), ('127.0.0.1', port))
+        await asyncio.sleep(0.05)
+        ips_after_alive = registry.ips()
+        sender.sendto(_notify('ssdp:byebye'), ('127.0.0.1', port))
+        await asyncio.sleep(0.05)
+        sender.close()
+        stop.set()
+        await asyncio.wait_for(listener, 1)
+
+        assert ips_after_alive == ['127.0.0.1']
+        assert events == ['alive', 'byebye']
+        assert registry.ips() == []
+
+
+DEVICE_INFO = """<?xml version="1.0" encoding="UTF-8" ?>
+<device-info>
+    <udn>29780002-0000-1000-8000-{serial}</udn>
+    <serial-number>{serial}</serial-number>
+    <model-name>Roku Ultra</model-name>
+    <user-device-name>Wall TV {index}</user-device-name>
+    <software-version>12.5.0</software-version>
+</device-info>
+"""
+
+
+class _DeviceInfoStandIn(BaseHTTPRequestHandler):
+    """Serve /<index>/query/device-info for simulated devices; index 0 fails."""
+
+    def do_GET(self):
+        index, _, rest = self.path.strip('/').partition('/')
+        if rest != 'query/device-info' or index == '0':
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = DEVICE_INFO.format(serial=f'YN{int(index):06d}', index=index).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def device_info_server():
+    """Run the device-info HTTP stand-in and return its base URL."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _DeviceInfoStandIn)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def _search_response(index, base_url):
+    return (
+        'HTTP/1.1 200 OK\r\n'
+        'Cache-Control: max-age=3600\r\n'
+        'ST: roku:ecp\r\n'
+        f'USN: uuid:roku:ecp:YN{index:06d}\r\n'
+        'Ext: \r\n'
+        'Server: Roku/12.5.0 UPnP/1.0 Roku/12.5.0\r\n'
+        f'LOCATION: {base_url}/{index}/\r\n\r\n'
+    ).encode()
+
+
+class TestParseSSDPHeaders:
+    """Tests for parse_ssdp_headers."""
+
+    def test_parses_interesting_headers(self):
+        """Test USN, LOCATION and SERVER are extracted case-insensitively."""
+        start_line, headers = parse_ssdp_headers(_search_response(7, 'http://10.0.0.7:8060'))
+
+        assert start_line == 'HTTP/1.1 200 OK'
+        assert headers['USN'] == 'uuid:roku:ecp:YN000007'
+        assert headers['LOCATION'] == 'http://10.0.0.7:8060/7/'
+        assert headers['SERVER'].startswith('Roku/12.5.0')
+        assert 'EXT' not in headers
+
+    def test_value_containing_colons(self):
+        """Test only the first colon separates name and value."""
+        _, headers = parse_ssdp_headers(b'NOTIFY * HTTP/1.1\r\nLocation: http://a:8060/\r\n\r\n')
+
+        assert headers['LOCATION'] == 'http://a:8060/'
+
+    def test_malformed_lines_and_missing_terminator(self):
+        """Test lines without a colon are skipped and a missing CRLF is tolerated."""
+        start_line, headers = parse_ssdp_headers(b'HTTP/1.1 200 OK\r\ngarbage\r\nST: roku:ecp')
+
+        assert start_line == 'HTTP/1.1 200 OK'
+        assert headers == {'ST': 'roku:ecp'}
+
+
+class TestDiscoverRokuDetails:
+    """Tests for discovery plus concurrent device-info fetches."""
+
+    @pytest.mark.asyncio
+    async def test_dozens_of_devices(self, ssdp, device_info_server):
+        """Test every simulated device gets a full structured record."""
+        count = 30
+        standin = ssdp([(f'127.0.0.{i + 2}', _search_response(i + 1, device_info_server))
+                        for i in range(count)])
+
+        started = time.monotonic()
+        devices = await discover_roku_details(timeout=3, expected=count,
+                                              interfaces=['127.0.0.1'], target=standin.address)
+
+        assert len(devices) == count
+        assert all(device['error'] is None for device in devices)
+        by_serial = {device['serial']: device for device in devices}
+        assert by_serial['YN000005']['name'] == 'Wall TV 5'
+        assert by_serial['YN000005']['model'] == 'Roku Ultra'
+        assert by_serial['YN000005']['usn'] == 'uuid:roku:ecp:YN000005'
+        assert by_serial['YN000005']['server'].startswith('Roku/')
+        assert time.monotonic() - started < 2
 
-    @patch('getips.socket.socket')
-    def test_socket_closed_on_exception(self, mock_socket_class):
-        """Test that socket is closed even on exception."""
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        mock_socket.sendto.side_effect = Exception("Socket error")
+    @pytest.mark.asyncio
+    async def test_failed_device_info_reported(self, ssdp, device_info_server):
+        """Test a device whose device-info fails keeps its SSDP data and an error."""
+        standin = ssdp([('127.0.0.2', _search_response(0, device_info_server)),
+                        ('127.0.0.3', _search_response(1, device_info_server))])
 
-        with pytest.raises(Exception):
-            discover_roku_devices()
+        devices = await discover_roku_details(timeout=2, expected=2,
+                                              interfaces=['127.0.0.1'], target=standin.address)
 
-        mock_socket.close.assert_called_once()
+        failed = next(d for d in devices if d['ip'] == '127.0.0.2')
+        assert failed['usn'] == 'uuid:roku:ecp:YN000000'
+        assert failed['name'] is None
+        assert '503' in failed['error']
@@ -0,0 +1,273 @@
+"""Unit tests for utils/logger module."""
+import gzip
+import json
+import logging
+import threading
+import pytest
+from utils.logger import (
+    setup_logger,
+    get_queue_stats,
+    shutdown_logger,
+    set_sampling,
+    DroppingQueueHandler,
+    JsonFormatter,
+)
+
+
+@pytest.fixture
+def logger_name(request):
+    """Unique logger name per test, shut down afterwards."""
+    name = f"test_logger.{request.node.name}"
+    yield name
+    shutdown_logger(name)
+    logging.getLogger(name).handlers.clear()
+
+
+class TestSetupLogger:
+    """Tests for the synchronous setup_logger mode."""
+
+    def test_console_and_file_handlers(self, logger_name, tmp_path):
+        """Test console and file handlers are attached directly."""
+        log_file = tmp_path / 'logs' / 'app.log'
+
+        logger = setup_logger(logger_name, str(log_file))
+        logger.info("hello")
+
+        assert len(logger.handlers) == 2
+        assert "hello" in log_file.read_text()
+
+    def test_setup_twice_replaces_handlers(self, logger_name):
+        """Test calling setup again does not duplicate handlers."""
+        setup_logger(logger_name)
+        logger = setup_logger(logger_name)
+
+        assert len(logger.handlers) == 1
+
+
+class TestQueueLogger:
+    """Tests for the queue-backed setup_logger mode."""
+
+    def test_records_written_by_background_thread(self, logger_name, tmp_path):
+        """Test records reach the file after shutdown drains the queue."""
+        log_file = tmp_path / 'app.log'
+        logger = setup_logger(logger_name, str(log_file), use_queue=True)
+
+        for i in range(100):
+            logger.info("record %d", i)
+        shutdown_logger(logger_name)
+
+        lines = log_file.read_text().splitlines()
+        assert len(lines) == 100
+        assert lines[0].endswith("record 0")
+        assert lines[-1].endswith("record 99")
+
+    def test_only_queue_handler_attached(self, logger_name):
+        """Test the logger itself only has the non-blocking queue handler."""
+        logger = setup_logger(logger_name, use_queue=True)
+
+        assert len(logger.handlers) == 1
+        assert isinstance(logger.handlers[0], DroppingQueueHandler)
+
+    def test_stats_count_enqueued(self, logger_name, tmp_path):
+        """Test enqueued records are counted."""
+        logger = setup_logger(logger_name, str(tmp_path / 'app.log'), use_queue=True)
+
+        logger.info("one")
+        logger.info("two")
+
+        stats = get_queue_stats(logger_name)
+        assert stats['enqueued'] == 2
+        assert stats['dropped'] == 0
+
+    def test_full_queue_drops_and_counts(self, logger_name, tmp_path):
+        """Test records are dropped, not blocked on, when the queue is full."""
+        log_file = tmp_path / 'app.log'
+        logger = setup_logger(logger_name, str(log_file), use_queue=True, queue_size=5)
+
+        # Stall the writer thread so the queue fills up
+        release = threading.Event()
+        handler = _stalling_handler(logger_name, release)
+        for i in range(50):
+            logger.info("record %d", i)
+        stats = get_queue_stats(logger_name)
+        release.set()
+        shutdown_logger(logger_name)
+
+        assert stats['dropped'] > 0
+        assert stats['enqueued'] + stats['dropped'] == 50
+        assert handler.seen == stats['enqueued']
+
+    def test_args_resolved_at_log_time(self, logger_name, tmp_path):
+        """Test mutable args are captured when the call is made."""
+        log_file = tmp_path / 'app.log'
+        logger = setup_logger(logger_name, str(log_file), use_queue=True)
+
+        data = ['before']
+        logger.info("value %s", data)
+        data[0] = 'after'
+        shutdown_logger(logger_name)
+
+        assert "['before']" in log_file.read_text()
+
+    def test_stats_none_for_sync_logger(self, logger_name):
+        """Test get_queue_stats returns None without a queue."""
+        setup_logger(logger_name)
+
+        assert get_queue_stats(logger_name) is None
+
+
+class TestJsonFormatter:
+    """Tests for JsonFormatter."""
+
+    def _record(self, msg, *args, name='app', level=logging.INFO, exc_info=None):
+        return logging.LogRecord(name, level, __file__, 1, msg, args, exc_info)
+
+    def test_formats_valid_json(self):
+        """Test each record is a single JSON object with the core fields."""
+        formatter = JsonFormatter()
+
+        line = formatter.format(self._record("fetched %s in %dms", "/people/1/", 42))
+        data = json.loads(line)
+
+        assert data['msg'] == "fetched /people/1/ in 42ms"
+        assert data['level'] == 'INFO'
+        assert data['logger'] == 'app'
+        assert data['ts'].endswith('Z')
+        assert '\n' not in line
+
+    def test_static_fields_included(self):
+        """Test static fields are appended to every record."""
+        formatter = JsonFormatter({'service': 'weather', 'version': 2})
+
+        data = json.loads(formatter.format(self._record("hi")))
+
+        assert data['service'] == 'weather'
+        assert data['version'] == 2
+
+    def test_escapes_message(self):
+        """Test quotes and newlines in messages stay valid JSON."""
+        formatter = JsonFormatter()
+
+        data = json.loads(formatter.format(self._record('say "hi"\nbye')))
+
+        assert data['msg'] == 'say "hi"\nbye'
+
+    def test_exception_included(self):
+        """Test tracebacks are emitted in the exc field."""
+        formatter = JsonFormatter()
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            import sys
+            record = self._record("failed", level=logging.ERROR, exc_info=sys.exc_info())
+
+        data = json.loads(formatter.format(record))
+
+        assert 'ValueError: boom' in data['exc']
+
+    def test_json_file_logging(self, logger_name, tmp_path):
+        """Test setup_logger writes JSON lines when json_format is set."""
+        log_file = tmp_path / 'app.jsonl'
+        logger = setup_logger(logger_name, str(log_file), json_format=True,
+                              static_fields={'host': 'test'})
+
+        logger.info("one")
+        logger.warning("two")
+
+        lines = [json.loads(line) for line in log_file.read_text().splitlines()]
+        assert [line['msg'] for line in lines] == ['one', 'two']
+        assert lines[1]['host'] == 'test'
+
+
+class TestSampling:
+    """Tests for set_sampling."""
+
+    def test_keeps_one_in_n_debug_records(self, logger_name, tmp_path):
+        """Test only the sampled fraction of DEBUG records is written."""
+        log_file = tmp_path / 'app.log'
+        logger = setup_logger(logger_name, str(log_file), level=logging.DEBUG)
+        sampling = set_sampling(logger_name, 0.1)
+
+        for i in range(100):
+            logger.debug("url %d", i)
+
+        assert len(log_file.read_text().splitlines()) == 10
+        assert sampling.suppressed == 90
+
+    def test_higher_levels_not_sampled(self, logger_name, tmp_path):
+        """Test records above max_level always pass."""
+        log_file = tmp_path / 'app.log'
+        logger = setup_logger(logger_name, str(log_file), level=logging.DEBUG)
+        set_sampling(logger_name, 0.1)
+
+        for i in range(20):
+            logger.info("important %d", i)
+
+        assert len(log_file.read_text().splitlines()) == 20
+
+    def test_rate_one_removes_sampling(self, logger_name):
+        """Test a rate of 1 removes any existing sampling filter."""
+        set_sampling(logger_name, 0.5)
+        set_sampling(logger_name, 1)
+
+        assert logging.getLogger(logger_name).filters == []
+
+    def test_invalid_rate(self, logger_name):
+        """Test rates outside (0, 1] are rejected."""
+        with pytest.raises(ValueError):
+            set_sampling(logger_name, 0)
+
+
+class TestRotation:
+    """Tests for size and time based rotation."""
+
+    def test_size_rotation_with_compression(self, logger_name, tmp_path):
+        """Test rotated files are gzipped and the backup count is respected."""
+        log_file = tmp_path / 'app.log'
+        logger = setup_logger(logger_name, str(log_file), max_bytes=500,
+                              backup_count=2, compress=True)
+
+        for i in range(200):
+            logger.info("line %04d %s", i, 'x' * 40)
+
+        rotated = sorted(p.name for p in tmp_path.iterdir() if p.name != 'app.log')
+        assert rotated == ['app.log.1.gz', 'app.log.2.gz']
+        with gzip.open(tmp_path / 'app.log.1.gz', 'rt') as f:
+            assert 'line' in f.read()
+        assert log_file.stat().st_size <= 500
+
+    def test_time_rotation_handler(self, logger_name, tmp_path):
+        """Test a timed rotating handler is used when when is given."""
+        from logging.handlers import TimedRotatingFileHandler
+        logger = setup_logger(logger_name, str(tmp_path / 'app.log'), when='midnight')
+
+        assert any(isinstance(h, TimedRotatingFileHandler) for h in logger.handlers)
+
+    def test_rotation_with_queue(self, logger_name, tmp_path):
+        """Test rotation also works behind the background writer."""
+        log_file = tmp_path / 'app.log'
+        logger = setup_logger(logger_name, str(log_file), use_queue=True,
+                              max_bytes=500, backup_count=3, compress=True)
+
+        for i in range(100):
+            logger.info("line %04d %s", i, 'x' * 40)
+        shutdown_logger(logger_name)
+
+        assert (tmp_path / 'app.log.1.gz').exists()
+
+
+def _stalling_handler(name, release):
+    """Add a handler to the listener that blocks until release is set."""
+    from utils import logger as logger_module
+
+    class StallingHandler(logging.Handler):
+        seen = 0
+
+        def emit(self, record):
+            release.wait()
+            StallingHandler.seen += 1
+
+    handler = StallingHandler()
+    listener = logger_module._listeners[name]
+    listener.handlers = listener.handlers + (handler,)
+    return handler
@@ -8,7 +8,7 @@ class TestOpenAIMain:
     """Tests for main function."""
 
     @patch('openAI.config')
-    @patch('openAI.OpenAI')
+    @patch('openai.OpenAI')
     def test_main_success(self, mock_openai_class, mock_config):
         """Test successful OpenAI API call."""
         mock_config.return_value = 'test-api-key'
@@ -34,7 +34,7 @@ class TestOpenAIMain:
         mock_client.chat.completions.create.assert_called_once()
 
     @patch('openAI.config')
-    @patch('openAI.OpenAI')
+    @patch('openai.OpenAI')
     def test_main_with_different_response(self, mock_openai_class, mock_config):
         """Test OpenAI API with different response content."""
         mock_config.return_value = 'test-api-key'
@@ -61,7 +61,7 @@ class TestOpenAIMain:
         assert 'France' in call_args.kwargs['messages'][0]['content']
 
     @patch('openAI.config')
-    @patch('openAI.OpenAI')
+    @patch('openai.OpenAI')
     def test_main_api_error(self, mock_openai_class, mock_config):
         """Test OpenAI API error handling."""
         mock_config.return_value = 'test-api-key'
@@ -74,7 +74,7 @@ class TestOpenAIMain:
             main()
 
     @patch('openAI.config')
-    @patch('openAI.OpenAI')
+    @patch('openai.OpenAI')
     def test_main_invalid_api_key(self, mock_openai_class, mock_config):
         """Test with invalid API key."""
         mock_config.return_value = 'invalid-key'
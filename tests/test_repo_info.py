@@ -0,0 +1,83 @@
+"""Unit tests for github_tools/repo_info module."""
+import pytest
+from unittest.mock import patch, Mock
+from github import GithubException
+from github_tools.repo_info import get_repo_info
+
+
+class TestGetRepoInfo:
+    """Tests for get_repo_info function."""
+
+    @patch('github_tools.repo_info.get_client')
+    def test_get_repo_info_success(self, mock_get_client):
+        """Test successful repository information retrieval."""
+        mock_repo = Mock()
+        mock_repo.raw_data = {
+            'name': 'test-repo',
+            'description': 'A test repository',
+            'stargazers_count': 100,
+            'forks_count': 50
+        }
+        mock_get_client.return_value.get_repo.return_value = mock_repo
+
+        result = get_repo_info('testuser', 'test-repo', 'test_token')
+
+        assert result is not None
+        assert result['name'] == 'test-repo'
+        assert result['stargazers_count'] == 100
+        mock_get_client.assert_called_once_with('test_token')
+        mock_get_client.return_value.get_repo.assert_called_once_with('testuser/test-repo')
+
+    @patch('github_tools.repo_info.get_client')
+    def test_get_repo_info_not_found(self, mock_get_client):
+        """Test repository not found (404)."""
+        mock_get_client.return_value.get_repo.side_effect = GithubException(404, {'message': 'Not Found'})
+
+        result = get_repo_info('testuser', 'nonexistent-repo', 'test_token')
+
+        assert result is None
+
+    @patch('github_tools.repo_info.get_client')
+    def test_get_repo_info_unauthorized(self, mock_get_client):
+        """Test unauthorized access (401)."""
+        mock_get_client.return_value.get_repo.side_effect = GithubException(401, {'message': 'Bad credentials'})
+
+        result = get_repo_info('testuser', 'test-repo', 'invalid_token')
+
+        assert result is None
+
+    @patch('github_tools.repo_info.get_client')
+    def test_get_repo_info_exception(self, mock_get_client):
+        """Test exception handling."""
+        mock_get_client.side_effect = Exception("Network error")
+
+        result = get_repo_info('testuser', 'test-repo', 'test_token')
+
+        assert result is None
+
+    @patch('github_tools.repo_info.get_client')
+    def test_get_repo_info_rate_limited(self, mock_get_client):
+        """Test rate limiting (403)."""
+        mock_get_client.return_value.get_repo.side_effect = GithubException(403, {'message': 'rate limit'})
+
+        result = get_repo_info('testuser', 'test-repo', 'test_token')
+
+        assert result is None
+
+    @patch('github_tools.repo_info.get_client')
+    def test_get_repo_info_private_repo(self, mock_get_client):
+        """Test accessing private repository."""
+        mock_repo = Mock()
+        mock_repo.raw_data = {
+            'name': 'private-repo',
+            'description': 'A private repository',
+            'stargazers_count': 10,
+            'forks_count': 2,
+            'private': True
+        }
+        mock_get_client.return_value.get_repo.return_value = mock_repo
+
+        result = get_repo_info('testuser', 'private-repo', 'test_token')
+
+        assert result is not None
+        assert result['private'] is True
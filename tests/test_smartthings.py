@@ -1,7 +1,20 @@
 """Unit tests for smartthings module."""
+import asyncio
+import time
+import aiohttp
+import pysmartthings
 import pytest
 from unittest.mock import patch, Mock, AsyncMock
-from smartthings import list_devices
+from smartthings import (
+    DeviceCache, DeviceCommand, DeviceStateStore, EventReceiver, StateSync,
+    execute_commands, get_device_statuses, list_devices, refresh_all_statuses,
+)
+
+
+@pytest.fixture(autouse=True)
+def smartthings_config(monkeypatch):
+    """Provide the SmartThings token that smartthings.py reads on first use."""
+    monkeypatch.setenv('smart_things_pat', 'test-smartthings-token')
 
 
 class TestListDevices:
@@ -91,3 +104,531 @@ class TestListDevices:
         assert len(result[0].capabilities) == 5
         assert 'motion' in result[0].capabilities
         assert 'battery' in result[0].capabilities
+
+
+class FakeDevice:
+    """Device whose status refresh takes delay seconds and may raise."""
+
+    def __init__(self, index, delay=0.0, error=None, tracker=None):
+        self.device_id = f'device-{index}'
+        self.name = f'Device {index}'
+        self.status = Mock()
+        self.status.values = {'switch': 'on', 'level': index}
+        self._delay = delay
+        self._error = error
+        self._tracker = tracker
+        self.status.refresh = self._refresh
+
+    async def _refresh(self):
+        if self._tracker is not None:
+            self._tracker['active'] += 1
+            self._tracker['peak'] = max(self._tracker['peak'], self._tracker['active'])
+        try:
+            await asyncio.sleep(self._delay)
+            if self._error:
+                raise self._error
+        finally:
+            if self._tracker is not None:
+                self._tracker['active'] -= 1
+
+
+class TestGetDeviceStatuses:
+    """Tests for get_device_statuses function."""
+
+    @pytest.mark.asyncio
+    async def test_statuses_returned_in_order(self):
+        """Test each device gets a result with its attribute values."""
+        devices = [FakeDevice(i) for i in range(3)]
+
+        results = await get_device_statuses(devices)
+
+        assert [r['device_id'] for r in results] == ['device-0', 'device-1', 'device-2']
+        assert all(r['ok'] for r in results)
+        assert results[2]['status'] == {'switch': 'on', 'level': 2}
+
+    @pytest.mark.asyncio
+    async def test_600_devices_refresh_in_about_a_second(self):
+        """Test a large deployment is refreshed concurrently."""
+        devices = [FakeDevice(i, delay=0.05) for i in range(600)]
+
+        started = time.monotonic()
+        results = await get_device_statuses(devices, concurrency=50)
+
+        assert len(results) == 600
+        # 600 x 50 ms serially would take 30 s
+        assert time.monotonic() - started < 1.5
+
+    @pytest.mark.asyncio
+    async def test_concurrency_bounded(self):
+        """Test no more than concurrency requests are in flight."""
+        tracker = {'active': 0, 'peak': 0}
+        devices = [FakeDevice(i, delay=0.01, tracker=tracker) for i in range(40)]
+
+        await get_device_statuses(devices, concurrency=5)
+
+        assert tracker['peak'] == 5
+
+    @pytest.mark.asyncio
+    async def test_partial_failures_reported(self):
+        """Test errors and timeouts fail only their own device."""
+        devices = [
+            FakeDevice(0),
+            FakeDevice(1, error=aiohttp.ClientConnectionError('reset')),
+            FakeDevice(2, delay=1),
+        ]
+
+        results = await get_device_statuses(devices, timeout=0.1)
+
+        assert [r['ok'] for r in results] == [True, False, False]
+        assert 'reset' in results[1]['error']
+        assert 'timed out' in results[2]['error']
+        assert results[1]['status'] is None
+
+    @pytest.mark.asyncio
+    @patch('smartthings.aiohttp.ClientSession')
+    @patch('smartthings.pysmartthings.SmartThings')
+    async def test_refresh_all_statuses(self, mock_smartthings, mock_session, capsys):
+        """Test every listed device is refreshed and failures are printed."""
+        mock_api = AsyncMock()
+        mock_api.devices.return_value = [
+            FakeDevice(0), FakeDevice(1, error=aiohttp.ClientConnectionError('reset'))]
+        mock_smartthings.return_value = mock_api
+
+        results = await refresh_all_statuses()
+
+        assert [r['ok'] for r in results] == [True, False]
+        output = capsys.readouterr().out
+        assert 'Device 1 (device-1)' in output
+        assert 'Refreshed 1/2 device statuses' in output
+
+
+def _device_data(device_id, name, capabilities, label=None, components=None):
+    """Build a device as returned by the SmartThings devices endpoint."""
+    data = [{'id': 'main', 'capabilities': [{'id': c} for c in capabilities]}]
+    for component, component_capabilities in (components or {}).items():
+        data.append({'id': component, 'capabilities': [{'id': c} for c in component_capabilities]})
+    return {'deviceId': device_id, 'name': name, 'label': label, 'components': data}
+
+
+class FakeClock:
+    """Manually advanced time source."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_api():
+    """SmartThings client whose endpoints are AsyncMocks."""
+    api = Mock()
+    api._service = AsyncMock()
+    api._service.get_device_status.side_effect = lambda device_id: {
+        'components': {'main': {'switch': {'switch': {'value': f'on-{device_id}'}}}}}
+    api.devices = AsyncMock(side_effect=lambda: [
+        pysmartthings.DeviceEntity(api._service, data) for data in [
+            _device_data('light-1', 'Hue Bulb', ['switch', 'switchLevel'], label='Kitchen Light'),
+            _device_data('plug-1', 'Outlet', ['switch', 'powerMeter']),
+            _device_data('sensor-1', 'Multipurpose', ['contactSensor'],
+                         components={'temp': ['temperatureMeasurement']}),
+        ]])
+    return api
+
+
+class TestDeviceCache:
+    """Tests for DeviceCache."""
+
+    @pytest.mark.asyncio
+    async def test_device_list_fetched_once_per_ttl(self, fake_api):
+        """Test the device list is reused until the metadata TTL expires."""
+        clock = FakeClock()
+        cache = DeviceCache(metadata_ttl=100, clock=clock)
+
+        await cache.devices(fake_api)
+        devices = await cache.devices(fake_api)
+        assert fake_api.devices.await_count == 1
+        assert [d['device_id'] for d in devices] == ['light-1', 'plug-1', 'sensor-1']
+
+        clock.now += 101
+        await cache.devices(fake_api)
+        assert fake_api.devices.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_lookups(self, fake_api):
+        """Test lookups by ID, name, label and capability."""
+        cache = DeviceCache()
+        await cache.devices(fake_api)
+
+        assert cache.get('plug-1')['name'] == 'Outlet'
+        assert cache.find('kitchen light')['device_id'] == 'light-1'
+        assert cache.find('HUE BULB')['device_id'] == 'light-1'
+        assert cache.find('garage') is None
+        assert [d['device_id'] for d in cache.with_capability('switch')] == ['light-1', 'plug-1']
+        # Capabilities of non-main components are indexed too
+        assert [d['device_id'] for d in cache.with_capability('temperatureMeasurement')] == ['sensor-1']
+
+    @pytest.mark.asyncio
+    async def test_persisted_between_runs(self, fake_api, tmp_path):
+        """Test a new cache reads devices and statuses from disk."""
+        path = str(tmp_path / 'devices.json')
+        first = DeviceCache(path)
+        await first.statuses(fake_api)
+
+        second = DeviceCache(path)
+        statuses = await second.statuses(fake_api)
+
+        assert second.get('light-1')['label'] == 'Kitchen Light'
+        assert statuses['plug-1'] == {'switch': 'on-plug-1'}
+        assert fake_api.devices.await_count == 1
+        assert fake_api._service.get_device_status.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_only_expired_statuses_refreshed(self, fake_api):
+        """Test statuses are refreshed on their own shorter TTL."""
+        clock = FakeClock()
+        cache = DeviceCache(metadata_ttl=100, status_ttl=10, clock=clock)
+        await cache.statuses(fake_api, ['light-1'])
+        clock.now += 5
+
+        statuses = await cache.statuses(fake_api)
+        assert list(statuses) == ['light-1', 'plug-1', 'sensor-1']
+        assert fake_api._service.get_device_status.await_count == 3
+
+        clock.now += 6
+        await cache.statuses(fake_api)
+        # Only light-1 expired; the device list is still fresh
+        assert fake_api._service.get_device_status.await_count == 4
+        assert fake_api.devices.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_status_left_out(self, fake_api, capsys):
+        """Test a device whose refresh fails is omitted and retried next time."""
+        fake_api._service.get_device_status.side_effect = aiohttp.ClientConnectionError('reset')
+        cache = DeviceCache()
+
+        assert await cache.statuses(fake_api, ['plug-1']) == {}
+        assert 'plug-1' in capsys.readouterr().out
+
+        fake_api._service.get_device_status.side_effect = None
+        fake_api._service.get_device_status.return_value = {'components': {}}
+        assert await cache.statuses(fake_api, ['plug-1']) == {'plug-1': {}}
+
+
+def _too_many_requests(retry_after=None):
+    """Build the error pysmartthings raises for a 429 response."""
+    headers = {'Retry-After': retry_after} if retry_after is not None else {}
+    return pysmartthings.APIResponseError(Mock(), (), status=429, message='Too Many Requests',
+                                          headers=headers, data={})
+
+
+class FakeCommandService:
+    """Command endpoint that accepts everything after scripted failures."""
+
+    def __init__(self, delay=0.0, failures=None):
+        self.delay = delay
+        self.failures = {k: list(v) for k, v in (failures or {}).items()}
+        self.posts = []
+        self.active = 0
+        self.peak = 0
+
+    async def post(self, resource, data):
+        self.posts.append((resource, data))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            device_id = resource.split('/')[1]
+            pending = self.failures.get(device_id)
+            if pending:
+                raise pending.pop(0)
+            return {'results': [{'id': str(i), 'status': 'ACCEPTED'}
+                                for i, _ in enumerate(data['commands'])]}
+        finally:
+            self.active -= 1
+
+
+class TestExecuteCommands:
+    """Tests for execute_commands function."""
+
+    @pytest.mark.asyncio
+    async def test_commands_grouped_per_device(self):
+        """Test each device gets one request with all its commands."""
+        service = FakeCommandService()
+        api = Mock(_service=service)
+
+        summary = await execute_commands(api, [
+            DeviceCommand('light-1', 'switch', 'on'),
+            DeviceCommand('plug-1', 'switch', 'off'),
+            DeviceCommand('light-1', 'switchLevel', 'setLevel', [20]),
+        ])
+
+        assert len(service.posts) == 2
+        resource, data = service.posts[0]
+        assert resource == 'devices/light-1/commands'
+        assert data['commands'] == [
+            {'component': 'main', 'capability': 'switch', 'command': 'on'},
+            {'component': 'main', 'capability': 'switchLevel', 'command': 'setLevel',
+             'arguments': [20]},
+        ]
+        assert [r['device_id'] for r in summary['results']] == ['light-1', 'plug-1']
+        assert summary['results'][0]['commands'] == 2
+        assert (summary['succeeded'], summary['failed']) == (2, 0)
+
+    @pytest.mark.asyncio
+    async def test_scene_completes_in_one_wave(self):
+        """Test hundreds of devices are commanded concurrently within the bound."""
+        service = FakeCommandService(delay=0.05)
+        api = Mock(_service=service)
+
+        summary = await execute_commands(
+            api, [DeviceCommand(f'light-{i}', 'switch', 'off') for i in range(300)],
+            concurrency=50)
+
+        assert summary['succeeded'] == 300
+        assert service.peak == 50
+        # Six waves of 50 ms; a serial loop would take 15 s
+        assert summary['elapsed'] < 1
+
+    @pytest.mark.asyncio
+    async def test_429_retried_with_backoff(self):
+        """Test rate-limited requests are retried until accepted."""
+        service = FakeCommandService(failures={'light-1': [_too_many_requests(),
+                                                           _too_many_requests()]})
+        api = Mock(_service=service)
+
+        started = time.monotonic()
+        summary = await execute_commands(api, [DeviceCommand('light-1', 'switch', 'on')],
+                                         backoff=0.05)
+
+        result = summary['results'][0]
+        assert result['ok']
+        assert result['attempts'] == 3
+        # Waited 0.05 then 0.1 seconds
+        assert time.monotonic() - started >= 0.15
+
+    @pytest.mark.asyncio
+    async def test_retry_after_header_honored(self):
+        """Test the server's Retry-After overrides the computed backoff."""
+        service = FakeCommandService(failures={'light-1': [_too_many_requests('0.2')]})
+        api = Mock(_service=service)
+
+        started = time.monotonic()
+        summary = await execute_commands(api, [DeviceCommand('light-1', 'switch', 'on')],
+                                         backoff=0.01)
+
+        assert summary['results'][0]['ok']
+        assert time.monotonic() - started >= 0.2
+
+    @pytest.mark.asyncio
+    async def test_retries_exhausted(self):
+        """Test a device still rate limited after every retry is reported failed."""
+        service = FakeCommandService(failures={'light-1': [_too_many_requests()] * 5})
+        api = Mock(_service=service)
+
+        summary = await execute_commands(api, [DeviceCommand('light-1', 'switch', 'on'),
+                                               DeviceCommand('plug-1', 'switch', 'on')],
+                                         retries=2, backoff=0.01)
+
+        failed = summary['results'][0]
+        assert not failed['ok']
+        assert failed['attempts'] == 3
+        assert '429' in failed['error']
+        assert summary['results'][1]['ok']
+
+    @pytest.mark.asyncio
+    async def test_other_errors_not_retried(self):
+        """Test non-429 failures and rejected commands fail immediately."""
+        service = FakeCommandService(failures={
+            'light-1': [aiohttp.ClientConnectionError('reset')]})
+        service_post = service.post
+
+        async def post(resource, data):
+            if resource.startswith('devices/plug-1'):
+                return {'results': [{'id': '0', 'status': 'FAILED'}]}
+            return await service_post(resource, data)
+
+        service.post = post
+        api = Mock(_service=service)
+
+        summary = await execute_commands(api, [DeviceCommand('light-1', 'switch', 'on'),
+                                               DeviceCommand('plug-1', 'switch', 'on')])
+
+        assert [r['attempts'] for r in summary['results']] == [1, 1]
+        assert 'reset' in summary['results'][0]['error']
+        assert 'FAILED' in summary['results'][1]['error']
+        assert summary['failed'] == 2
+
+
+class EventEmitter:
+    """Post SmartThings webhook lifecycle requests to a local receiver."""
+
+    def __init__(self, url):
+        self.url = url
+
+    async def post(self, body):
+        async with aiohttp.ClientSession() as session:
+            async with session.post(self.url, json=body) as response:
+                return response.status, await response.json()
+
+    async def device_event(self, device_id, attribute, value, component='main'):
+        return await self.post({'lifecycle': 'EVENT', 'eventData': {'events': [
+            {'eventType': 'DEVICE_EVENT', 'deviceEvent': {
+                'deviceId': device_id, 'componentId': component, 'capability': attribute,
+                'attribute': attribute, 'value': value}},
+        ]}})
+
+
+class TestDeviceStateStore:
+    """Tests for DeviceStateStore."""
+
+    def test_events_and_polls_report_changes(self):
+        """Test only differing values count as changes."""
+        store = DeviceStateStore()
+
+        assert store.apply_event('light-1', 'switch', 'on')
+        assert not store.apply_event('light-1', 'switch', 'on')
+        assert store.apply_event('light-1', 'temperature', 20, component='probe')
+        assert store.apply_status('light-1', {'switch': 'on', 'level': 50}) == 1
+        assert store.get('light-1') == {'switch': 'on', 'probe.temperature': 20, 'level': 50}
+        assert (store.events, store.polled) == (3, 1)
+
+    def test_stale_devices(self):
+        """Test devices without recent updates are reported stale."""
+        clock = FakeClock()
+        store = DeviceStateStore(clock=clock)
+        store.apply_event('light-1', 'switch', 'on')
+        clock.now += 10
+        store.apply_event('plug-1', 'switch', 'on')
+
+        assert store.stale(['light-1', 'plug-1', 'new-1'], 5) == ['light-1', 'new-1']
+
+
+class TestEventReceiver:
+    """Tests for EventReceiver with a local event emitter."""
+
+    @pytest.mark.asyncio
+    async def test_device_events_applied(self):
+        """Test posted device events update the store."""
+        store = DeviceStateStore()
+        receiver = EventReceiver(store, port=0)
+        await receiver.start()
+        try:
+            emitter = EventEmitter(receiver.url)
+            assert (await emitter.device_event('light-1', 'switch', 'on'))[0] == 200
+            await emitter.device_event('light-1', 'level', 30)
+            await emitter.post({'lifecycle': 'EVENT', 'eventData': {'events': [
+                {'eventType': 'MODE_EVENT', 'modeEvent': {'modeId': 'away'}}]}})
+        finally:
+            await receiver.stop()
+
+        assert store.get('light-1') == {'switch': 'on', 'level': 30}
+        assert store.events == 2
+
+    @pytest.mark.asyncio
+    async def test_ping_and_invalid_requests(self):
+        """Test PING echoes the challenge and bad JSON is rejected."""
+        receiver = EventReceiver(DeviceStateStore(), port=0)
+        await receiver.start()
+        try:
+            status, body = await EventEmitter(receiver.url).post(
+                {'lifecycle': 'PING', 'pingData': {'challenge': 'abc'}})
+            async with aiohttp.ClientSession() as session:
+                async with session.post(receiver.url, data=b'not json') as response:
+                    bad_status = response.status
+        finally:
+            await receiver.stop()
+
+        assert (status, body) == (200, {'pingData': {'challenge': 'abc'}})
+        assert bad_status == 400
+
+    @pytest.mark.asyncio
+    async def test_configuration_lifecycle(self):
+        """Test INITIALIZE asks for device access and PAGE completes the install."""
+        receiver = EventReceiver(DeviceStateStore(), port=0)
+        await receiver.start()
+        try:
+            emitter = EventEmitter(receiver.url)
+            _, initialize = await emitter.post({'lifecycle': 'CONFIGURATION',
+                                                'configurationData': {'phase': 'INITIALIZE'}})
+            _, page = await emitter.post({'lifecycle': 'CONFIGURATION',
+                                          'configurationData': {'phase': 'PAGE', 'pageId': '1'}})
+        finally:
+            await receiver.stop()
+
+        assert initialize['configurationData']['initialize']['permissions'] == ['r:devices:*']
+        assert initialize['configurationData']['initialize']['firstPageId'] == '1'
+        assert page['configurationData']['page']['complete'] is True
+
+    @pytest.mark.asyncio
+    async def test_install_subscribes_with_app_token(self):
+        """Test INSTALL creates a device subscription per device with the authToken."""
+        service = Mock(create_subscription=AsyncMock(return_value={}),
+                       delete_all_subscriptions=AsyncMock(return_value={}))
+        receiver = EventReceiver(DeviceStateStore(), port=0, device_ids=['light-1', 'plug-1'])
+        await receiver.start()
+        try:
+            with patch('smartthings.Api', return_value=service) as api_class:
+                status, body = await EventEmitter(receiver.url).post({
+                    'lifecycle': 'INSTALL', 'installData': {
+                        'authToken': 'app-token',
+                        'installedApp': {'installedAppId': 'app-1', 'locationId': 'home'}}})
+        finally:
+            await receiver.stop()
+
+        assert (status, body) == (200, {'installData': {}})
+        assert api_class.call_args.args[1] == 'app-token'
+        service.delete_all_subscriptions.assert_not_awaited()
+        subscribed = [(call.args[0], call.args[1]['device']['deviceId'])
+                      for call in service.create_subscription.await_args_list]
+        assert subscribed == [('app-1', 'light-1'), ('app-1', 'plug-1')]
+
+    @pytest.mark.asyncio
+    async def test_update_replaces_subscriptions(self, capsys):
+        """Test UPDATE removes old subscriptions and reports failed ones."""
+        service = Mock(create_subscription=AsyncMock(side_effect=[{}, aiohttp.ClientError('denied')]),
+                       delete_all_subscriptions=AsyncMock(return_value={}))
+        receiver = EventReceiver(DeviceStateStore(), port=0, device_ids=['light-1', 'plug-1'])
+        await receiver.start()
+        try:
+            with patch('smartthings.Api', return_value=service):
+                status, body = await EventEmitter(receiver.url).post({
+                    'lifecycle': 'UPDATE', 'updateData': {
+                        'authToken': 'new-token',
+                        'installedApp': {'installedAppId': 'app-1'}}})
+        finally:
+            await receiver.stop()
+
+        assert (status, body) == (200, {'updateData': {}})
+        service.delete_all_subscriptions.assert_awaited_once_with('app-1')
+        output = capsys.readouterr().out
+        assert 'Could not subscribe to plug-1: denied' in output
+        assert 'app-1 to 1/2 devices' in output
+
+
+class TestStateSync:
+    """Tests for StateSync."""
+
+    @pytest.mark.asyncio
+    async def test_polls_only_devices_without_events(self, fake_api):
+        """Test devices kept current by events are never re-polled."""
+        sync = StateSync(fake_api, ['light-1', 'plug-1'], stale_after=0.1,
+                         check_interval=0.02, port=0)
+        task = asyncio.create_task(sync.run())
+        while sync.store.polled < 2:
+            await asyncio.sleep(0.01)
+
+        emitter = EventEmitter(sync.receiver.url)
+        for _ in range(10):
+            await emitter.device_event('light-1', 'switch', 'off')
+            await asyncio.sleep(0.03)
+        sync.stop()
+        await asyncio.wait_for(task, 1)
+
+        polled = [call.args[0] for call in fake_api._service.get_device_status.await_args_list]
+        # Both devices once at start-up, then only the quiet one
+        assert polled.count('light-1') == 1
+        assert polled.count('plug-1') >= 2
+        assert sync.store.get('light-1') == {'switch': 'off'}
+        assert sync.store.get('plug-1') == {'switch': 'on-plug-1'}
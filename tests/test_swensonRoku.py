@@ -1,15 +1,94 @@
 """Unit tests for swensonRoku module."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import pytest
-from unittest.mock import patch, Mock
-from swensonRoku import roku_home, select_app, launch_app, get_apps
+from unittest.mock import patch
+from swensonRoku import (
+    roku_home,
+    select_app,
+    launch_app,
+    get_apps,
+    launch_by_name,
+    AppCatalog,
+    CatalogApp,
+    MacroStep,
+    RokuController,
+    compile_macro,
+)
+
+
+class _ECPStandIn(BaseHTTPRequestHandler):
+    """Minimal Roku ECP endpoint with keep-alive.
+
+    Every request is logged on the server as (path, client port) so tests
+    can check connection reuse. Servers flagged broken answer HTTP 500.
+    GET /query/apps lists server.apps; launching an app not in it is a 404.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.server.log.append((self.path, self.client_address[1]))
+        self.server.times.append(time.monotonic())
+        time.sleep(self.server.delay)
+        status = 500 if self.server.broken else 200
+        if self.path.startswith('/launch/') and self.path[8:] not in self.server.apps:
+            status = 404
+        self._reply(status)
+
+    def do_GET(self):
+        self.server.log.append((self.path, self.client_address[1]))
+        if self.path != '/query/apps':
+            self._reply(404)
+            return
+        apps = ''.join(f'<app id="{app_id}" type="appl" version="1.0">{name}</app>'
+                       for app_id, name in self.server.apps.items())
+        self._reply(200, f'<?xml version="1.0" encoding="UTF-8" ?><apps>{apps}</apps>'.encode())
+
+    def _reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ecp_devices():
+    """Factory starting ECP stand-ins on 127.0.0.2, 127.0.0.3, ... sharing one port."""
+    servers = []
+
+    def start(count, delay=0.0, broken=()):
+        port = 0
+        devices = []
+        for i in range(count):
+            ip = f'127.0.0.{i + 2}'
+            server = ThreadingHTTPServer((ip, port), _ECPStandIn)
+            port = server.server_port
+            server.log, server.delay, server.broken = [], delay, i in broken
+            server.times = []
+            server.apps = {'12': 'Netflix', '837': 'YouTube', 'tvinput.hdmi1': 'HDMI 1'}
+            threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+            servers.append(server)
+            devices.append(f'{ip}:{port}')
+        return devices, servers[-count:]
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
 
 
 class TestRokuHome:
     """Tests for roku_home function."""
 
-    @patch('swensonRoku.roku')
-    def test_roku_home(self, mock_roku):
+    @patch('swensonRoku.get_roku')
+    def test_roku_home(self, mock_get_roku):
         """Test roku_home calls roku.home()."""
+        mock_roku = mock_get_roku.return_value
         roku_home()
         mock_roku.home.assert_called_once()
 
@@ -67,40 +146,278 @@ class TestSelectApp:
 class TestLaunchApp:
     """Tests for launch_app function."""
 
-    @patch('swensonRoku.roku')
+    @patch('swensonRoku.launch_app_id', return_value=True)
+    @patch('swensonRoku.get_app_catalog')
     @patch('swensonRoku.select_app', return_value='12')
-    def test_launch_app(self, mock_select_app, mock_roku):
-        """Test launching an application."""
-        mock_roku.apps = ['Netflix [12]', 'Hulu [34]']
-        mock_app = Mock()
-        mock_roku.__getitem__.return_value = mock_app
+    def test_launch_app(self, mock_select_app, mock_get_catalog, mock_launch):
+        """Test launching an application picked from the cached catalog."""
+        mock_get_catalog.return_value.apps.return_value = {'12': 'Netflix', '34': 'Hulu'}
 
         launch_app()
 
-        mock_select_app.assert_called_once_with(['Netflix [12]', 'Hulu [34]'])
-        mock_roku.__getitem__.assert_called_once_with('12')
-        mock_app.launch.assert_called_once()
+        mock_select_app.assert_called_once_with([CatalogApp('12', 'Netflix'),
+                                                 CatalogApp('34', 'Hulu')])
+        assert mock_launch.call_args.args[0] == '12'
+
+    @patch('builtins.input', return_value='2')
+    def test_select_catalog_app_uses_id(self, mock_input):
+        """Test catalog entries are selected by their ID, not by regex."""
+        apps = [CatalogApp('12', 'Netflix'), CatalogApp('tvinput.hdmi1', 'HDMI 1')]
+
+        assert select_app(apps) == 'tvinput.hdmi1'
 
 
 class TestGetApps:
     """Tests for get_apps function."""
 
-    @patch('swensonRoku.roku')
+    @patch('swensonRoku.get_roku')
     @patch('builtins.print')
-    def test_get_apps(self, mock_print, mock_roku):
+    def test_get_apps(self, mock_print, mock_get_roku):
         """Test getting and displaying all apps."""
+        mock_roku = mock_get_roku.return_value
         mock_roku.apps = ['Netflix [12]', 'Hulu [34]', 'YouTube [56]']
 
         get_apps()
 
         mock_print.assert_called_once_with(['Netflix [12]', 'Hulu [34]', 'YouTube [56]'])
 
-    @patch('swensonRoku.roku')
+    @patch('swensonRoku.get_roku')
     @patch('builtins.print')
-    def test_get_apps_empty(self, mock_print, mock_roku):
+    def test_get_apps_empty(self, mock_print, mock_get_roku):
         """Test getting apps when no apps are available."""
+        mock_roku = mock_get_roku.return_value
         mock_roku.apps = []
 
         get_apps()
 
         mock_print.assert_called_once_with([])
+
+
+class TestRokuController:
+    """Tests for concurrent multi-device control."""
+
+    @pytest.mark.asyncio
+    async def test_launch_broadcast_to_all(self, ecp_devices):
+        """Test a launch reaches every device with a single ECP POST each."""
+        devices, servers = ecp_devices(5)
+
+        async with RokuController(devices) as controller:
+            results = await controller.launch('12')
+
+        assert [r['device'] for r in results] == devices
+        assert all(r['ok'] for r in results)
+        assert all(server.log[0][0] == '/launch/12' for server in servers)
+
+    @pytest.mark.asyncio
+    async def test_broadcast_is_concurrent(self, ecp_devices):
+        """Test 20 slow devices take about one round trip, not twenty."""
+        devices, _ = ecp_devices(20, delay=0.1)
+
+        async with RokuController(devices) as controller:
+            started = time.monotonic()
+            results = await controller.home()
+            elapsed = time.monotonic() - started
+
+        assert all(r['ok'] for r in results)
+        assert all(r['latency'] >= 0.1 for r in results)
+        assert elapsed < 0.6
+
+    @pytest.mark.asyncio
+    async def test_connections_kept_alive(self, ecp_devices):
+        """Test repeated commands reuse each device's connection."""
+        devices, servers = ecp_devices(3)
+
+        async with RokuController(devices) as controller:
+            await controller.home()
+            await controller.keypress('Down')
+            await controller.launch('12')
+
+        for server in servers:
+            assert [path for path, _ in server.log] == ['/keypress/Home', '/keypress/Down',
+                                                        '/launch/12']
+            assert len({port for _, port in server.log}) == 1
+
+    @pytest.mark.asyncio
+    async def test_failures_reported_per_device(self, ecp_devices):
+        """Test HTTP errors and unreachable devices fail without affecting others."""
+        devices, _ = ecp_devices(2, broken=(1,))
+        devices.append('127.0.0.1:1')
+
+        async with RokuController(devices, timeout=1) as controller:
+            results = await controller.home()
+
+        assert [r['ok'] for r in results] == [True, False, False]
+        assert results[1]['error'] == 'HTTP 500'
+        assert results[2]['status'] is None
+        assert 'ClientConnectorError' in results[2]['error']
+
+    def test_base_url_default_port(self):
+        """Test bare IPs use the ECP port."""
+        assert RokuController.base_url('192.168.0.8') == 'http://192.168.0.8:8060'
+        assert RokuController.base_url('127.0.0.2:9000') == 'http://127.0.0.2:9000'
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """Use a fresh, file-backed app catalog."""
+    app_catalog = AppCatalog(str(tmp_path / 'apps.json'))
+    with patch('swensonRoku.get_app_catalog', return_value=app_catalog):
+        yield app_catalog
+
+
+class TestAppCatalog:
+    """Tests for the cached app catalog and launch_by_name."""
+
+    def test_catalog_indexed_by_id(self, ecp_devices, catalog):
+        """Test /query/apps is parsed into an ID -> name dict."""
+        (device,), _ = ecp_devices(1)
+
+        apps = catalog.apps(device)
+
+        assert apps == {'12': 'Netflix', '837': 'YouTube', 'tvinput.hdmi1': 'HDMI 1'}
+
+    def test_launch_by_name_single_post_when_cached(self, ecp_devices, catalog):
+        """Test a cached app is launched with one POST and no catalog fetch."""
+        (device,), (server,) = ecp_devices(1)
+        catalog.apps(device)
+        server.log.clear()
+
+        assert launch_by_name('netflix', device) is True
+        assert [path for path, _ in server.log] == ['/launch/12']
+
+    def test_catalog_persisted_between_runs(self, ecp_devices, tmp_path):
+        """Test a new process reuses the catalog file instead of refetching."""
+        (device,), (server,) = ecp_devices(1)
+        AppCatalog(str(tmp_path / 'apps.json')).apps(device)
+        server.log.clear()
+
+        with patch('swensonRoku.get_app_catalog',
+                   return_value=AppCatalog(str(tmp_path / 'apps.json'))):
+            assert launch_by_name('YouTube', device) is True
+
+        assert [path for path, _ in server.log] == ['/launch/837']
+
+    def test_newly_installed_app_triggers_refetch(self, ecp_devices, catalog):
+        """Test an unknown name refreshes the catalog once."""
+        (device,), (server,) = ecp_devices(1)
+        catalog.apps(device)
+        server.apps['2285'] = 'Hulu'
+        server.log.clear()
+
+        assert launch_by_name('Hulu', device) is True
+        assert [path for path, _ in server.log] == ['/query/apps', '/launch/2285']
+
+    def test_unknown_app_fetches_catalog_once(self, ecp_devices, catalog):
+        """Test a name that is not installed refetches the catalog only once."""
+        (device,), (server,) = ecp_devices(1)
+        catalog.apps(device)
+        server.log.clear()
+
+        assert launch_by_name('Hulu', device) is False
+        assert [path for path, _ in server.log] == ['/query/apps']
+
+    def test_uninstalled_app_invalidates_catalog(self, ecp_devices, catalog):
+        """Test a failed launch of a cached ID refreshes the catalog."""
+        (device,), (server,) = ecp_devices(1)
+        catalog.apps(device)
+        del server.apps['12']
+
+        assert launch_by_name('Netflix', device) is False
+        assert '12' not in catalog.apps(device)
+
+    def test_expired_catalog_refetched(self, ecp_devices, tmp_path):
+        """Test catalogs past their TTL are fetched again."""
+        (device,), (server,) = ecp_devices(1)
+        short = AppCatalog(ttl=0)
+
+        short.apps(device)
+        short.apps(device)
+
+        assert [path for path, _ in server.log] == ['/query/apps', '/query/apps']
+
+
+class TestCompileMacro:
+    """Tests for compile_macro."""
+
+    def test_keys_repeats_and_launch(self):
+        """Test keys, repeat counts and launches compile to ECP paths."""
+        steps = compile_macro('Home, Down*2, Select, launch:12')
+
+        assert [step.path for step in steps] == [
+            '/keypress/Home', '/keypress/Down', '/keypress/Down',
+            '/keypress/Select', '/launch/12',
+        ]
+
+    def test_text_and_wait(self):
+        """Test text becomes one Lit_ keypress per character and wait a pause."""
+        steps = compile_macro('text:a b&, wait:1.5')
+
+        assert [step.path for step in steps[:4]] == [
+            '/keypress/Lit_a', '/keypress/Lit_%20', '/keypress/Lit_b', '/keypress/Lit_%26',
+        ]
+        assert steps[4] == MacroStep(None, 1.5)
+
+    def test_invalid_steps_rejected(self):
+        """Test malformed steps raise ValueError."""
+        for macro in ('Down*x', 'wait:soon', 'jump:3', 'Home/../x'):
+            with pytest.raises(ValueError):
+                compile_macro(macro)
+
+
+class TestRunMacro:
+    """Tests for playing macros on many devices."""
+
+    @pytest.mark.asyncio
+    async def test_macro_on_many_devices(self, ecp_devices):
+        """Test every device receives the whole macro, in order, on one connection."""
+        devices, servers = ecp_devices(10)
+
+        async with RokuController(devices) as controller:
+            started = time.monotonic()
+            results = await controller.run_macro('Home, Down*2, Select', interval=0.05)
+            elapsed = time.monotonic() - started
+
+        assert all(r['ok'] for r in results)
+        assert all(len(r['steps']) == 4 for r in results)
+        for server in servers:
+            assert [path for path, _ in server.log] == [
+                '/keypress/Home', '/keypress/Down', '/keypress/Down', '/keypress/Select']
+            assert len({port for _, port in server.log}) == 1
+        # Devices run side by side: about three intervals, not thirty
+        assert elapsed < 0.5
+
+    @pytest.mark.asyncio
+    async def test_pacing_between_steps(self, ecp_devices):
+        """Test steps are spaced by the interval and waits are honoured."""
+        devices, (server,) = ecp_devices(1)
+
+        async with RokuController(devices) as controller:
+            await controller.run_macro('Home, Down, wait:0.2, Select', interval=0.1)
+
+        gaps = [b - a for a, b in zip(server.times, server.times[1:])]
+        assert 0.08 <= gaps[0] <= 0.18
+        assert 0.28 <= gaps[1] <= 0.38
+
+    @pytest.mark.asyncio
+    async def test_latency_does_not_stretch_pacing(self, ecp_devices):
+        """Test slow responses are absorbed by the schedule."""
+        devices, (server,) = ecp_devices(1, delay=0.05)
+
+        async with RokuController(devices) as controller:
+            results = await controller.run_macro('Up*4', interval=0.1)
+
+        assert all(step['latency'] >= 0.05 for step in results[0]['steps'])
+        assert server.times[-1] - server.times[0] < 0.4
+
+    @pytest.mark.asyncio
+    async def test_failed_step_aborts_device(self, ecp_devices):
+        """Test a failing step stops that device's macro only."""
+        devices, servers = ecp_devices(2, broken=(1,))
+
+        async with RokuController(devices) as controller:
+            results = await controller.run_macro('Home, Select', interval=0.01)
+
+        assert results[0]['ok'] is True
+        assert results[1]['ok'] is False
+        assert 'step 1' in results[1]['error']
+        assert len(servers[1].log) == 1
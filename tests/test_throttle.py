@@ -0,0 +1,41 @@
+"""Unit tests for utils/throttle module."""
+import threading
+import time
+from utils.throttle import Throttle
+
+
+class TestThrottle:
+    """Tests for Throttle."""
+
+    def test_calls_spaced_across_threads(self):
+        """Test concurrent callers are released one interval apart."""
+        throttle = Throttle(0.05)
+        released = []
+        lock = threading.Lock()
+
+        def call():
+            throttle.wait()
+            with lock:
+                released.append(time.monotonic())
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        released.sort()
+        gaps = [b - a for a, b in zip(released, released[1:])]
+        assert all(gap >= 0.04 for gap in gaps)
+
+    def test_per_second(self):
+        """Test a rate is converted to an interval and 0 disables spacing."""
+        assert Throttle.per_second(20).interval == 0.05
+        unlimited = Throttle.per_second(0)
+
+        started = time.monotonic()
+        for _ in range(5):
+            unlimited.wait()
+
+        assert unlimited.interval == 0.0
+        assert time.monotonic() - started < 0.05
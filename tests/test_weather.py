@@ -1,183 +1,516 @@
 """Unit tests for weather module."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 import pytest
 from unittest.mock import patch, Mock
 import requests
-from weather import get_temp_based_on_ip, get_zipcode, get_public_ip
+from utils.cache import TTLCache
+from weather import (
+    get_temp_based_on_ip,
+    get_zipcode,
+    get_public_ip,
+    get_location,
+    get_cache_stats,
+    get_weather_batch,
+)
+
+
+@pytest.fixture(autouse=True)
+def weather_config(monkeypatch):
+    """Provide the WeatherStack key that weather.py reads on first use."""
+    monkeypatch.setenv('weather_pat', 'test-weather-key')
+
+
+@pytest.fixture(autouse=True)
+def geo_cache():
+    """Give each test an empty, in-memory geolocation cache."""
+    cache = TTLCache(ttl=60)
+    with patch('weather._get_geo_cache', return_value=cache):
+        yield cache
+
+
+@pytest.fixture(autouse=True)
+def weather_cache():
+    """Give each test an empty weather cache."""
+    cache = TTLCache(ttl=60)
+    with patch('weather._get_weather_cache', return_value=cache):
+        yield cache
+
+
+@pytest.fixture(autouse=True)
+def zip_buckets():
+    """Give each test an empty, in-memory zip -> grid cell cache."""
+    cache = TTLCache(ttl=60)
+    with patch('weather._get_zip_bucket_cache', return_value=cache):
+        yield cache
+
+
+class _WeatherStackStandIn(BaseHTTPRequestHandler):
+    """Minimal local WeatherStack /current endpoint.
+
+    Zip 00000 answers with an API error and 99999 with HTTP 500; every
+    other zip gets a temperature derived from the zip code. Zips sharing
+    their first three digits are placed within the same 0.1 degree cell.
+    """
+
+    requests_seen = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query).get('query', [''])[0]
+        self.requests_seen.append(query)
+        if url.path != '/current' or query == '99999':
+            self.send_response(500)
+            self.end_headers()
+            return
+        if query == '00000':
+            body = {'error': {'info': 'Invalid query'}}
+        else:
+            body = {'location': {'name': f'Town {query}',
+                                 'lat': str(30.05 + int(query[:3]) * 0.2),
+                                 'lon': str(-99.95 + int(query[3:]) * 0.001)},
+                    'current': {'temperature': int(query) % 100}}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def weatherstack(monkeypatch):
+    """Run the WeatherStack stand-in and point weather.py at it."""
+    _WeatherStackStandIn.requests_seen = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _WeatherStackStandIn)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    monkeypatch.setenv('weather_url', f'http://127.0.0.1:{server.server_port}')
+    yield _WeatherStackStandIn
+    server.shutdown()
+    server.server_close()
+
+
+def _response(status_code=200, data=None, json_error=None):
+    """Build a mock HTTP response."""
+    response = Mock()
+    response.status_code = status_code
+    if json_error:
+        response.json.side_effect = json_error
+    else:
+        response.json.return_value = data if data is not None else {}
+    return response
+
+
+def _route(ipinfo=None, ip_api=None):
+    """Return a session.get side effect answering per provider host."""
+    def get(url, **kwargs):
+        handler = ipinfo if 'ipinfo' in url else ip_api
+        if isinstance(handler, Exception):
+            raise handler
+        if isinstance(handler, Mock):
+            return handler
+        return handler()
+    return get
 
 
 class TestGetPublicIP:
     """Tests for get_public_ip function."""
 
-    @patch('weather.requests.get')
-    def test_get_public_ip_success(self, mock_get):
+    @patch('weather._get_session')
+    def test_get_public_ip_success(self, mock_session):
         """Test successful IP retrieval."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {'ip': '192.168.1.1'}
-        mock_get.return_value = mock_response
+        mock_session.return_value.get.side_effect = _route(
+            ipinfo=_response(data={'ip': '192.168.1.1', 'postal': '10001'}),
+            ip_api=_response(data={'query': '192.168.1.1', 'zip': '10001', 'status': 'success'}),
+        )
 
         result = get_public_ip()
         assert result == '192.168.1.1'
-        mock_get.assert_called_once()
 
-    @patch('weather.requests.get')
-    def test_get_public_ip_no_ip_in_response(self, mock_get):
-        """Test when response doesn't contain IP."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {}
-        mock_get.return_value = mock_response
+    @patch('weather._get_session')
+    def test_get_public_ip_no_ip_in_response(self, mock_session):
+        """Test when responses don't contain an IP."""
+        mock_session.return_value.get.side_effect = _route(
+            ipinfo=_response(data={}), ip_api=_response(data={})
+        )
 
         result = get_public_ip()
         assert result is None
 
-    @patch('weather.requests.get')
-    def test_get_public_ip_failed_request(self, mock_get):
-        """Test failed HTTP request."""
-        mock_response = Mock()
-        mock_response.status_code = 500
-        mock_get.return_value = mock_response
+    @patch('weather._get_session')
+    def test_get_public_ip_failed_request(self, mock_session):
+        """Test failed HTTP requests."""
+        mock_session.return_value.get.return_value = _response(status_code=500)
 
         result = get_public_ip()
         assert result is None
 
-    @patch('weather.requests.get')
-    def test_get_public_ip_network_error(self, mock_get):
+    @patch('weather._get_session')
+    def test_get_public_ip_network_error(self, mock_session):
         """Test network error handling."""
-        mock_get.side_effect = requests.exceptions.ConnectionError("Network error")
+        mock_session.return_value.get.side_effect = requests.exceptions.ConnectionError("Network error")
 
         result = get_public_ip()
         assert result is None
 
-    @patch('weather.requests.get')
-    def test_get_public_ip_json_error(self, mock_get):
+    @patch('weather._get_session')
+    def test_get_public_ip_json_error(self, mock_session):
         """Test JSON parsing error."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.side_effect = ValueError("Invalid JSON")
-        mock_get.return_value = mock_response
+        mock_session.return_value.get.return_value = _response(json_error=ValueError("Invalid JSON"))
 
         result = get_public_ip()
         assert result is None
 
+    @patch('weather._get_session')
+    def test_get_public_ip_one_provider_down(self, mock_session):
+        """Test a failing provider is covered by the other one."""
+        mock_session.return_value.get.side_effect = _route(
+            ipinfo=requests.exceptions.ConnectionError("down"),
+            ip_api=_response(data={'query': '10.0.0.1', 'zip': '12345', 'status': 'success'}),
+        )
+
+        result = get_public_ip()
+        assert result == '10.0.0.1'
+
 
 class TestGetZipcode:
     """Tests for get_zipcode function."""
 
-    @patch('weather.get_public_ip')
-    @patch('weather.requests.get')
-    def test_get_zipcode_success(self, mock_get, mock_public_ip):
+    @patch('weather._get_session')
+    def test_get_zipcode_success(self, mock_session):
         """Test successful zipcode retrieval."""
-        mock_public_ip.return_value = '192.168.1.1'
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {'zip': '12345', 'status': 'success'}
-        mock_get.return_value = mock_response
+        mock_session.return_value.get.side_effect = _route(
+            ipinfo=_response(data={'ip': '192.168.1.1', 'postal': '12345'}),
+            ip_api=_response(data={'query': '192.168.1.1', 'zip': '12345', 'status': 'success'}),
+        )
 
         result = get_zipcode()
         assert result == '12345'
 
-    @patch('weather.get_public_ip')
-    def test_get_zipcode_no_public_ip(self, mock_public_ip):
-        """Test when public IP cannot be retrieved."""
-        mock_public_ip.return_value = None
+    @patch('weather._get_session')
+    def test_get_zipcode_no_public_ip(self, mock_session):
+        """Test when no provider can determine the IP."""
+        mock_session.return_value.get.return_value = _response(status_code=503)
 
         result = get_zipcode()
         assert result is None
 
-    @patch('weather.get_public_ip')
-    @patch('weather.requests.get')
-    def test_get_zipcode_api_fail_status(self, mock_get, mock_public_ip):
-        """Test when API returns fail status."""
-        mock_public_ip.return_value = '192.168.1.1'
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {'status': 'fail', 'message': 'Invalid IP'}
-        mock_get.return_value = mock_response
+    @patch('weather._get_session')
+    def test_get_zipcode_api_fail_status(self, mock_session):
+        """Test when ip-api returns fail status and ipinfo is down."""
+        mock_session.return_value.get.side_effect = _route(
+            ipinfo=_response(status_code=429),
+            ip_api=_response(data={'status': 'fail', 'message': 'Invalid IP'}),
+        )
 
         result = get_zipcode()
         assert result is None
 
-    @patch('weather.get_public_ip')
-    @patch('weather.requests.get')
-    def test_get_zipcode_no_zip_in_response(self, mock_get, mock_public_ip):
-        """Test when response doesn't contain zip code."""
-        mock_public_ip.return_value = '192.168.1.1'
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {'status': 'success'}
-        mock_get.return_value = mock_response
+    @patch('weather._get_session')
+    def test_get_zipcode_no_zip_in_response(self, mock_session):
+        """Test when responses don't contain a zip code."""
+        mock_session.return_value.get.side_effect = _route(
+            ipinfo=_response(data={'ip': '192.168.1.1'}),
+            ip_api=_response(data={'query': '192.168.1.1', 'status': 'success'}),
+        )
 
         result = get_zipcode()
         assert result is None
 
-    @patch('weather.get_public_ip')
-    @patch('weather.requests.get')
-    def test_get_zipcode_network_error(self, mock_get, mock_public_ip):
+    @patch('weather._get_session')
+    def test_get_zipcode_network_error(self, mock_session):
         """Test network error handling."""
-        mock_public_ip.return_value = '192.168.1.1'
-        mock_get.side_effect = requests.exceptions.Timeout("Timeout")
+        mock_session.return_value.get.side_effect = requests.exceptions.Timeout("Timeout")
 
         result = get_zipcode()
         assert result is None
 
+    @patch('weather._get_session')
+    def test_get_zipcode_skips_answer_without_zip(self, mock_session):
+        """Test an answer without a zip waits for a provider that has one."""
+        mock_session.return_value.get.side_effect = _route(
+            ipinfo=_response(data={'ip': '192.168.1.1'}),
+            ip_api=_response(data={'query': '192.168.1.1', 'zip': '54321', 'status': 'success'}),
+        )
+
+        result = get_zipcode()
+        assert result == '54321'
+
+
+class TestGetLocation:
+    """Tests for the raced get_location lookup."""
+
+    @patch('weather._get_session')
+    def test_first_answer_wins_without_waiting(self, mock_session):
+        """Test a slow provider does not delay the result."""
+        release = threading.Event()
+
+        def slow_ipinfo():
+            release.wait(5)
+            return _response(data={'ip': '1.1.1.1', 'postal': '99999'})
+
+        mock_session.return_value.get.side_effect = _route(
+            ipinfo=slow_ipinfo,
+            ip_api=_response(data={'query': '2.2.2.2', 'zip': '11111', 'status': 'success'}),
+        )
+
+        started = time.monotonic()
+        result = get_location()
+        elapsed = time.monotonic() - started
+        release.set()
+
+        assert result == {'ip': '2.2.2.2', 'zip': '11111'}
+        assert elapsed < 1
+
+    @patch('weather._get_session')
+    def test_providers_share_session(self, mock_session):
+        """Test both providers go through the shared session with split timeouts."""
+        mock_session.return_value.get.return_value = _response(
+            data={'ip': '1.1.1.1', 'query': '1.1.1.1', 'postal': '1', 'zip': '1'}
+        )
+
+        get_location()
+        time.sleep(0.05)
+
+        calls = mock_session.return_value.get.call_args_list
+        assert len(calls) == 2
+        assert all(isinstance(call.kwargs['timeout'], tuple) for call in calls)
+
+
+class TestGeolocationCache:
+    """Tests for the cached public IP and IP -> ZIP lookups."""
+
+    LOCATION = {'ip': '203.0.113.7', 'zip': '10001'}
+
+    @patch('weather.get_location', return_value=LOCATION)
+    def test_second_lookup_served_from_cache(self, mock_location):
+        """Test a repeated zipcode lookup makes no network calls."""
+        assert get_zipcode() == '10001'
+        assert get_zipcode() == '10001'
+        assert get_public_ip() == '203.0.113.7'
+
+        mock_location.assert_called_once()
+        assert get_cache_stats()['hits'] >= 2
+
+    @patch('weather.get_location', return_value=LOCATION)
+    def test_use_cache_false_bypasses_cache(self, mock_location):
+        """Test use_cache=False always performs the lookup."""
+        get_zipcode(use_cache=False)
+        get_zipcode(use_cache=False)
+
+        assert mock_location.call_count == 2
+
+    @patch('weather.get_location')
+    def test_ip_change_invalidates_old_zip(self, mock_location, geo_cache):
+        """Test the old IP's ZIP mapping is dropped when the public IP changes."""
+        mock_location.return_value = {'ip': '203.0.113.7', 'zip': '10001'}
+        get_zipcode()
+
+        # Public IP entry expires and the next lookup reports a new IP
+        geo_cache.set('public_ip', '203.0.113.7', ttl=0)
+        mock_location.return_value = {'ip': '198.51.100.2', 'zip': '94105'}
+
+        assert get_zipcode() == '94105'
+        assert 'zip:203.0.113.7' not in geo_cache
+        assert geo_cache.get('public_ip') == '198.51.100.2'
+        assert get_zipcode() == '94105'
+        assert mock_location.call_count == 2
+
+    @patch('weather.get_location', return_value=None)
+    def test_failed_lookup_not_cached(self, mock_location, geo_cache):
+        """Test failures are not stored in the cache."""
+        assert get_zipcode() is None
+        assert get_zipcode() is None
+
+        assert mock_location.call_count == 2
+        assert len(geo_cache) == 0
+
+    def test_cache_persisted(self, tmp_path):
+        """Test the geolocation cache survives a restart via its JSON file."""
+        path = str(tmp_path / 'geo.json')
+        with patch('weather._get_geo_cache', return_value=TTLCache(60, path=path)):
+            with patch('weather.get_location', return_value=self.LOCATION):
+                get_zipcode()
+
+        with patch('weather._get_geo_cache', return_value=TTLCache(60, path=path)):
+            with patch('weather.get_location') as mock_location:
+                assert get_zipcode() == '10001'
+                mock_location.assert_not_called()
+
 
 class TestGetTempBasedOnIP:
     """Tests for get_temp_based_on_ip function."""
 
-    @patch('weather.requests.get')
-    def test_get_temp_success(self, mock_get):
+    @patch('weather._get_session')
+    def test_get_temp_success(self, mock_session):
         """Test successful temperature retrieval."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_session.return_value.get.return_value = _response(data={
             'location': {'name': 'New York'},
             'current': {'temperature': 72}
-        }
-        mock_get.return_value = mock_response
+        })
 
         result = get_temp_based_on_ip('10001')
         assert result is not None
         assert result['current']['temperature'] == 72
 
-    @patch('weather.requests.get')
-    def test_get_temp_api_error(self, mock_get):
+    @patch('weather._get_session')
+    def test_get_temp_api_error(self, mock_session):
         """Test when API returns error."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_session.return_value.get.return_value = _response(data={
             'error': {'info': 'Invalid API key'}
-        }
-        mock_get.return_value = mock_response
+        })
 
         result = get_temp_based_on_ip('10001')
         assert result is None
 
-    @patch('weather.requests.get')
-    def test_get_temp_http_error(self, mock_get):
+    @patch('weather._get_session')
+    def test_get_temp_http_error(self, mock_session):
         """Test HTTP error handling."""
-        mock_response = Mock()
-        mock_response.status_code = 404
-        mock_get.return_value = mock_response
+        mock_session.return_value.get.return_value = _response(status_code=404)
 
         result = get_temp_based_on_ip('10001')
         assert result is None
 
-    @patch('weather.requests.get')
-    def test_get_temp_network_error(self, mock_get):
+    @patch('weather._get_session')
+    def test_get_temp_network_error(self, mock_session):
         """Test network error handling."""
-        mock_get.side_effect = requests.exceptions.RequestException("Connection error")
+        mock_session.return_value.get.side_effect = requests.exceptions.RequestException("Connection error")
 
         result = get_temp_based_on_ip('10001')
         assert result is None
 
-    @patch('weather.requests.get')
-    def test_get_temp_missing_data(self, mock_get):
+    @patch('weather._get_session')
+    def test_get_temp_missing_data(self, mock_session):
         """Test when response is missing expected data."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {'location': {}}
-        mock_get.return_value = mock_response
+        mock_session.return_value.get.return_value = _response(data={'location': {}})
 
         result = get_temp_based_on_ip('10001')
         assert result is None
+
+
+class TestGetWeatherBatch:
+    """Tests for get_weather_batch against a local WeatherStack stand-in."""
+
+    def test_fetches_all_zips(self, weatherstack):
+        """Test every zip gets a structured result in input order."""
+        results = get_weather_batch(['10001', '94105', '60601'])
+
+        assert [r['zip'] for r in results] == ['10001', '94105', '60601']
+        assert all(r['status'] == 'fetched' for r in results)
+        assert results[0]['temperature'] == 1
+        assert results[1]['location'] == 'Town 94105'
+
+    def test_duplicates_fetched_once(self, weatherstack):
+        """Test duplicate zips only cost one request."""
+        results = get_weather_batch(['10001', '10001', ' 10001', '94105'])
+
+        assert len(results) == 2
+        assert sorted(weatherstack.requests_seen) == ['10001', '94105']
+
+    def test_second_batch_served_from_cache(self, weatherstack):
+        """Test zips fetched within the TTL are not requested again."""
+        get_weather_batch(['10001', '94105'])
+        results = get_weather_batch(['10001', '94105', '60601'])
+
+        assert [r['status'] for r in results] == ['cached', 'cached', 'fetched']
+        assert len(weatherstack.requests_seen) == 3
+
+    def test_failures_reported_not_cached(self, weatherstack, weather_cache):
+        """Test API and HTTP errors become failed results and are not cached."""
+        results = get_weather_batch(['00000', '99999', '10001'])
+
+        assert results[0]['status'] == 'failed'
+        assert 'Invalid query' in results[0]['error']
+        assert 'Status code: 500' in results[1]['error']
+        assert results[2]['status'] == 'fetched'
+        assert '00000' not in weather_cache
+
+    def test_does_not_print(self, weatherstack, capsys):
+        """Test batch lookups produce no console output."""
+        get_weather_batch(['10001', '00000'])
+
+        assert capsys.readouterr().out == ''
+
+    def test_rate_limit_spaces_requests(self, weatherstack):
+        """Test requests are spread out according to rate_limit."""
+        started = time.monotonic()
+        get_weather_batch(['10001', '10002', '10003', '10004', '10005'], rate_limit=50)
+
+        # Five requests at 50/s need at least four 20 ms gaps
+        assert time.monotonic() - started >= 0.08
+
+    def test_empty_input(self, weatherstack):
+        """Test an empty batch returns no results."""
+        assert get_weather_batch([]) == []
+
+
+class TestSpatialWeatherCache:
+    """Tests for sharing cached weather between zips in the same grid cell."""
+
+    def test_neighbouring_zips_served_from_cache(self, weatherstack):
+        """Test zips in an already fetched cell need no new request."""
+        get_weather_batch(['10001', '10002', '94105'])
+        weatherstack.requests_seen.clear()
+
+        results = get_weather_batch(['10001', '10002', '94105'])
+
+        assert [r['status'] for r in results] == ['cached'] * 3
+        assert weatherstack.requests_seen == []
+
+    def test_one_request_per_known_cell(self, weatherstack, weather_cache):
+        """Test zips in a known but expired cell share a single request."""
+        get_weather_batch(['10001', '10002', '10003'])
+        weather_cache.clear()
+        weatherstack.requests_seen.clear()
+
+        results = get_weather_batch(['10001', '10002', '10003'])
+
+        assert len(weatherstack.requests_seen) == 1
+        assert [r['status'] for r in results] == ['fetched', 'cached', 'cached']
+        assert results[2]['temperature'] == results[0]['temperature']
+
+    def test_different_cells_not_shared(self, weatherstack):
+        """Test zips in different cells are fetched separately."""
+        get_weather_batch(['10001', '94105'])
+        results = get_weather_batch(['10001', '94105'])
+
+        assert results[0]['temperature'] != results[1]['temperature']
+
+    def test_zip_to_cell_mapping_recorded(self, weatherstack, zip_buckets):
+        """Test fetched zips remember their grid cell."""
+        get_weather_batch(['10001', '10002'])
+
+        assert zip_buckets.get('10001') == zip_buckets.get('10002') is not None
+
+    def test_single_lookup_uses_cell(self, weatherstack, weather_cache, capsys):
+        """Test get_temp_based_on_ip is served from a neighbour's cell."""
+        get_weather_batch(['10001', '10002'])
+        weather_cache.clear()
+        get_weather_batch(['10001'])
+        weatherstack.requests_seen.clear()
+
+        result = get_temp_based_on_ip('10002')
+
+        assert result['location']['name'] == 'Town 10001'
+        assert weatherstack.requests_seen == []
+        assert 'Town 10001' in capsys.readouterr().out
+
+    @patch('weather._get_session')
+    def test_response_without_coordinates_cached_by_zip(self, mock_session, weather_cache):
+        """Test responses lacking lat/lon are cached under their zip."""
+        mock_session.return_value.get.return_value = _response(data={
+            'location': {'name': 'New York'},
+            'current': {'temperature': 72}
+        })
+
+        get_temp_based_on_ip('10001')
+        get_temp_based_on_ip('10001')
+
+        assert mock_session.return_value.get.call_count == 1
+        assert 'zip:10001' in weather_cache
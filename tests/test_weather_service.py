@@ -0,0 +1,154 @@
+"""Unit tests for weather_service module."""
+import asyncio
+import pytest
+from weather_service import RECORD, TimeSeriesWriter, WeatherPoller, read_series
+
+
+def _reading(temperature):
+    """Build a fetch_weather style (data, error) result."""
+    return {'location': {'name': 'Town'}, 'current': {'temperature': temperature}}, None
+
+
+class FakeFetch:
+    """Return scripted temperatures per location and record call order."""
+
+    def __init__(self, temperatures):
+        self.temperatures = {loc: list(temps) for loc, temps in temperatures.items()}
+        self.calls = []
+
+    def __call__(self, location):
+        self.calls.append(location)
+        temps = self.temperatures[location]
+        value = temps.pop(0) if len(temps) > 1 else temps[0]
+        if value is None:
+            return None, 'boom'
+        return _reading(value)
+
+
+class TestTimeSeries:
+    """Tests for the binary time series file."""
+
+    def test_round_trip(self, tmp_path):
+        """Test appended records are read back in order."""
+        path = str(tmp_path / 'series.bin')
+        writer = TimeSeriesWriter(path)
+        writer.append(1000.0, '10001', 72.5)
+        writer.append(1060.0, '94105', 58.0)
+        writer.close()
+
+        assert list(read_series(path)) == [(1000.0, '10001', 72.5), (1060.0, '94105', 58.0)]
+
+    def test_fixed_width_records(self, tmp_path):
+        """Test each record takes exactly RECORD.size bytes."""
+        path = tmp_path / 'series.bin'
+        writer = TimeSeriesWriter(str(path))
+        for i in range(10):
+            writer.append(float(i), '10001', 70.0)
+        writer.close()
+
+        assert path.stat().st_size == 10 * RECORD.size
+
+    def test_truncated_tail_ignored(self, tmp_path):
+        """Test a partially written last record is skipped."""
+        path = tmp_path / 'series.bin'
+        writer = TimeSeriesWriter(str(path))
+        writer.append(1.0, '10001', 70.0)
+        writer.close()
+        with open(path, 'ab') as file:
+            file.write(b'\x01\x02\x03')
+
+        assert len(list(read_series(str(path)))) == 1
+
+    def test_long_location_rejected(self, tmp_path):
+        """Test locations that do not fit the record are not truncated."""
+        writer = TimeSeriesWriter(str(tmp_path / 'series.bin'))
+
+        with pytest.raises(ValueError, match='16 bytes'):
+            writer.append(1.0, 'San Francisco, California', 60.0)
+        writer.close()
+
+        assert list(read_series(str(tmp_path / 'series.bin'))) == []
+
+    def test_invalid_utf8_replaced(self, tmp_path):
+        """Test a damaged location field is still readable."""
+        path = tmp_path / 'series.bin'
+        path.write_bytes(RECORD.pack(1.0, 'Zürich'.encode()[:2], 50.0))
+
+        assert list(read_series(str(path))) == [(1.0, 'Z\ufffd', 50.0)]
+
+
+class TestWeatherPoller:
+    """Tests for WeatherPoller."""
+
+    @pytest.mark.asyncio
+    async def test_emits_only_on_threshold_change(self, tmp_path):
+        """Test small changes are suppressed and large ones recorded."""
+        path = str(tmp_path / 'series.bin')
+        emitted = []
+        fetch = FakeFetch({'10001': [70, 70.4, 71.5, 71.0]})
+        poller = WeatherPoller(['10001'], threshold=1.0, fetch=fetch,
+                               on_change=lambda loc, ts, t: emitted.append(t))
+        writer = TimeSeriesWriter(path)
+
+        for _ in range(4):
+            await poller.poll_once('10001', writer)
+        writer.close()
+
+        assert emitted == [70.0, 71.5]
+        assert [t for _, _, t in read_series(path)] == [70.0, 71.5]
+
+    @pytest.mark.asyncio
+    async def test_errors_counted_not_emitted(self, capsys):
+        """Test failed fetches are counted and nothing is emitted."""
+        emitted = []
+        poller = WeatherPoller(['10001'], fetch=FakeFetch({'10001': [None]}),
+                               on_change=lambda *args: emitted.append(args))
+
+        await poller.poll_once('10001')
+
+        assert poller.errors == 1
+        assert emitted == []
+        assert 'boom' in capsys.readouterr().out
+
+    @pytest.mark.asyncio
+    async def test_run_staggers_and_repeats(self, tmp_path):
+        """Test locations are spread across the interval and polled repeatedly."""
+        fetch = FakeFetch({'a': list(range(1, 20)), 'b': list(range(20, 40))})
+        poller = WeatherPoller(['a', 'b'], interval=0.1, threshold=0.5, fetch=fetch,
+                               series_path=str(tmp_path / 'series.bin'),
+                               on_change=lambda *args: None)
+
+        task = asyncio.create_task(poller.run())
+        await asyncio.sleep(0.03)
+        first_calls = list(fetch.calls)
+        await asyncio.sleep(0.2)
+        poller.stop()
+        await asyncio.wait_for(task, 1)
+
+        # 'b' starts half an interval after 'a'
+        assert first_calls == ['a']
+        assert fetch.calls.count('a') >= 2
+        assert fetch.calls.count('b') >= 2
+        assert len(list(read_series(str(tmp_path / 'series.bin')))) == poller.polls
+
+    @pytest.mark.asyncio
+    async def test_stop_before_start(self):
+        """Test a stopped poller returns without polling."""
+        fetch = FakeFetch({'a': [1]})
+        poller = WeatherPoller(['a'], interval=10, fetch=fetch)
+        poller.stop()
+
+        await asyncio.wait_for(poller.run(), 1)
+
+        assert fetch.calls == []
+
+    def test_duplicate_locations_polled_once(self):
+        """Test duplicate locations are dropped."""
+        poller = WeatherPoller(['a', 'b', 'a'])
+
+        assert poller.locations == ['a', 'b']
+
+    def test_long_location_rejected_up_front(self):
+        """Test the poller refuses locations the series file cannot hold."""
+        with pytest.raises(ValueError):
+            WeatherPoller(['10001', 'Sankt Moritz, Graubünden'])
@@ -0,0 +1,175 @@
+"""Thread-safe TTL cache with optional JSON persistence."""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Key/value cache whose entries expire after a time-to-live.
+
+    When a path is given, entries are loaded from and saved to a JSON file
+    so they survive between runs; keys and values must then be JSON
+    serializable (keys are stored as strings). Hit/miss/expiry counters are
+    available from stats().
+
+    Example:
+        >>> cache = TTLCache(ttl=600)
+        >>> cache.set('public_ip', '203.0.113.7')
+        >>> cache.get('public_ip')
+        '203.0.113.7'
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        path: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+        autosave: bool = True,
+    ):
+        """
+        Args:
+            ttl: Default time-to-live in seconds
+            path: JSON file used to persist entries between runs ('~' is expanded)
+            max_entries: Upper bound on entries; oldest entries are evicted first
+            clock: Time source returning epoch seconds (wall clock, so persisted
+                expiry times stay meaningful across processes)
+            autosave: Write the file after every change; if False, call save()
+        """
+        self.ttl = ttl
+        self.path = Path(path).expanduser() if path else None
+        self.max_entries = max_entries
+        self.autosave = autosave
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, tuple] = {}
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evicted = 0
+        if self.path:
+            self._load()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self._misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self._expired += 1
+                self._misses += 1
+                return default
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key for ttl seconds (defaults to the cache TTL)."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, self._clock() + (self.ttl if ttl is None else ttl))
+            if self.max_entries is not None and len(self._entries) > self.max_entries:
+                self._evict()
+            self._changed()
+
+    def set_many(self, items: Dict[Hashable, Any], ttl: Optional[float] = None) -> None:
+        """Store several values at once, persisting them with a single write."""
+        with self._lock:
+            expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+            for key, value in items.items():
+                self._entries.pop(key, None)
+                self._entries[key] = (value, expires_at)
+            if self.max_entries is not None and len(self._entries) > self.max_entries:
+                self._evict()
+            self._changed()
+
+    def delete(self, key: Hashable) -> None:
+        """Remove key from the cache if present."""
+        with self._lock:
+            if self._entries.pop(key, _MISSING) is not _MISSING:
+                self._changed()
+
+    def clear(self) -> None:
+        """Remove every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._changed()
+
+    def save(self) -> None:
+        """Write all entries to the JSON file now."""
+        with self._lock:
+            self._save()
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Return (key, value) pairs of every unexpired entry, oldest first."""
+        with self._lock:
+            now = self._clock()
+            return [(key, value) for key, (value, expires_at) in self._entries.items()
+                    if expires_at > now]
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss, expiry and eviction counters plus the current size."""
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'expired': self._expired,
+                'evicted': self._evicted,
+                'size': len(self._entries),
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > self._clock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the oldest ones, until within max_entries."""
+        now = self._clock()
+        for key in [k for k, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+            self._expired += 1
+        while len(self._entries) > self.max_entries:
+            # Dicts keep insertion order and set() re-inserts, so the first key is oldest
+            del self._entries[next(iter(self._entries))]
+            self._evicted += 1
+
+    def _changed(self) -> None:
+        """Persist a change if autosave is on (caller holds the lock)."""
+        if self.autosave:
+            self._save()
+
+    def _load(self) -> None:
+        """Load unexpired entries from the JSON file, ignoring a missing or corrupt file."""
+        try:
+            with open(self.path, 'r') as file:
+                stored = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return
+        now = self._clock()
+        for key, (value, expires_at) in stored.items():
+            if expires_at > now:
+                self._entries[key] = (value, expires_at)
+
+    def _save(self) -> None:
+        """Atomically write all entries to the JSON file (caller holds the lock)."""
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w') as file:
+            json.dump({str(k): list(v) for k, v in self._entries.items()}, file)
+        os.replace(tmp_path, self.path)
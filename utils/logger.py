@@ -1,31 +1,364 @@
+import atexit
+import gzip
+import itertools
+import json
 import logging
+import os
+import queue
+import shutil
 import sys
+import threading
+import time
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
 from pathlib import Path
+from typing import Any, Dict, Optional
 
-def setup_logger(name: str, log_file: str = None, level: int = logging.INFO) -> logging.Logger:
-    """Setup a logger with consistent formatting."""
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_BACKUP_COUNT = 5
+
+# Background writers per logger name, so re-running setup or shutting down
+# can stop the right listener.
+_listeners: Dict[str, "BatchingQueueListener"] = {}
+_queue_handlers: Dict[str, "DroppingQueueHandler"] = {}
+_listeners_lock = threading.Lock()
+_atexit_registered = False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that never blocks; records are dropped when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge args into the message now, leave formatting to the writer thread."""
+        # Args may be mutated by the caller after logging returns, so resolve
+        # them here; timestamps, layout and tracebacks are rendered later.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put the record on the queue, counting it as dropped if the queue is full."""
+        # Handler.handle holds self.lock around emit, so the counters are safe
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingQueueListener(QueueListener):
+    """Queue listener that drains records in batches and flushes once per batch."""
+
+    def __init__(self, log_queue: queue.Queue, *handlers: logging.Handler,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+
+    def _monitor(self) -> None:
+        q = self.queue
+        has_task_done = hasattr(q, 'task_done')
+        stopping = False
+        while not stopping:
+            batch = [self.dequeue(True)]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            for record in batch:
+                if record is self._sentinel:
+                    stopping = True
+                else:
+                    self.handle(record)
+            self.flush()
+
+            if has_task_done:
+                for _ in batch:
+                    q.task_done()
+
+    def enqueue_sentinel(self) -> None:
+        """Block until there is room for the stop sentinel, which must not be dropped."""
+        self.queue.put(self._sentinel)
+
+    def flush(self) -> None:
+        """Flush every handler once for the batch just written."""
+        for handler in self.handlers:
+            flush_batch = getattr(handler, 'flush_batch', handler.flush)
+            flush_batch()
+
+
+class _BatchFlushMixin:
+    """Defers per-record flushes so the queue listener can flush once per batch."""
+
+    def flush(self) -> None:
+        pass
+
+    def flush_batch(self) -> None:
+        super().flush()
+
+    def close(self) -> None:
+        self.flush_batch()
+        super().close()
+
+
+class _BatchStreamHandler(_BatchFlushMixin, logging.StreamHandler):
+    pass
+
+
+class _BatchFileHandler(_BatchFlushMixin, logging.FileHandler):
+    pass
+
+
+class _BatchRotatingFileHandler(_BatchFlushMixin, RotatingFileHandler):
+    pass
+
+
+class _BatchTimedRotatingFileHandler(_BatchFlushMixin, TimedRotatingFileHandler):
+    pass
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one compact JSON object per line.
+
+    Static fields are serialized once at construction, logger names are
+    encoded once per name and the timestamp prefix once per second, so each
+    record only encodes its message (and traceback, if any).
+    """
+
+    def __init__(self, static_fields: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self._encode = json.JSONEncoder(
+            ensure_ascii=False, separators=(',', ':'), check_circular=False, default=str
+        ).encode
+        self._static = ''.join(
+            f',{self._encode(key)}:{self._encode(value)}'
+            for key, value in (static_fields or {}).items()
+        )
+        self._names: Dict[str, str] = {}
+        # (epoch second, formatted prefix) swapped as one tuple for thread safety
+        self._second = (None, '')
+
+    def format(self, record: logging.LogRecord) -> str:
+        second = int(record.created)
+        cached_second, prefix = self._second
+        if second != cached_second:
+            prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+            self._second = (second, prefix)
+
+        name = self._names.get(record.name)
+        if name is None:
+            name = self._names[record.name] = self._encode(record.name)
+
+        line = (
+            f'{{"ts":"{prefix}.{int(record.msecs):03d}Z","level":"{record.levelname}",'
+            f'"logger":{name},"msg":{self._encode(record.getMessage())}'
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line += f',"exc":{self._encode(record.exc_text)}'
+        return line + self._static + '}'
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in every N records at or below max_level; higher levels always pass."""
+
+    def __init__(self, every: int, max_level: int = logging.DEBUG):
+        super().__init__()
+        self.every = max(1, every)
+        self.max_level = max_level
+        self.suppressed = 0
+        # next() on itertools.count is atomic, so no lock is needed
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        if next(self._counter) % self.every == 0:
+            return True
+        self.suppressed += 1
+        return False
+
+
+def set_sampling(name: str, rate: float, max_level: int = logging.DEBUG) -> SamplingFilter:
+    """
+    Sample high-volume records of one logger.
+
+    Example: set_sampling('swapi', 0.01) keeps 1% of the DEBUG URL logs
+    from swapi._build_url while INFO and above are untouched. A rate of 1
+    removes sampling.
+
+    Args:
+        name: Logger name
+        rate: Fraction of records to keep, between 0 and 1
+        max_level: Highest level that is sampled
+
+    Returns:
+        The installed SamplingFilter (its suppressed attribute counts drops)
+    """
+    if not 0 < rate <= 1:
+        raise ValueError("rate must be in (0, 1]")
+
+    logger = logging.getLogger(name)
+    for existing in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+        logger.removeFilter(existing)
+
+    sampling_filter = SamplingFilter(round(1 / rate), max_level)
+    if rate < 1:
+        logger.addFilter(sampling_filter)
+    return sampling_filter
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    """Compress a rotated log file and remove the uncompressed original."""
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _gzip_namer(default_name: str) -> str:
+    return default_name + '.gz'
+
+
+def _file_handler(log_file: str, use_queue: bool, max_bytes: int, when: Optional[str],
+                  backup_count: int, compress: bool) -> logging.FileHandler:
+    """Build the plain, size-rotating or time-rotating file handler."""
+    if when:
+        handler_class = _BatchTimedRotatingFileHandler if use_queue else TimedRotatingFileHandler
+        handler = handler_class(log_file, when=when, backupCount=backup_count, utc=True)
+    elif max_bytes:
+        handler_class = _BatchRotatingFileHandler if use_queue else RotatingFileHandler
+        handler = handler_class(log_file, maxBytes=max_bytes, backupCount=backup_count)
+    else:
+        handler_class = _BatchFileHandler if use_queue else logging.FileHandler
+        return handler_class(log_file)
+
+    if compress:
+        handler.rotator = _gzip_rotator
+        handler.namer = _gzip_namer
+    return handler
+
+
+def setup_logger(name: str, log_file: str = None, level: int = logging.INFO,
+                 use_queue: bool = False, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 batch_size: int = DEFAULT_BATCH_SIZE, json_format: bool = False,
+                 static_fields: Optional[Dict[str, Any]] = None, max_bytes: int = 0,
+                 when: Optional[str] = None, backup_count: int = DEFAULT_BACKUP_COUNT,
+                 compress: bool = False) -> logging.Logger:
+    """
+    Setup a logger with consistent formatting.
+
+    With use_queue=True, log calls only put the record on a bounded queue;
+    a background thread writes batches to the console/file handlers and
+    flushes once per batch. Records logged while the queue is full are
+    dropped and counted (see get_queue_stats). Call shutdown_logger, or let
+    the interpreter exit, to drain the queue.
+
+    json_format=True writes one JSON object per line (see JsonFormatter),
+    with static_fields added to every record. The log file rotates by size
+    when max_bytes is set, or by time when when is set (TimedRotatingFileHandler
+    units such as 'midnight' or 'H'), keeping backup_count old files, gzipped
+    when compress=True.
+    """
     logger = logging.getLogger(name)
     logger.setLevel(level)
 
     # Clear existing handlers
+    shutdown_logger(name)
     logger.handlers.clear()
 
     # Create formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    if json_format:
+        formatter = JsonFormatter(static_fields)
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+    stream_handler_class = _BatchStreamHandler if use_queue else logging.StreamHandler
+    handlers = []
 
     # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler = stream_handler_class(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers.append(console_handler)
 
     # File handler if specified
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
-        file_handler = logging.FileHandler(log_file)
+        file_handler = _file_handler(log_file, use_queue, max_bytes, when,
+                                     backup_count, compress)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    if not use_queue:
+        for handler in handlers:
+            logger.addHandler(handler)
+        return logger
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    listener = BatchingQueueListener(log_queue, *handlers, batch_size=batch_size)
+    logger.addHandler(queue_handler)
+    _start_listener(name, listener, queue_handler)
+
+    return logger
+
+
+def get_queue_stats(name: str) -> Optional[Dict[str, int]]:
+    """Return enqueued/dropped/pending counts for a queue-backed logger, or None."""
+    with _listeners_lock:
+        queue_handler = _queue_handlers.get(name)
+    if queue_handler is None:
+        return None
+    return {
+        'enqueued': queue_handler.enqueued,
+        'dropped': queue_handler.dropped,
+        'pending': queue_handler.queue.qsize(),
+    }
+
+
+def shutdown_logger(name: str) -> None:
+    """Drain and stop the background writer of a queue-backed logger, if any."""
+    with _listeners_lock:
+        listener = _listeners.pop(name, None)
+        queue_handler = _queue_handlers.pop(name, None)
+    if listener is None:
+        return
+
+    logging.getLogger(name).removeHandler(queue_handler)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def _start_listener(name: str, listener: BatchingQueueListener,
+                    queue_handler: DroppingQueueHandler) -> None:
+    """Start a listener and make sure it is drained at interpreter exit."""
+    global _atexit_registered
+    with _listeners_lock:
+        _listeners[name] = listener
+        _queue_handlers[name] = queue_handler
+        if not _atexit_registered:
+            atexit.register(_shutdown_all)
+            _atexit_registered = True
+    listener.start()
+
 
-    return logger
\ No newline at end of file
+def _shutdown_all() -> None:
+    """Stop every queue listener, flushing pending records."""
+    for name in list(_listeners):
+        shutdown_logger(name)
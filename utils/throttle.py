@@ -0,0 +1,41 @@
+"""Thread-safe request spacing shared by concurrent workers."""
+import threading
+import time
+
+
+class Throttle:
+    """
+    Space calls at least interval seconds apart across threads.
+
+    Each caller reserves the next free slot under a lock and sleeps outside
+    it, so workers are released one interval apart without serializing the
+    work they do afterwards.
+
+    Example:
+        >>> throttle = Throttle(0.5)
+        >>> throttle.wait()  # returns immediately, the next caller waits 0.5s
+    """
+
+    def __init__(self, interval: float):
+        """
+        Args:
+            interval: Minimum seconds between consecutive slots (0 disables spacing)
+        """
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    @classmethod
+    def per_second(cls, rate: float) -> 'Throttle':
+        """Return a throttle allowing rate calls per second (unlimited if falsy)."""
+        return cls(1.0 / rate if rate else 0.0)
+
+    def wait(self) -> None:
+        """Block until the caller's slot is due."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
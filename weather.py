@@ -1,133 +1,429 @@
 """Weather API integration using WeatherStack and IP-based geolocation."""
+import math
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import requests
-from typing import Optional
+from requests.adapters import HTTPAdapter
 from decouple import config
+from utils.cache import TTLCache
+from utils.throttle import Throttle
 
 ###########################################################################################
-# Global variables
+# Configuration
+# Settings are read on first use so importing this module has no side effects
 ###########################################################################################
-PAT = config('weather_pat')
-WEATHER_URL = config('weather_url')
-ZIP_URL = config('zipcode_url')
-IP_URL = config('ip_url')
+DEFAULT_WEATHER_URL = 'http://api.weatherstack.com'
+DEFAULT_ZIP_URL = 'http://ip-api.com/json'
+DEFAULT_IP_URL = 'https://ipinfo.io'
+
+# (connect, read) timeouts in seconds. IP lookups are raced against each other,
+# so they can fail fast; the weather call gets a longer read budget.
+IP_TIMEOUT = (2, 3)
+WEATHER_TIMEOUT = (3, 10)
+
+# A machine's public IP rarely changes and its ZIP even less, so the IP is
+# re-checked every few minutes while IP -> ZIP mappings are kept for a week.
+PUBLIC_IP_TTL = 10 * 60
+IP_ZIP_TTL = 7 * 24 * 60 * 60
+DEFAULT_GEO_CACHE_FILE = str(Path.home() / '.cache' / 'python_fun' / 'geolocation.json')
+
+# Batch lookups: weather is re-fetched after 10 minutes, so a 15 minute polling
+# cycle always sees fresh data while duplicates within a cycle are free.
+WEATHER_CACHE_TTL = 10 * 60
+WEATHER_CACHE_MAX_ENTRIES = 50000
+DEFAULT_BATCH_WORKERS = 16
+DEFAULT_RATE_LIMIT = 20.0
+
+# Weather is shared across a grid cell of BUCKET_DEGREES (0.1 deg is ~11 km).
+# A zip code's cell never changes, so the zip -> cell mapping is kept for a month.
+BUCKET_DEGREES = 0.1
+ZIP_BUCKET_TTL = 30 * 24 * 60 * 60
+DEFAULT_BUCKET_FILE = str(Path.home() / '.cache' / 'python_fun' / 'zip_buckets.json')
+
+def _weather_pat() -> str:
+    """Return the WeatherStack access key from the environment."""
+    return config('weather_pat')
+
+def _weather_url() -> str:
+    """Return the WeatherStack base URL."""
+    return config('weather_url', default=DEFAULT_WEATHER_URL)
+
+def _zip_url() -> str:
+    """Return the IP geolocation base URL."""
+    return config('zipcode_url', default=DEFAULT_ZIP_URL)
+
+def _ip_url() -> str:
+    """Return the public IP lookup URL."""
+    return config('ip_url', default=DEFAULT_IP_URL)
+
+@lru_cache(maxsize=None)
+def _get_geo_cache() -> TTLCache:
+    """Return the persistent public IP / IP -> ZIP cache."""
+    return TTLCache(IP_ZIP_TTL, path=config('geo_cache_file', default=DEFAULT_GEO_CACHE_FILE))
+
+def get_cache_stats() -> Dict[str, int]:
+    """Return hit/miss/expiry counters of the geolocation cache."""
+    return _get_geo_cache().stats()
+
+@lru_cache(maxsize=None)
+def _get_session() -> requests.Session:
+    """Return the shared HTTP session, pooling connections to all three hosts."""
+    session = requests.Session()
+    # Sized so every get_weather_batch worker can keep its own connection alive
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=DEFAULT_BATCH_WORKERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def fetch_weather(zip_code: str) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Query WeatherStack for one zip code without printing.
+
+    Returns:
+        (weather data, None) on success, or (None, error message) on failure
+    """
+    params = {
+        'access_key': _weather_pat(),
+        'query': zip_code,
+        'units': 'f'
+    }
+
+    try:
+        api_result = _get_session().get(f"{_weather_url()}/current", params=params,
+                                        timeout=WEATHER_TIMEOUT)
+
+        if api_result.status_code != 200:
+            return None, f"Failed to retrieve weather data. Status code: {api_result.status_code}"
+
+        api_response = api_result.json()
+
+        # Check if API returned an error
+        if 'error' in api_response:
+            return None, f"Weather API error: {api_response['error'].get('info', 'Unknown error')}"
+
+        # Fail here, not in the caller, if the fields callers rely on are missing
+        _ = (api_response['location']['name'], api_response['current']['temperature'])
+        return api_response, None
+    except requests.exceptions.RequestException as e:
+        return None, f"Network error retrieving weather data: {e}"
+    except (KeyError, TypeError, ValueError) as e:
+        return None, f"Error parsing weather data: {e}"
+
+###########################################################################################
+# Weather cache
+# Nearby zip codes share the weather, so responses are cached per lat/lon grid cell
+###########################################################################################
+@lru_cache(maxsize=None)
+def _get_weather_cache() -> TTLCache:
+    """Return the in-memory weather cache, keyed by grid cell (or zip)."""
+    return TTLCache(WEATHER_CACHE_TTL, max_entries=WEATHER_CACHE_MAX_ENTRIES)
+
+@lru_cache(maxsize=None)
+def _get_zip_bucket_cache() -> TTLCache:
+    """Return the persistent zip -> grid cell cache."""
+    return TTLCache(ZIP_BUCKET_TTL, path=config('weather_bucket_file', default=DEFAULT_BUCKET_FILE))
+
+def _bucket_for(data: dict) -> Optional[str]:
+    """Return the grid cell of a WeatherStack response, or None without coordinates."""
+    try:
+        lat = float(data['location']['lat'])
+        lon = float(data['location']['lon'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return f"{math.floor(lat / BUCKET_DEGREES)}:{math.floor(lon / BUCKET_DEGREES)}"
+
+def _weather_cache_key(zip_code: str) -> str:
+    """Return the weather cache key of a zip: its grid cell once known, else the zip."""
+    bucket = _get_zip_bucket_cache().get(zip_code)
+    return f"bucket:{bucket}" if bucket else f"zip:{zip_code}"
+
+def _store_weather(data: dict, zip_code: str) -> Optional[str]:
+    """Cache a response under its grid cell (or zip) and return the grid cell."""
+    bucket = _bucket_for(data)
+    _get_weather_cache().set(f"bucket:{bucket}" if bucket else f"zip:{zip_code}", data)
+    return bucket
 
 ###########################################################################################
 # get_temp_based_on_ip
 # Use weatherstack API to return the current temperature for a zipcode
 ###########################################################################################
-def get_temp_based_on_ip(zip_code: str) -> Optional[dict]:
+def get_temp_based_on_ip(zip_code: str, use_cache: bool = True) -> Optional[dict]:
     """
     Retrieve current temperature for a given zip code using WeatherStack API.
 
+    Once a zip code's grid cell is known, a fresh response for any zip in
+    the same cell is returned without calling WeatherStack (its location
+    is then the neighbouring zip's).
+
     Args:
         zip_code: The zip code to query weather for
+        use_cache: If True, use and update the weather cache
 
     Returns:
         Weather data dictionary, or None if request fails
     """
-    params = {
-        'access_key': PAT,
-        'query': zip_code,
-        'units': 'f'
+    api_response = _get_weather_cache().get(_weather_cache_key(zip_code)) if use_cache else None
+    if api_response is None:
+        api_response, error = fetch_weather(zip_code)
+        if error:
+            print(error)
+            return None
+        if use_cache:
+            bucket = _store_weather(api_response, zip_code)
+            if bucket:
+                _get_zip_bucket_cache().set(zip_code, bucket)
+
+    print('Current temperature in %s is %d°F' %
+          (api_response['location']['name'],
+           api_response['current']['temperature']))
+    return api_response
+
+###########################################################################################
+# get_weather_batch
+# Fetch the weather for many zip codes concurrently
+###########################################################################################
+def _weather_result(zip_code: str, status: str, data: Optional[dict] = None,
+                    error: Optional[str] = None, elapsed: float = 0.0) -> Dict:
+    """Build one get_weather_batch result."""
+    return {
+        'zip': zip_code,
+        'status': status,
+        'temperature': data['current']['temperature'] if data else None,
+        'location': data['location']['name'] if data else None,
+        'data': data,
+        'error': error,
+        'elapsed': elapsed,
     }
 
-    try:
-        api_result = requests.get(f"{WEATHER_URL}/current", params=params, timeout=10)
+def get_weather_batch(
+    zip_codes: Iterable[str],
+    max_workers: int = DEFAULT_BATCH_WORKERS,
+    rate_limit: float = DEFAULT_RATE_LIMIT,
+    use_cache: bool = True,
+) -> List[Dict]:
+    """
+    Retrieve current weather for many zip codes concurrently.
 
-        if api_result.status_code == 200:
-            api_response = api_result.json()
+    Duplicate zip codes are fetched once. Each response is cached for
+    WEATHER_CACHE_TTL under its lat/lon grid cell, and the zip -> cell
+    mapping is remembered on disk. Zip codes whose cell is already known
+    are grouped so only one request per cell is made, and none at all
+    while the cell is fresh. Nothing is printed.
 
-            # Check if API returned an error
-            if 'error' in api_response:
-                print(f"Weather API error: {api_response['error'].get('info', 'Unknown error')}")
-                return None
+    Args:
+        zip_codes: Zip codes to query
+        max_workers: Number of requests in flight at once
+        rate_limit: Maximum WeatherStack requests per second (0 for no limit)
+        use_cache: If True, use and update the weather caches
 
-            print('Current temperature in %s is %d°F' %
-                  (api_response['location']['name'],
-                   api_response['current']['temperature']))
-            return api_response
-        else:
-            print(f"Failed to retrieve weather data. Status code: {api_result.status_code}")
-            return None
-    except requests.exceptions.RequestException as e:
-        print(f"Network error retrieving weather data: {e}")
+    Returns:
+        One result dict per unique zip code, in input order, with zip,
+        status (fetched/cached/failed), temperature, location, data, error
+        and elapsed keys
+    """
+    unique = list(dict.fromkeys(str(zip_code).strip() for zip_code in zip_codes))
+    if not unique:
+        return []
+
+    groups: Dict[str, List[str]] = {}
+    for zip_code in unique:
+        key = _weather_cache_key(zip_code) if use_cache else f"zip:{zip_code}"
+        groups.setdefault(key, []).append(zip_code)
+
+    limiter = Throttle.per_second(rate_limit)
+    learned: Dict[str, str] = {}
+
+    def fetch(key: str, zips: List[str]) -> List[Dict]:
+        if use_cache:
+            data = _get_weather_cache().get(key)
+            if data is not None:
+                return [_weather_result(zip_code, 'cached', data) for zip_code in zips]
+
+        # One request answers the whole grid cell
+        started = time.perf_counter()
+        limiter.wait()
+        data, error = fetch_weather(zips[0])
+        elapsed = time.perf_counter() - started
+        if error:
+            return [_weather_result(zip_code, 'failed', error=error, elapsed=elapsed)
+                    for zip_code in zips]
+        if use_cache:
+            bucket = _store_weather(data, zips[0])
+            if bucket:
+                learned[zips[0]] = bucket
+        return ([_weather_result(zips[0], 'fetched', data, elapsed=elapsed)] +
+                [_weather_result(zip_code, 'cached', data) for zip_code in zips[1:]])
+
+    results: Dict[str, Dict] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as executor:
+        for group in executor.map(lambda item: fetch(*item), groups.items()):
+            results.update((result['zip'], result) for result in group)
+
+    if learned:
+        _get_zip_bucket_cache().set_many(learned)
+    return [results[zip_code] for zip_code in unique]
+
+###########################################################################################
+# IP geolocation providers
+# ipinfo.io and ip-api.com both report the caller's public IP and ZIP code in one call
+###########################################################################################
+def _lookup_ipinfo() -> Optional[Dict[str, Optional[str]]]:
+    """Look up the public IP and ZIP code with ipinfo.io."""
+    response = _get_session().get(f"{_ip_url()}/json", timeout=IP_TIMEOUT)
+    if response.status_code != 200:
+        print(f"ipinfo lookup failed. Status code: {response.status_code}")
+        return None
+    data = response.json()
+    return {'ip': data.get('ip'), 'zip': data.get('postal')}
+
+def _lookup_ip_api() -> Optional[Dict[str, Optional[str]]]:
+    """Look up the public IP and ZIP code with ip-api.com."""
+    response = _get_session().get(_zip_url(), timeout=IP_TIMEOUT)
+    if response.status_code != 200:
+        print(f"ip-api lookup failed. Status code: {response.status_code}")
         return None
-    except (KeyError, TypeError) as e:
-        print(f"Error parsing weather data: {e}")
+    data = response.json()
+    if data.get('status') == 'fail':
+        print(f"IP geolocation error: {data.get('message', 'Unknown error')}")
         return None
+    return {'ip': data.get('query'), 'zip': data.get('zip')}
+
+IP_PROVIDERS: List[Callable[[], Optional[Dict[str, Optional[str]]]]] = [
+    _lookup_ipinfo,
+    _lookup_ip_api,
+]
+
+def _call_provider(provider: Callable, results: queue.Queue) -> None:
+    """Run one provider, always reporting a result (None on failure)."""
+    try:
+        results.put(provider())
+    except requests.exceptions.RequestException as e:
+        print(f"Network error in {provider.__name__}: {e}")
+        results.put(None)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        print(f"Error parsing {provider.__name__} response: {e}")
+        results.put(None)
 
 ###########################################################################################
-# get_zipcode
-# Use ip-api.com to get the current zipcode of a given IP address
+# get_location
+# Race the IP providers and return the first usable answer
 ###########################################################################################
-def get_zipcode() -> Optional[str]:
+def get_location(require_zip: bool = True) -> Optional[Dict[str, Optional[str]]]:
     """
-    Retrieve zip code based on public IP address.
+    Determine the public IP address and ZIP code of the current machine.
+
+    All providers are queried concurrently over the shared session and the
+    first answer wins, so the lookup costs one round trip to the fastest
+    provider. Slower providers are not waited for.
+
+    Args:
+        require_zip: If True, skip answers without a ZIP code while other
+            providers are still pending
 
     Returns:
-        Zip code string, or None if retrieval fails
+        Dict with 'ip' and 'zip' keys, or None if every provider fails
     """
-    public_ip = get_public_ip()
-    if not public_ip:
-        return None
+    results: queue.Queue = queue.Queue()
+    for provider in IP_PROVIDERS:
+        # Daemon threads so a slow loser never delays the caller or exit
+        threading.Thread(target=_call_provider, args=(provider, results), daemon=True).start()
 
-    url = f"{ZIP_URL}/{public_ip}"
+    fallback = None
+    deadline = time.monotonic() + sum(IP_TIMEOUT)
+    for _ in IP_PROVIDERS:
+        try:
+            result = results.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            break
+        if not result or not result.get('ip'):
+            continue
+        if result.get('zip') or not require_zip:
+            return result
+        fallback = fallback or result
 
-    try:
-        response = requests.get(url, timeout=10)
+    return fallback
 
-        if response.status_code == 200:
-            data = response.json()
+def _remember_location(cache: TTLCache, location: Dict[str, Optional[str]]) -> None:
+    """Cache a looked-up location, dropping the old IP's ZIP if the IP changed."""
+    # 'public_ip' expires quickly to force re-checks; 'last_ip' outlives it so
+    # a changed IP can still be detected once 'public_ip' has expired
+    previous_ip = cache.get('last_ip')
+    if previous_ip and previous_ip != location['ip']:
+        cache.delete(f"zip:{previous_ip}")
+    cache.set('public_ip', location['ip'], ttl=PUBLIC_IP_TTL)
+    cache.set('last_ip', location['ip'])
+    if location.get('zip'):
+        cache.set(f"zip:{location['ip']}", location['zip'])
 
-            # Check for error status in response
-            if data.get('status') == 'fail':
-                print(f"IP geolocation error: {data.get('message', 'Unknown error')}")
-                return None
+###########################################################################################
+# get_zipcode
+# Use IP geolocation to get the current zipcode
+###########################################################################################
+def get_zipcode(use_cache: bool = True) -> Optional[str]:
+    """
+    Retrieve zip code based on public IP address.
+
+    While the cached public IP is fresh and has a cached ZIP, no network
+    call is made.
 
-            zipcode = data.get('zip')
-            if not zipcode:
-                print("No zip code found in response")
-                return None
+    Args:
+        use_cache: If True, use and update the persistent geolocation cache
+
+    Returns:
+        Zip code string, or None if retrieval fails
+    """
+    cache = _get_geo_cache() if use_cache else None
+    if cache is not None:
+        public_ip = cache.get('public_ip')
+        zipcode = cache.get(f"zip:{public_ip}") if public_ip else None
+        if zipcode:
             return zipcode
-        else:
-            print(f"Failed to retrieve ZIP code. Status code: {response.status_code}")
-            return None
-    except requests.exceptions.RequestException as e:
-        print(f"Network error retrieving ZIP code: {e}")
+
+    location = get_location()
+    if not location:
+        print("Failed to determine location from any IP provider")
         return None
-    except (KeyError, TypeError) as e:
-        print(f"Error parsing ZIP code data: {e}")
+    if cache is not None:
+        _remember_location(cache, location)
+
+    zipcode = location.get('zip')
+    if not zipcode:
+        print("No zip code found in response")
         return None
+    return zipcode
 
 ###########################################################################################
 # get_public_ip
-# Use ipinfo.io to get the IP address of computer
+# Use the IP providers to get the IP address of computer
 ###########################################################################################
-def get_public_ip() -> Optional[str]:
+def get_public_ip(use_cache: bool = True) -> Optional[str]:
     """
     Retrieve the public IP address of the current machine.
 
+    Args:
+        use_cache: If True, use and update the persistent geolocation cache
+
     Returns:
         IP address string, or None if retrieval fails
     """
-    try:
-        response = requests.get(f'{IP_URL}', timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            ip = data.get('ip')
-            if not ip:
-                print("No IP address found in response")
-                return None
-            return ip
-        else:
-            print(f"Failed to retrieve public IP address. Status code: {response.status_code}")
-            return None
-    except requests.exceptions.RequestException as e:
-        print(f"Network error retrieving public IP: {e}")
-        return None
-    except (KeyError, TypeError) as e:
-        print(f"Error parsing IP data: {e}")
+    cache = _get_geo_cache() if use_cache else None
+    if cache is not None:
+        public_ip = cache.get('public_ip')
+        if public_ip:
+            return public_ip
+
+    location = get_location(require_zip=False)
+    if not location:
+        print("No IP address found in response")
         return None
+    if cache is not None:
+        _remember_location(cache, location)
+    return location['ip']
 
 
 
@@ -143,4 +439,4 @@ def main():
         print(f"An error occurred while getting weather data: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,213 @@
+"""Long-running weather polling service built on asyncio."""
+import argparse
+import asyncio
+import struct
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from decouple import config, Csv
+from weather import fetch_weather
+
+###########################################################################################
+# Configuration
+###########################################################################################
+DEFAULT_INTERVAL = 15 * 60
+DEFAULT_THRESHOLD = 1.0
+DEFAULT_SERIES_FILE = 'weather_series.bin'
+
+# One fixed-width record per emitted reading:
+# epoch seconds (float64), location (16 bytes, NUL padded), temperature (float32)
+RECORD = struct.Struct('<d16sf')
+LOCATION_SIZE = 16
+
+###########################################################################################
+# Time series storage
+# Append-only file of fixed-width binary records
+###########################################################################################
+class TimeSeriesWriter:
+    """Append readings to a compact binary time series file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'ab')
+
+    def append(self, timestamp: float, location: str, temperature: float) -> None:
+        """Write one record and flush it to disk."""
+        self._file.write(RECORD.pack(timestamp, _encode_location(location), temperature))
+        self._file.flush()
+
+    def close(self) -> None:
+        """Close the underlying file."""
+        self._file.close()
+
+def _encode_location(location: str) -> bytes:
+    """
+    Encode a location for the fixed-width location field.
+
+    Raises:
+        ValueError: If the location is longer than LOCATION_SIZE bytes, since
+            truncating it could make different locations collide
+    """
+    encoded = location.encode()
+    if len(encoded) > LOCATION_SIZE:
+        raise ValueError(f"Location {location!r} is longer than {LOCATION_SIZE} bytes")
+    return encoded
+
+def read_series(path: str) -> Iterator[Tuple[float, str, float]]:
+    """
+    Read every (timestamp, location, temperature) record from a series file.
+
+    A partially written trailing record (e.g. after a crash) is ignored.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    usable = len(data) - len(data) % RECORD.size
+    for timestamp, location, temperature in RECORD.iter_unpack(data[:usable]):
+        yield timestamp, location.rstrip(b'\0').decode(errors='replace'), temperature
+
+###########################################################################################
+# WeatherPoller
+# Poll each location on its own schedule and emit only meaningful changes
+###########################################################################################
+class WeatherPoller:
+    """
+    Poll a set of locations on a fixed interval inside one process.
+
+    Start times are staggered evenly across the interval so requests are
+    spread out instead of bursting. A reading is emitted (written to the
+    series file and passed to on_change) only when the temperature moved by
+    at least threshold degrees since the last emitted reading.
+
+    Example:
+        >>> poller = WeatherPoller(['10001', '94105'], interval=900)
+        >>> asyncio.run(poller.run())
+    """
+
+    def __init__(
+        self,
+        locations: Sequence[str],
+        interval: float = DEFAULT_INTERVAL,
+        threshold: float = DEFAULT_THRESHOLD,
+        series_path: Optional[str] = None,
+        on_change: Optional[Callable[[str, float, float], None]] = None,
+        fetch: Callable[[str], Tuple[Optional[dict], Optional[str]]] = fetch_weather,
+    ):
+        """
+        Args:
+            locations: Zip codes (or other WeatherStack queries of at most
+                LOCATION_SIZE bytes) to poll
+            interval: Seconds between polls of the same location
+            threshold: Minimum temperature change, in degrees, to emit
+            series_path: Append-only binary file for emitted readings
+            on_change: Called with (location, timestamp, temperature) on emit
+            fetch: Blocking weather lookup returning (data, error)
+        """
+        self.locations: List[str] = list(dict.fromkeys(locations))
+        for location in self.locations:
+            _encode_location(location)
+        self.interval = interval
+        self.threshold = threshold
+        self.series_path = series_path
+        self.on_change = on_change or _print_change
+        self._fetch = fetch
+        self._last: Dict[str, float] = {}
+        self._stop = asyncio.Event()
+        self.polls = 0
+        self.errors = 0
+
+    def stop(self) -> None:
+        """Ask the service to stop after the polls in flight."""
+        self._stop.set()
+
+    async def run(self) -> None:
+        """Poll every location until stop() is called."""
+        writer = TimeSeriesWriter(self.series_path) if self.series_path else None
+        try:
+            spacing = self.interval / max(len(self.locations), 1)
+            await asyncio.gather(*(self._poll_forever(location, i * spacing, writer)
+                                   for i, location in enumerate(self.locations)))
+        finally:
+            if writer:
+                writer.close()
+
+    async def _poll_forever(self, location: str, offset: float,
+                            writer: Optional[TimeSeriesWriter]) -> None:
+        """Poll one location every interval, starting after offset seconds."""
+        loop = asyncio.get_running_loop()
+        next_run = loop.time() + offset
+        while not await self._sleep_until(next_run):
+            await self.poll_once(location, writer)
+            # Schedule from the planned start so slow requests do not cause drift
+            next_run += self.interval
+
+    async def _sleep_until(self, when: float) -> bool:
+        """Sleep until the loop time reaches when; return True if stopped."""
+        if self._stop.is_set():
+            return True
+        delay = when - asyncio.get_running_loop().time()
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=max(delay, 0))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def poll_once(self, location: str,
+                        writer: Optional[TimeSeriesWriter] = None) -> Optional[float]:
+        """
+        Fetch one location and emit it if it changed enough.
+
+        Returns:
+            The emitted temperature, or None if nothing was emitted
+        """
+        self.polls += 1
+        data, error = await asyncio.to_thread(self._fetch, location)
+        if error:
+            self.errors += 1
+            print(f"Polling {location} failed: {error}")
+            return None
+
+        temperature = float(data['current']['temperature'])
+        last = self._last.get(location)
+        if last is not None and abs(temperature - last) < self.threshold:
+            return None
+
+        self._last[location] = temperature
+        timestamp = time.time()
+        if writer:
+            writer.append(timestamp, location, temperature)
+        self.on_change(location, timestamp, temperature)
+        return temperature
+
+def _print_change(location: str, timestamp: float, temperature: float) -> None:
+    """Default on_change callback."""
+    print(f"{time.strftime('%H:%M:%S', time.localtime(timestamp))} "
+          f"{location}: {temperature:g}°F")
+
+def main():
+    """Run the polling service until interrupted."""
+    parser = argparse.ArgumentParser(description='Poll WeatherStack for a set of locations.')
+    parser.add_argument('zips', nargs='*', help='Zip codes to poll (default: weather_poll_zips)')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help='Seconds between polls of each location')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Minimum temperature change to record')
+    parser.add_argument('--output', default=DEFAULT_SERIES_FILE,
+                        help='Append-only binary time series file')
+    args = parser.parse_args()
+
+    locations = args.zips or config('weather_poll_zips', default='', cast=Csv())
+    if not locations:
+        print("No locations to poll. Pass zip codes or set weather_poll_zips.")
+        return
+
+    try:
+        poller = WeatherPoller(locations, args.interval, args.threshold, args.output)
+    except ValueError as e:
+        print(e)
+        return
+    try:
+        asyncio.run(poller.run())
+    except KeyboardInterrupt:
+        print(f"Stopped after {poller.polls} polls ({poller.errors} errors)")
+
+if __name__ == "__main__":
+    main()